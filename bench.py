@@ -0,0 +1,642 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import wire
+from client_core import ClientCore, PROBE_INTERVAL, TICK_INTERVAL
+from discovery import LOOPBACK_BROADCAST, open_discovery_socket
+from fragment import Reassembler, RECV_BUFFER_SIZE
+from instrumentation import LOG_LEVELS, setup_logging, stop_logging
+
+log = logging.getLogger("bench")
+
+# Lastgenerator und Benchmarks für einen Cluster auf einem Rechner: die
+# Server laufen als eigene Prozesse auf Loopback mit eigenen Ports, die
+# Discovery geht per Loopback-Broadcast oder Multicast. Simulierte Clients
+# nutzen den Kern von client_gui.py (client_core), teilen sich aber einen
+# Empfangs-Thread, damit Hunderte davon in einen Prozess passen.
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "server.py")
+BIND_ADDRESS = "127.0.0.1"
+BASE_PORT = 6000  # Discovery-Port; Server i: BASE_PORT + 1 + 2i und + 2 + 2i
+SERVER_ARGS = ("--client-rate", "0", "--election-delay", "1",
+               "--log-level", "warning")
+STARTUP_TIMEOUT = 15.0
+JOIN_TIMEOUT = 10.0
+DRAIN_TIMEOUT = 5.0  # Wartezeit auf ausstehende Zustellungen am Ende
+WINDOW = 32  # ohne Rate: höchstens so viele Nachrichten je Sender unterwegs
+PREFIX = "bench "
+SCENARIOS = ("throughput", "latency", "fanout", "failover",
+             "failover_distributed")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(values):
+    # Zeiten in Millisekunden
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 0.5) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": max(values) * 1000
+    }
+
+
+class Cluster:
+    # Server als Unterprozesse auf einem Rechner
+    def __init__(self, size, base_port=BASE_PORT, bind=BIND_ADDRESS,
+                 discovery_address=LOOPBACK_BROADCAST, server_args=SERVER_ARGS,
+                 log_dir=None):
+        self.size = size
+        self.bind = bind
+        self.discovery_port = base_port
+        self.discovery_address = discovery_address
+        self.server_args = list(server_args)
+        self.log_dir = log_dir
+        self.processes = []
+        self.logs = []
+
+        # Abfrage der Messwerte über den Steuerport
+        self.stats_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stats_socket.bind((bind, 0))
+        self.reassembler = Reassembler()
+
+    def ports(self, index):
+        port = self.discovery_port + 1 + 2 * index
+        return port, port + 1
+
+    def start(self):
+        for index in range(self.size):
+            port, control_port = self.ports(index)
+            command = [sys.executable, SERVER_SCRIPT,
+                       "--port", str(port),
+                       "--control-port", str(control_port),
+                       "--discovery-port", str(self.discovery_port),
+                       "--discovery-address", self.discovery_address,
+                       "--bind", self.bind] + self.server_args
+            output = subprocess.DEVNULL
+            if self.log_dir:
+                output = open(os.path.join(self.log_dir, f"server{index}.log"),
+                              "ab")
+                self.logs.append(output)
+            self.processes.append(subprocess.Popen(
+                command, stdout=output, stderr=subprocess.STDOUT))
+        leader = self.wait_for_leader(STARTUP_TIMEOUT)
+        if leader is None:
+            raise RuntimeError("Cluster did not elect a leader.")
+        return leader
+
+    def alive(self, index):
+        return self.processes[index].poll() is None
+
+    def address(self, index):
+        return (self.bind, self.ports(index)[0])
+
+    def stats(self, index, timeout=1.0):
+        # Messwerte eines Servers (None, falls er nicht antwortet)
+        address = (self.bind, self.ports(index)[1])
+        self.stats_socket.sendto(wire.encode({"type": "stats"},
+                                             wire.FORMAT_JSON), address)
+        deadline = time.time() + timeout
+        try:
+            while True:
+                self.stats_socket.settimeout(max(0.01, deadline - time.time()))
+                datagram, peer = self.stats_socket.recvfrom(RECV_BUFFER_SIZE)
+                message = self.reassembler.add(datagram, peer)
+                if message is not None and peer == address:
+                    return wire.decode(message)["metrics"]
+        except socket.timeout:
+            return None
+
+    def wait_for_leader(self, timeout, exclude=None):
+        # Index des Leaders, sobald sich alle laufenden Server einig sind
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            alive = [index for index in range(self.size) if self.alive(index)]
+            leaders = []
+            converged = True
+            for index in alive:
+                metrics = self.stats(index, 0.5)
+                if metrics is None:
+                    converged = False
+                    continue
+                if metrics["gauges"]["leader"]:
+                    leaders.append(index)
+                if metrics["gauges"]["servers"] < len(alive) - 1:
+                    converged = False
+            if converged and len(leaders) == 1 and leaders[0] != exclude:
+                return leaders[0]
+            time.sleep(0.1)
+        return None
+
+    def kill(self, index):
+        # Absturz: kein leave, keine Abmeldung bei den anderen Servern
+        self.processes[index].kill()
+        self.processes[index].wait()
+
+    def stop(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for output in self.logs:
+            output.close()
+        self.stats_socket.close()
+
+
+class SimClient(ClientCore):
+    # Headless-Client mit dem Kern von client_gui.py; Empfang und Timer
+    # laufen im Pool
+    def __init__(self, pool, index):
+        super().__init__(on_message=pool.on_message,
+                         wire_format=pool.wire_format, bind=pool.bind)
+        self.index = index
+        self.switches = []  # (Zeitpunkt, server_id) jedes Leaderwechsels
+
+    def switch(self, server_id, address, join=False):
+        super().switch(server_id, address, join)
+        self.switches.append((time.perf_counter(), server_id))
+
+
+class ClientPool:
+    # Viele SimClients mit einem gemeinsamen Empfangs- und Timer-Thread
+    def __init__(self, cluster, wire_format=wire.FORMAT_BINARY):
+        self.bind = cluster.bind
+        self.wire_format = wire_format
+        self.clients = []
+        self.leader = None  # (server_id, Adresse) aus dem letzten Heartbeat
+        self.tracker = None
+        self.selector = selectors.DefaultSelector()
+        self.discovery_port = cluster.discovery_port
+        self.discovery_address = cluster.discovery_address
+        self.discovery_socket = open_discovery_socket(
+            cluster.discovery_port, cluster.discovery_address, cluster.bind)
+        self.selector.register(self.discovery_socket, selectors.EVENT_READ)
+        # Antworten auf Leader-Anfragen des Pools
+        self.probe_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.probe_socket.bind((cluster.bind, 0))
+        self.selector.register(self.probe_socket, selectors.EVENT_READ)
+        self.probed_at = 0
+        self.running = True
+        self.threads = [threading.Thread(target=self.receive_loop, daemon=True),
+                        threading.Thread(target=self.timer_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def add(self, count):
+        # Neue Clients melden sich sofort beim bekannten Leader an, sonst
+        # beim nächsten Heartbeat
+        clients = [SimClient(self, len(self.clients) + i) for i in range(count)]
+        for client in clients:
+            self.selector.register(client.client_socket, selectors.EVENT_READ,
+                                   client)
+        self.clients.extend(clients)
+        leader = self.leader
+        if leader is None:
+            self.probe_leader()
+        else:
+            for client in clients:
+                client.on_discovery({"type": "heartbeat", "id": leader[0],
+                                     "port": leader[1][1]}, leader[1])
+        return clients
+
+    def probe_leader(self):
+        self.probed_at = time.time()
+        self.discovery_socket.sendto(wire.encode({
+            "type": "who_is_leader",
+            "id": "bench",
+            "reply_port": self.probe_socket.getsockname()[1]
+        }, self.wire_format), (self.discovery_address, self.discovery_port))
+
+    def wait_joined(self, timeout=JOIN_TIMEOUT):
+        deadline = time.time() + timeout
+        for client in self.clients:
+            if not client.joined.wait(max(0, deadline - time.time())):
+                break
+        return sum(client.joined.is_set() for client in self.clients)
+
+    def on_message(self, data):
+        text = data.get("text", "")
+        if self.tracker is not None and text.startswith(PREFIX):
+            self.tracker.deliver(text[len(PREFIX):], time.perf_counter())
+
+    def on_discovery(self, datagram, address):
+        data = wire.decode(datagram)
+        if data["type"] != "heartbeat":
+            return
+        self.leader = (data["id"], (address[0], data["port"]))
+        for client in list(self.clients):
+            client.on_discovery(data, address)
+
+    def receive_loop(self):
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while self.running:
+            for key, _ in self.selector.select(0.1):
+                try:
+                    nbytes, address = key.fileobj.recvfrom_into(buffer)
+                except OSError:
+                    continue
+                try:
+                    if key.data is None:
+                        self.on_discovery(view[:nbytes], address)
+                    else:
+                        key.data.on_datagram(view[:nbytes], address)
+                except Exception as e:
+                    log.warning("Client receive error: %s", e)
+
+    def timer_loop(self):
+        # ACKs, Wiederholungen und Keepalives aller Clients
+        while self.running:
+            time.sleep(TICK_INTERVAL)
+            now = time.time()
+            if self.leader is None and now - self.probed_at >= PROBE_INTERVAL:
+                self.probe_leader()
+            for client in list(self.clients):
+                client.tick(now)
+
+    def close(self):
+        for client in self.clients:
+            client.leave()
+        time.sleep(0.3)  # leave noch bestätigen lassen
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        for client in self.clients:
+            client.close()
+        self.discovery_socket.close()
+        self.probe_socket.close()
+        self.selector.close()
+
+
+class Tracker:
+    # Zustellungen je Nachricht: Latenz bis zu jedem Empfänger und bis zum
+    # letzten Empfänger (Abschluss)
+    def __init__(self, receivers):
+        self.receivers = receivers
+        self.sent = {}  # key: Sendezeit
+        self.pending = {}  # key: noch fehlende Zustellungen
+        self.completed = {}  # key: Zeitpunkt der letzten Zustellung
+        self.latencies = []
+        self.completions = []
+        self.lock = threading.Condition()
+
+    def stamp(self, key):
+        with self.lock:
+            self.sent[key] = time.perf_counter()
+            self.pending[key] = self.receivers
+
+    def deliver(self, key, now):
+        with self.lock:
+            if key not in self.pending:
+                return
+            self.latencies.append(now - self.sent[key])
+            self.pending[key] -= 1
+            if not self.pending[key]:
+                del self.pending[key]
+                self.completed[key] = now
+                self.completions.append(now - self.sent[key])
+                self.lock.notify_all()
+
+    def wait(self, outstanding, timeout):
+        # Bis höchstens outstanding Nachrichten unvollständig sind
+        with self.lock:
+            return self.lock.wait_for(lambda: len(self.pending) <= outstanding,
+                                      timeout)
+
+    def result(self, start):
+        with self.lock:
+            end = max(self.completed.values(), default=start)
+            elapsed = max(end - start, 1e-9)
+            expected = len(self.sent) * self.receivers
+            return {
+                "messages": len(self.sent),
+                "completed": len(self.completed),
+                "deliveries": len(self.latencies),
+                "lost_deliveries": expected - len(self.latencies),
+                "elapsed_s": elapsed,
+                "messages_per_s": len(self.completed) / elapsed,
+                "deliveries_per_s": len(self.latencies) / elapsed,
+                "latency": summarize(self.latencies),
+                "completion": summarize(self.completions)
+            }
+
+
+def run_load(senders, count, tracker, rate=0, window=WINDOW):
+    # Jeder Sender schickt count Nachrichten; mit rate je Sender getaktet,
+    # sonst so schnell, wie das Fenster ausstehender Nachrichten erlaubt
+    start = time.perf_counter()
+    for n in range(count):
+        for sender in senders:
+            key = f"{sender.index}-{n}"
+            tracker.stamp(key)
+            sender.send_message(PREFIX + key)
+        if rate > 0:
+            delay = start + (n + 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            tracker.wait(window * len(senders), DRAIN_TIMEOUT)
+    tracker.wait(0, DRAIN_TIMEOUT)
+    return tracker.result(start)
+
+
+def start_cluster(args, size, extra_args=()):
+    cluster = Cluster(size, base_port=args.base_port, bind=args.bind,
+                      discovery_address=args.discovery_address,
+                      server_args=(list(SERVER_ARGS) + list(extra_args)
+                                   + args.server_arg),
+                      log_dir=args.log_dir)
+    try:
+        leader = cluster.start()
+    except Exception:
+        cluster.stop()
+        raise
+    return cluster, leader
+
+
+def join_clients(cluster, pool, count):
+    pool.add(count)
+    joined = pool.wait_joined()
+    if joined < len(pool.clients):
+        log.warning("Only %s of %s clients joined.", joined, len(pool.clients))
+    return joined
+
+
+def server_metrics(cluster, index):
+    # Serverseitige Messwerte des Leaders als Ergänzung zur Client-Sicht
+    metrics = cluster.stats(index)
+    if metrics is None:
+        return None
+    return {"histograms": metrics["histograms"],
+            "outbound": metrics["gauges"]["outbound"],
+            "registry": metrics["gauges"]["registry"]}
+
+
+def scenario_throughput(args):
+    # Mehrere Sender gleichzeitig, so schnell wie möglich
+    cluster, leader = start_cluster(args, args.servers)
+    try:
+        pool = ClientPool(cluster, args.wire_format)
+        joined = join_clients(cluster, pool, args.clients)
+        pool.tracker = Tracker(joined - 1)
+        result = run_load(pool.clients[:args.senders], args.messages,
+                          pool.tracker)
+        result.update(servers=args.servers, clients=joined,
+                      senders=args.senders,
+                      server=server_metrics(cluster, leader))
+        pool.close()
+        return result
+    finally:
+        cluster.stop()
+
+
+def scenario_latency(args):
+    # Ein Sender mit fester, niedriger Rate: Latenz ohne Warteschlangen
+    cluster, leader = start_cluster(args, args.servers)
+    try:
+        pool = ClientPool(cluster, args.wire_format)
+        joined = join_clients(cluster, pool, args.latency_clients)
+        pool.tracker = Tracker(joined - 1)
+        result = run_load(pool.clients[:1], args.messages, pool.tracker,
+                          rate=args.rate)
+        result.update(servers=args.servers, clients=joined, rate=args.rate,
+                      server=server_metrics(cluster, leader))
+        pool.close()
+        return result
+    finally:
+        cluster.stop()
+
+
+def scenario_fanout(args):
+    # Gleiche Last bei wachsender Zahl von Empfängern
+    cluster, leader = start_cluster(args, args.servers)
+    steps = []
+    try:
+        for count in args.fanout:
+            before = (cluster.stats(leader) or {}).get("histograms", {})
+            pool = ClientPool(cluster, args.wire_format)
+            joined = join_clients(cluster, pool, count)
+            pool.tracker = Tracker(joined - 1)
+            result = run_load(pool.clients[:1], args.fanout_messages,
+                              pool.tracker, rate=args.rate)
+            after = (cluster.stats(leader) or {}).get("histograms", {})
+            pool.close()
+            completion = result["completion"].get("p50_ms", 0)
+            result.update(clients=joined,
+                          per_recipient_us=completion * 1000 / max(1, joined - 1),
+                          server_fanout_ms=histogram_delta(before, after, "fanout"))
+            steps.append(result)
+            log.info("fanout %s clients: completion p50 %.2f ms", joined,
+                     completion)
+        return {"servers": args.servers, "rate": args.rate, "steps": steps}
+    finally:
+        cluster.stop()
+
+
+def histogram_delta(before, after, name):
+    # Mittelwert eines Server-Histogramms nur über den Zeitraum der Messung
+    first = before.get(name, {"count": 0, "mean": 0.0})
+    second = after.get(name, {"count": 0, "mean": 0.0})
+    count = second["count"] - first["count"]
+    if count <= 0:
+        return None
+    total = second["mean"] * second["count"] - first["mean"] * first["count"]
+    return total / count * 1000
+
+
+def scenario_failover(args, distributed=False):
+    # Leader-Prozess hart beenden, während ein Client laufend sendet; im
+    # verteilten Betrieb hängt der Sender an einem Follower, der seine
+    # Nachrichten an den Leader weiterreicht
+    size = max(2, args.servers)
+    cluster, leader = start_cluster(
+        args, size, ("--distribute",) if distributed else ())
+    try:
+        pool = ClientPool(cluster, args.wire_format)
+        joined = join_clients(cluster, pool, args.failover_clients)
+        tracker = pool.tracker = Tracker(joined - 1)
+        followers = [client for client in pool.clients
+                     if client.server_address != cluster.address(leader)]
+        sender = followers[0] if distributed and followers else pool.clients[0]
+        stop = threading.Event()
+
+        def probe():
+            n = 0
+            while not stop.is_set():
+                key = f"p-{n}"
+                tracker.stamp(key)
+                sender.send_message(PREFIX + key)
+                n += 1
+                time.sleep(1 / args.rate)
+
+        prober = threading.Thread(target=probe, daemon=True)
+        prober.start()
+        time.sleep(1.0)
+        old_id = pool.leader[0] if pool.leader else None
+        killed_at = time.perf_counter()
+        cluster.kill(leader)
+        new_leader = cluster.wait_for_leader(args.failover_timeout,
+                                             exclude=leader)
+        elected = time.perf_counter() - killed_at
+
+        # Warten, bis alle Clients umgeschaltet haben und wieder zugestellt wird
+        deadline = time.time() + args.failover_timeout
+        while time.time() < deadline:
+            switched = [client for client in pool.clients
+                        if client.server_id not in (None, old_id)]
+            with tracker.lock:
+                recovered = [done for key, done in tracker.completed.items()
+                             if tracker.sent[key] > killed_at]
+            if len(switched) == len(pool.clients) and recovered:
+                break
+            time.sleep(0.05)
+        stop.set()
+        prober.join()
+        tracker.wait(0, DRAIN_TIMEOUT)
+
+        switch_times = []
+        for client in pool.clients:
+            times = [at - killed_at for at, server_id in client.switches
+                     if at > killed_at and server_id != old_id]
+            if times:
+                switch_times.append(times[0])
+        with tracker.lock:
+            recovered = [done - killed_at for key, done in tracker.completed.items()
+                         if tracker.sent[key] > killed_at]
+            lost = [key for key in tracker.sent if key in tracker.pending]
+        result = {
+            "servers": size,
+            "clients": joined,
+            "new_leader": new_leader,
+            "election_s": elected if new_leader is not None else None,
+            "clients_switched": len(switch_times),
+            "switch": summarize(switch_times),
+            "recovery_s": min(recovered) if recovered else None,
+            "probes": len(tracker.sent),
+            "probes_lost": len(lost),
+            "server": server_metrics(cluster, new_leader)
+            if new_leader is not None else None
+        }
+        pool.close()
+        return result
+    finally:
+        cluster.stop()
+
+
+RUNNERS = {
+    "throughput": scenario_throughput,
+    "latency": scenario_latency,
+    "fanout": scenario_fanout,
+    "failover": scenario_failover,
+    "failover_distributed": lambda args: scenario_failover(args, True)
+}
+
+
+def headline(result):
+    # Kurzfassung für das Log, Details stehen in der Ergebnisdatei
+    if "steps" in result:
+        return ", ".join(f"{step['clients']} clients {step['per_recipient_us']:.0f} µs/recipient"
+                         for step in result["steps"])
+    if "recovery_s" in result:
+        return (f"election {result['election_s']} s, recovery {result['recovery_s']} s, "
+                f"{result['probes_lost']} of {result['probes']} probes lost")
+    return (f"{result['messages_per_s']:.0f} msg/s, "
+            f"{result['deliveries_per_s']:.0f} deliveries/s, "
+            f"p50 {result['latency'].get('p50_ms', 0):.1f} ms, "
+            f"p99 {result['latency'].get('p99_ms', 0):.1f} ms, "
+            f"{result['lost_deliveries']} lost")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(SERVER_SCRIPT), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Lastgenerator und Benchmarks für einen Cluster auf einem Rechner")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Auszuführendes Szenario (mehrfach möglich, Standard: alle)")
+    parser.add_argument("--servers", type=int, default=3,
+                        help="Anzahl der Server-Prozesse")
+    parser.add_argument("--clients", type=int, default=50,
+                        help="Clients im Durchsatz-Szenario")
+    parser.add_argument("--senders", type=int, default=5,
+                        help="Gleichzeitige Sender im Durchsatz-Szenario")
+    parser.add_argument("--messages", type=int, default=200,
+                        help="Nachrichten je Sender")
+    parser.add_argument("--rate", type=float, default=20.0,
+                        help="Nachrichten pro Sekunde für Latenz, Fan-out und Failover")
+    parser.add_argument("--latency-clients", type=int, default=10,
+                        help="Clients im Latenz-Szenario")
+    parser.add_argument("--fanout", type=lambda text: [int(n) for n in text.split(",")],
+                        default=[10, 50, 100, 200],
+                        help="Client-Anzahlen im Fan-out-Szenario (kommagetrennt)")
+    parser.add_argument("--fanout-messages", type=int, default=50,
+                        help="Nachrichten je Stufe im Fan-out-Szenario")
+    parser.add_argument("--failover-clients", type=int, default=20,
+                        help="Clients im Failover-Szenario")
+    parser.add_argument("--failover-timeout", type=float, default=15.0,
+                        help="Sekunden, die auf einen neuen Leader gewartet wird")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT,
+                        help="Discovery-Port; die Server belegen die folgenden Ports")
+    parser.add_argument("--bind", default=BIND_ADDRESS,
+                        help="Lokale Adresse für Server und Clients")
+    parser.add_argument("--discovery-address", default=LOOPBACK_BROADCAST,
+                        help="Loopback-Broadcast oder Multicast-Gruppe (z.B. 239.255.50.10)")
+    parser.add_argument("--wire-format", choices=wire.FORMATS,
+                        default=wire.FORMAT_BINARY,
+                        help="Format der Client-Pakete")
+    parser.add_argument("--server-arg", action="append", default=[],
+                        metavar="ARG",
+                        help="Zusätzliches Argument für server.py, z.B. --server-arg=--coalesce-ms=10")
+    parser.add_argument("--log-dir",
+                        help="Verzeichnis für die Logs der Server-Prozesse")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="Ergebnisdatei (JSON)")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info",
+                        help="Ausführlichkeit des Logs")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "host": {"platform": platform.platform(),
+                 "python": platform.python_version(),
+                 "cpus": os.cpu_count()},
+        "config": vars(args),
+        "scenarios": {}
+    }
+    for name in args.scenario or SCENARIOS:
+        log.info("Running scenario %s ...", name)
+        results["scenarios"][name] = RUNNERS[name](args)
+        log.info("%s: %s", name, headline(results["scenarios"][name]))
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    log.info("Results written to %s.", args.output)
+    stop_logging()
@@ -0,0 +1,361 @@
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import wire
+from discovery import DISCOVERY_ADDRESS, DISCOVERY_PORT, open_discovery_socket
+from fragment import Fragmenter, Reassembler, RECV_BUFFER_SIZE
+from reliability import ReliableChannel
+from rooms import DEFAULT_ROOM
+
+# Netzwerkteil des Chat-Clients ohne Oberfläche: Leader finden, anmelden,
+# senden, empfangen und den Verlauf nachladen. Anzuzeigende Zeilen gehen an
+# show(), das aus den Netzwerk-Threads aufgerufen wird; die Oberfläche
+# (client_gui.py) reiht sie nur ein. Der Lastgenerator (bench.py) nutzt
+# denselben Kern ohne eigene Threads.
+
+TICK_INTERVAL = 0.05  # ACKs, Wiederholungen und Keepalives
+KEEPALIVE_INTERVAL = 5.0  # bis der Server im Welcome einen Takt meldet
+PROBE_INTERVAL = 0.5  # Leader-Anfrage wiederholen, solange keiner bekannt ist
+HISTORY_PAGE = 50
+SHOWN_MESSAGES = 1000  # gemerkte angezeigte Nachrichten
+
+
+class ClientCore:
+    def __init__(self, show=None, on_message=None,
+                 wire_format=wire.FORMAT_BINARY, discovery_port=DISCOVERY_PORT,
+                 discovery_address=DISCOVERY_ADDRESS, bind=""):
+        # show(line): Textzeile für die Anzeige
+        self.show = show or (lambda line: None)
+        # on_message(data): jede neu angezeigte Chat-Nachricht
+        self.on_message = on_message
+        self.wire_format = wire_format
+
+        # Discovery-Socket erst in start(); mehrere Clients in einem
+        # Prozess teilen sich sonst einen (siehe bench.ClientPool)
+        self.discovery_port = discovery_port
+        self.discovery_address = discovery_address
+        self.discovery_socket = None
+
+        # Eigener Socket für eingehende Nachrichten; ohne SO_REUSEADDR, sonst
+        # vergibt der Kernel denselben freien Port an mehrere Clients
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client_socket.bind((bind, 0))  # Port automatisch zuweisen
+
+        # Leader-Daten (Adresse, ID)
+        self.server_id = None
+        self.server_address = None
+
+        # Eindeutige Client-ID und Port
+        self.id = str(uuid.uuid4())
+        self.port = self.client_socket.getsockname()[1]
+        self.name = ""  # Wird vom Server gesetzt
+        self.joined = threading.Event()
+
+        # Verlauf: höchste gesehene Sequenznummer und die zuletzt angezeigten
+        # Nachrichten. Nach einem Serverwechsel kommt dieselbe Nachricht evtl.
+        # live und aus dem Verlauf oder über zwei Server; sie erscheint nur
+        # einmal.
+        self.last_seq = 0
+        self.shown_messages = OrderedDict()
+        # Fortlaufende Nummer eigener Nachrichten; der Server erkennt daran
+        # nach einem Leaderwechsel erneut gesendete Nachrichten
+        self.next_msg_id = 1
+
+        # Abonnierte Räume; Nachrichten gehen in den aktuellen Raum
+        self.rooms = {DEFAULT_ROOM}
+        self.room = DEFAULT_ROOM
+
+        # Lease beim Server per Keepalive verlängern (Takt aus dem Welcome)
+        self.keepalive_interval = KEEPALIVE_INTERVAL
+        self.keepalive_at = time.time()
+        self.probed_at = 0
+
+        # Große Nachrichten fragmentieren und wieder zusammensetzen
+        self.fragmenter = Fragmenter()
+        self.reassembler = Reassembler()
+
+        # Zuverlässige, geordnete Zustellung in beide Richtungen
+        self.reliability = ReliableChannel(self.send_datagram)
+        self.running = False
+
+    def start(self):
+        # Eigene Threads für Discovery, Empfang und Timer
+        self.running = True
+        self.discovery_socket = open_discovery_socket(self.discovery_port,
+                                                      self.discovery_address)
+        threading.Thread(target=self.discover_leader, daemon=True).start()
+        threading.Thread(target=self.listen_for_messages, daemon=True).start()
+        threading.Thread(target=self.run_timers, daemon=True).start()
+        self.probe_leader()
+
+    def close(self):
+        self.running = False
+        self.client_socket.close()
+        if self.discovery_socket is not None:
+            self.discovery_socket.close()
+
+    def discover_leader(self):
+        # Lauscht auf Heartbeats vom Leader
+        self.show("Warte auf Leader-Heartbeat...")
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while self.running:
+            try:
+                nbytes, address = self.discovery_socket.recvfrom_into(buffer)
+                self.on_discovery(wire.decode(view[:nbytes]), address)
+            except Exception as e:
+                if self.running:
+                    self.show(f"Discovery-Fehler: {e}")
+
+    def probe_leader(self):
+        # Leader aktiv erfragen statt auf den nächsten Beacon zu warten;
+        # die Antwort (ein Heartbeat) kommt an den Client-Socket
+        self.probed_at = time.time()
+        self.discovery_socket.sendto(wire.encode({
+            "type": "who_is_leader",
+            "id": self.id,
+            "reply_port": self.port
+        }, self.wire_format), (self.discovery_address, self.discovery_port))
+
+    def on_discovery(self, data, address):
+        if data["type"] == "heartbeat" and data["id"] != self.server_id:
+            self.switch(data["id"], (address[0], data["port"]), join=True)
+            self.show(f"Leader gefunden: {data['id']} @ {address[0]}:{data['port']}")
+
+    def switch(self, server_id, address, join=False):
+        # Ab jetzt an diesen Server senden. Was der alte Server noch nicht
+        # bestätigt hat, geht an den neuen (nach dem Join, falls join).
+        pending = []
+        if self.server_address is not None and self.server_address != address:
+            pending = self.reliability.take_pending(self.server_address)
+        self.server_id = server_id
+        self.server_address = address
+        if join:
+            self.connect_server()
+        for payload in pending:
+            self.reliability.send(payload, address)
+
+    def connect_server(self):
+        # Sendet JOIN-Anfrage an Leader-Server
+        self.send({
+            "type": "join",
+            "id": self.id,
+            "port": self.port,
+            "wire": self.wire_format,
+            "reliable": True,
+            "batch": True
+        })
+        self.show("Mit Leader verbunden!")
+
+    def send(self, message):
+        if self.server_address:
+            self.reliability.send(wire.encode(message, self.wire_format),
+                                  self.server_address)
+
+    def submit(self, text):
+        # Eingabe des Benutzers: Befehl oder Nachricht in den aktuellen Raum
+        command, _, argument = text.partition(" ")
+        if command == "/join" and argument.strip():
+            self.join_room(argument.strip())
+        elif command == "/leave":
+            self.leave_room(argument.strip() or self.room)
+        else:
+            self.send_message(text)
+            self.show(self.format_line(self.room, self.name, text))
+
+    def join_room(self, room):
+        # Raum abonnieren und zum aktuellen Raum machen
+        self.rooms.add(room)
+        self.room = room
+        self.send_room_request("join_room", room)
+
+    def leave_room(self, room):
+        if room == DEFAULT_ROOM or room not in self.rooms:
+            self.show(f"Raum {room} kann nicht verlassen werden.")
+            return
+        self.rooms.discard(room)
+        if self.room == room:
+            self.room = DEFAULT_ROOM
+        self.send_room_request("leave_room", room)
+
+    def send_room_request(self, kind, room):
+        self.send({
+            "type": kind,
+            "id": self.id,
+            "room": room
+        })
+
+    def format_line(self, room, sender_name, text):
+        # Nachrichten außerhalb der Lobby mit Raum kennzeichnen
+        if room == DEFAULT_ROOM:
+            return f"{sender_name}: {text}"
+        return f"[{room}] {sender_name}: {text}"
+
+    def request_history(self, after):
+        # Nachrichten nach "after" seitenweise vom Server abfragen
+        request = {
+            "type": "history",
+            "id": self.id,
+            "limit": HISTORY_PAGE
+        }
+        if after is not None:
+            request["after"] = after
+        self.send(request)
+
+    def send_message(self, text, room=None):
+        # Nachricht an den Leader-Server senden
+        try:
+            self.send({
+                "type": "message",
+                "id": self.id,
+                "msg_id": self.next_msg_id,
+                "room": room or self.room,
+                "text": text
+            })
+            self.next_msg_id += 1
+        except Exception as e:
+            self.show(f"Fehler beim Senden: {e}")
+
+    def leave(self):
+        self.send({
+            "type": "leave",
+            "id": self.id
+        })
+
+    def listen_for_messages(self):
+        # Lauscht auf eingehende Nachrichten vom Server
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while self.running:
+            try:
+                nbytes, address = self.client_socket.recvfrom_into(buffer)
+                self.on_datagram(view[:nbytes], address)
+            except Exception as e:
+                if self.running:
+                    self.show(f"Empfangsfehler: {e}")
+
+    def on_datagram(self, datagram, address):
+        response = self.reassembler.add(datagram, address)
+        if response is None:
+            return
+        for payload in self.reliability.receive(response, address):
+            # Der Server bündelt mehrere Pakete in einem Batch
+            for message in wire.unbatch(payload):
+                self.handle_message(wire.decode(message), address)
+
+    def handle_message(self, data, address):
+        # Verarbeitet ein Paket vom Server
+        if data["type"] == "welcome":
+            # Empfang von Namen vom Server nach Verbindungsaufbau
+            self.name = data["name"]
+            if "lease" in data:
+                self.keepalive_interval = data["lease"] / 3
+            self.joined.set()
+            self.show(f"Willkommen, {self.name}!")
+            # Nach einem Neuanmelden die übrigen Räume wieder abonnieren
+            for room in sorted(self.rooms - {DEFAULT_ROOM}):
+                self.send_room_request("join_room", room)
+            if data.get("last_seq", 0) > self.last_seq:
+                # Beim ersten Join die letzten Nachrichten, sonst nur Verpasstes
+                self.request_history(self.last_seq or None)
+
+        elif data["type"] == "message":
+            # Nachricht eines anderen Clients (weitergeleitet vom Server)
+            seq = data.get("seq", 0)
+            if self.first_sight(data):
+                sender_name = data.get("sender_name", "Unbekannt")
+                self.show(self.format_line(data.get("room", DEFAULT_ROOM),
+                                           sender_name, data["text"]))
+                if self.on_message is not None:
+                    self.on_message(data)
+            self.last_seq = max(self.last_seq, seq)
+
+        elif data["type"] == "history":
+            # Seite aus dem Verlauf: nur Fremdes, noch nicht Angezeigtes
+            for record in data["messages"]:
+                if record["id"] != self.id and self.first_sight(record):
+                    self.show(self.format_line(record.get("room", DEFAULT_ROOM),
+                                               record["sender_name"],
+                                               record["text"]))
+                    if self.on_message is not None:
+                        self.on_message(record)
+                self.last_seq = max(self.last_seq, record["seq"])
+            if data["more"] and data["messages"]:
+                self.request_history(data["messages"][-1]["seq"])
+
+        elif data["type"] == "heartbeat":
+            # Antwort des Leaders auf probe_leader()
+            self.on_discovery(data, address)
+
+        elif data["type"] == "leader":
+            # Ein Follower hat samt Registry übernommen: ohne neuen Join umschalten
+            if data["id"] != self.server_id:
+                self.switch(data["id"], (address[0], data["port"]))
+                self.show(f"Leader gewechselt: {data['id']} @ {address[0]}:{data['port']}")
+                if data.get("last_seq", 0) > self.last_seq:
+                    self.request_history(self.last_seq)
+
+        elif data["type"] == "redirect":
+            # Verteilter Betrieb: der Leader teilt uns einem Server zu; das
+            # Paket kommt von diesem Server selbst
+            self.switch(data["leader"], (address[0], data["port"]),
+                        join=data["join"])
+            self.show(f"Zugeteilt an Server {data['id']} @ {address[0]}:{data['port']}")
+            if not data["join"] and data.get("last_seq", 0) > self.last_seq:
+                self.request_history(self.last_seq)
+
+        elif data["type"] == "lease_expired":
+            # Server hat uns wegen fehlender Keepalives entfernt
+            self.show("Verbindung abgelaufen, melde neu an...")
+            self.connect_server()
+
+        elif data["type"] == "notice":
+            # Systemnachricht (Client X ist beigetreten/verlassen)
+            self.show(f"🔔 {data['text']}")
+
+    def first_sight(self, data):
+        # True, falls die Nachricht noch nicht angezeigt wurde. Erkannt an
+        # Absender und msg_id: die Sequenznummer einer Nachricht, die der
+        # alte Leader nicht mehr replizieren konnte, vergibt der neue erneut.
+        msg_id = data.get("msg_id")
+        key = (data["id"], msg_id) if msg_id is not None else data.get("seq")
+        if not key:
+            return True  # Server ohne Sequenznummern
+        if key in self.shown_messages:
+            return False
+        self.shown_messages[key] = True
+        if len(self.shown_messages) > SHOWN_MESSAGES:
+            self.shown_messages.popitem(last=False)
+        return True
+
+    def send_datagram(self, payload, address):
+        # Versand an den Server, bei Bedarf in Fragmenten
+        for datagram in self.fragmenter.split(payload):
+            self.client_socket.sendto(datagram, address)
+
+    def run_timers(self):
+        while self.running:
+            time.sleep(TICK_INTERVAL)
+            self.tick(time.time())
+
+    def tick(self, now):
+        # ACKs gesammelt senden, unbestätigte Pakete wiederholen, die
+        # Lease per Keepalive verlängern und ggf. den Leader erfragen
+        self.reliability.tick()
+        if (self.server_id is None and self.discovery_socket is not None
+                and now - self.probed_at >= PROBE_INTERVAL):
+            self.probe_leader()
+        if now - self.keepalive_at >= self.keepalive_interval:
+            self.keepalive_at = now
+            self.keepalive()
+
+    def keepalive(self):
+        # Leichtgewichtiges Lebenszeichen, bewusst ohne Zustellschicht
+        if self.server_address and self.name:
+            self.send_datagram(wire.encode({
+                "type": "keepalive",
+                "id": self.id
+            }, self.wire_format), self.server_address)
@@ -1,37 +1,28 @@
-import socket
-import json
-import threading
-import uuid
+import argparse
+import queue
 import tkinter as tk
 from tkinter import scrolledtext
 
+import wire
+from client_core import ClientCore
+from discovery import DISCOVERY_ADDRESS, DISCOVERY_PORT
+
+# Anzeige: eingehende Zeilen werden gesammelt und im Takt von UPDATE_INTERVAL
+# gebündelt eingefügt; ältere Zeilen über SCROLLBACK fallen heraus
+UPDATE_INTERVAL = 50  # ms
+SCROLLBACK = 2000
+
 
 class ChatClient:
-    def __init__(self, root, discovery_port=5010):
-        # Setzt den Port, auf dem Heartbeats und Leader-Infos empfangen werden
-        self.discovery_port = discovery_port
-
-        # UDP-Socket für Discovery & Nachrichtenempfang erstellen
-        self.discovery_socket = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM)
-        self.discovery_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.discovery_socket.bind(('', self.discovery_port))
-
-        # Eigenen Socket für eingehende Nachrichten initialisieren (Client-zu-Client)
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.client_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.client_socket.bind(('', 0))  # Port automatisch zuweisen
-
-        # Leader-Daten (Adresse, ID)
-        self.server_id = None
-        self.server_address = None
-
-        # Eindeutige Client-ID und Port
-        self.id = str(uuid.uuid4())
-        self.port = self.client_socket.getsockname()[1]
-        self.name = ""  # Wird vom Server gesetzt
+    def __init__(self, root, discovery_port=DISCOVERY_PORT,
+                 wire_format=wire.FORMAT_BINARY,
+                 discovery_address=DISCOVERY_ADDRESS, scrollback=SCROLLBACK):
+        # Zeilen aus den Netzwerk-Threads; nur der Tk-Thread greift aufs Widget zu
+        self.lines = queue.SimpleQueue()
+        self.scrollback = scrollback
+        self.core = ClientCore(show=self.lines.put, wire_format=wire_format,
+                               discovery_port=discovery_port,
+                               discovery_address=discovery_address)
 
         # GUI-Setup
         self.root = root
@@ -53,101 +44,57 @@ class ChatClient:
         # Fenster schließen behandeln
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Starte Discovery- und Listener-Threads
-        threading.Thread(target=self.discover_leader, daemon=True).start()
-        threading.Thread(target=self.listen_for_messages, daemon=True).start()
-
-    def discover_leader(self):
-        # Lauscht auf Heartbeats vom Leader
-        self.log("Warte auf Leader-Heartbeat...")
-        while True:
-            response, address = self.discovery_socket.recvfrom(1024)
-            data = json.loads(response.decode())
-            if data["type"] == "heartbeat":
-                server_id = data['id']
-                if self.server_id != server_id:
-                    self.server_id = server_id
-                    self.server_address = (address[0], data["port"])
-                    self.connect_server()
-                    self.log(
-                        f"Leader gefunden: {server_id} @ {address[0]}:{data['port']}")
-
-    def connect_server(self):
-        # Sendet JOIN-Anfrage an Leader-Server
-        join_message = {
-            "type": "join",
-            "id": self.id,
-            "port": self.port
-        }
-        self.client_socket.sendto(json.dumps(
-            join_message).encode(), self.server_address)
-        self.log("Mit Leader verbunden!")
+        # Netzwerk starten und die Anzeige periodisch aktualisieren
+        self.core.start()
+        self.root.after(UPDATE_INTERVAL, self.update_view)
 
     def send_gui_message(self):
-        # Senden-Button oder ENTER: Nachricht verschicken
+        # Senden-Button oder ENTER: Nachricht oder Befehl verschicken
         message = self.entry_field.get()
-        if message:
-            self.send_message(message)
-            self.entry_field.delete(0, tk.END)
-            self.log(f"{self.name}: {message}")
-
-    def send_message(self, message):
-        # Nachricht an den Leader-Server senden
-        if self.server_address:
-            try:
-                msg = json.dumps({
-                    "type": "message",
-                    "id": self.id,
-                    "text": message
-                })
-                self.client_socket.sendto(msg.encode(), self.server_address)
-            except Exception as e:
-                self.log(f"Fehler beim Senden: {e}")
-
-    def listen_for_messages(self):
-        # Lauscht auf eingehende Nachrichten vom Server
-        while True:
-            try:
-                response, _ = self.client_socket.recvfrom(1024)
-                data = json.loads(response.decode())
-
-                if data["type"] == "welcome":
-                    # Empfang von Namen vom Server nach Verbindungsaufbau
-                    self.name = data["name"]
-                    self.log(f"Willkommen, {self.name}!")
-
-                elif data["type"] == "message":
-                    # Empfang einer Nachricht von einem anderen Client (weitergeleitet vom Server)
-                    sender_name = data.get("sender_name", "Unbekannt")
-                    self.log(f"{sender_name}: {data['text']}")
-
-                elif data["type"] == "notice":
-                    # Systemnachricht (Client X ist beigetreten/verlassen)
-                    self.log(f"🔔 {data['text']}")
-
-            except Exception as e:
-                self.log(f"Empfangsfehler: {e}")
-
-    def on_close(self):
-        # Beim Schließen "leave"-Nachricht an den Server senden
-        if self.server_address:
-            leave_message = {
-                "type": "leave",
-                "id": self.id
-            }
-            self.client_socket.sendto(json.dumps(
-                leave_message).encode(), self.server_address)
-        self.root.destroy()
-
-    def log(self, message):
+        if not message:
+            return
+        self.entry_field.delete(0, tk.END)
+        self.core.submit(message)
+
+    def update_view(self):
+        # Alle bis jetzt eingetroffenen Zeilen in einem Schritt einfügen
+        lines = []
+        for _ in range(self.lines.qsize()):
+            lines.append(self.lines.get())
+        if lines:
+            self.log_lines(lines[-self.scrollback:])
+        self.root.after(UPDATE_INTERVAL, self.update_view)
+
+    def log_lines(self, lines):
         # Zeigt Textnachrichten im Chatfenster an
         self.text_area.config(state='normal')
-        self.text_area.insert(tk.END, message + '\n')
+        self.text_area.insert(tk.END, '\n'.join(lines) + '\n')
+        excess = int(self.text_area.index('end-1c').split('.')[0]) - 1 \
+            - self.scrollback
+        if excess > 0:
+            self.text_area.delete('1.0', f'{excess + 1}.0')
         self.text_area.see(tk.END)
         self.text_area.config(state='disabled')
 
+    def on_close(self):
+        # Beim Schließen "leave"-Nachricht an den Server senden
+        self.core.leave()
+        self.core.close()
+        self.root.destroy()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat-Client (tkinter)")
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT,
+                        help="Port, auf dem Leader-Heartbeats ankommen")
+    parser.add_argument("--discovery-address", default=DISCOVERY_ADDRESS,
+                        help="Broadcast-Adresse oder Multicast-Gruppe der Server")
+    parser.add_argument("--scrollback", type=int, default=SCROLLBACK,
+                        help="Höchstens so viele Zeilen im Fenster behalten")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = ChatClient(root)
+    app = ChatClient(root, discovery_port=args.discovery_port,
+                     discovery_address=args.discovery_address,
+                     scrollback=args.scrollback)
     root.mainloop()
@@ -0,0 +1,37 @@
+import ipaddress
+import socket
+
+# Discovery-Kanal: Server und Clients finden sich über einen gemeinsamen
+# UDP-Port. Standard ist Broadcast im LAN; auf einem einzelnen Rechner
+# (Tests, Benchmarks) ersetzt die Loopback-Broadcast-Adresse oder eine
+# Multicast-Gruppe den Broadcast, damit mehrere Cluster nebeneinander laufen.
+
+DISCOVERY_PORT = 5010
+DISCOVERY_ADDRESS = "<broadcast>"
+LOOPBACK_BROADCAST = "127.255.255.255"
+
+
+def is_multicast(address):
+    try:
+        return ipaddress.ip_address(address).is_multicast
+    except ValueError:
+        return False
+
+
+def open_discovery_socket(port=DISCOVERY_PORT, address=DISCOVERY_ADDRESS,
+                          interface=""):
+    # Socket zum Senden und Empfangen auf dem Discovery-Port. Gebunden wird
+    # immer an alle Adressen, sonst kommen keine Broadcasts an; bei einer
+    # Multicast-Gruppe wird sie auf interface abonniert und von dort gesendet.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.bind(("", port))
+    if is_multicast(address):
+        local = socket.inet_aton(interface or "0.0.0.0")
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                        socket.inet_aton(address) + local)
+        if interface:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, local)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    return sock
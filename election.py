@@ -0,0 +1,79 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+# Hilfsstrukturen für die Leader-Wahl: ein sortierter Ring der Server-IDs,
+# der bei Join/Leave inkrementell gepflegt wird, und die Messung, wie lange
+# eine Wahl bis zur Einigung braucht.
+
+ALGORITHMS = ("ring", "bully")
+
+
+class RingIndex:
+    def __init__(self, ids=()):
+        self.ids = sorted(set(ids))
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, server_id):
+        with self.lock:
+            return self._find(server_id) is not None
+
+    def add(self, server_id):
+        with self.lock:
+            if self._find(server_id) is None:
+                insort(self.ids, server_id)
+
+    def remove(self, server_id):
+        with self.lock:
+            i = self._find(server_id)
+            if i is not None:
+                del self.ids[i]
+
+    def successor(self, server_id):
+        # Nächste ID im Ring (zyklisch), None wenn es keine andere gibt
+        with self.lock:
+            if not self.ids or self.ids == [server_id]:
+                return None
+            i = bisect_right(self.ids, server_id)
+            return self.ids[i % len(self.ids)]
+
+    def higher(self, server_id):
+        # Alle IDs, die größer sind (Kandidaten beim Bully-Algorithmus)
+        with self.lock:
+            return self.ids[bisect_right(self.ids, server_id):]
+
+    def _find(self, server_id):
+        i = bisect_left(self.ids, server_id)
+        if i < len(self.ids) and self.ids[i] == server_id:
+            return i
+        return None
+
+
+class ElectionStats:
+    def __init__(self, keep=100):
+        self.started_at = None
+        self.count = 0
+        self.durations = deque(maxlen=keep)
+
+    def start(self):
+        # Erste Beteiligung an einer Wahl merken
+        if self.started_at is None:
+            self.started_at = time.time()
+
+    def converged(self):
+        # Leader steht fest: Dauer seit Beginn der Wahl (oder None)
+        if self.started_at is None:
+            return None
+        duration = time.time() - self.started_at
+        self.started_at = None
+        self.count += 1
+        self.durations.append(duration)
+        return duration
+
+    @property
+    def last_duration(self):
+        return self.durations[-1] if self.durations else None
@@ -0,0 +1,160 @@
+import heapq
+import math
+import threading
+import time
+from collections import deque
+
+# Adaptiver Ausfalldetektor (Phi Accrual): statt eines festen Timeouts wird
+# je Peer die Verteilung der Abstände zwischen Heartbeats gelernt. Phi gibt
+# an, wie unwahrscheinlich die bisherige Stille ist (phi = 8 heißt etwa
+# 1 : 10^8). Den Zeitpunkt, an dem phi die Schwelle erreicht, hält ein
+# Heap der Fristen vor, sodass nicht alle Peers durchsucht werden müssen.
+
+PHI_THRESHOLD = 8.0
+WINDOW = 20  # gemerkte Abstände je Peer, passt sich schnell an
+MIN_STD = 0.05  # Untergrenze der Standardabweichung in Sekunden
+ACCEPTABLE_PAUSE = 0.3  # z.B. GC-Pausen oder ein verlorenes Paket
+
+
+class DeadlineHeap:
+    def __init__(self):
+        self.heap = []  # (frist, key)
+        self.deadlines = {}  # key: aktuelle frist
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, deadline):
+        # Setzt die Frist für key; ältere Einträge im Heap verfallen
+        with self.lock:
+            self.deadlines[key] = deadline
+            heapq.heappush(self.heap, (deadline, key))
+
+    def cancel(self, key):
+        with self.lock:
+            self.deadlines.pop(key, None)
+
+    def pop_due(self, now=None):
+        # Entfernt und liefert alle keys, deren Frist abgelaufen ist
+        now = time.time() if now is None else now
+        due = []
+        with self.lock:
+            while True:
+                self._discard_stale()
+                if not self.heap or self.heap[0][0] > now:
+                    return due
+                _, key = heapq.heappop(self.heap)
+                del self.deadlines[key]
+                due.append(key)
+
+    def _discard_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+
+class _History:
+    def __init__(self, window, first_interval):
+        # Startwerte wie nach zwei Heartbeats im erwarteten Abstand
+        self.intervals = deque(maxlen=window)
+        self.total = 0.0
+        self.squares = 0.0
+        for interval in (first_interval * 0.75, first_interval * 1.25):
+            self.add(interval)
+        self.last_arrival = None
+
+    def add(self, interval):
+        if len(self.intervals) == self.intervals.maxlen:
+            old = self.intervals[0]
+            self.total -= old
+            self.squares -= old * old
+        self.intervals.append(interval)
+        self.total += interval
+        self.squares += interval * interval
+
+    def mean(self):
+        return self.total / len(self.intervals)
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(0.0, self.squares / len(self.intervals) - mean * mean))
+
+
+class PhiAccrualDetector:
+    def __init__(self, threshold=PHI_THRESHOLD, window=WINDOW,
+                 min_std=MIN_STD, acceptable_pause=ACCEPTABLE_PAUSE,
+                 first_interval=1.0):
+        self.threshold = threshold
+        self.window = window
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self.first_interval = first_interval
+        self.peers = {}  # peer: _History
+        self.deadlines = DeadlineHeap()
+        self.lock = threading.Lock()
+        # Normierter Abstand, ab dem phi die Schwelle überschreitet
+        self.threshold_y = _solve_threshold(threshold)
+
+    def heartbeat(self, peer, now=None):
+        # Lebenszeichen von peer verbuchen und seine Frist neu setzen
+        now = time.time() if now is None else now
+        with self.lock:
+            history = self.peers.get(peer)
+            if history is None:
+                history = self.peers[peer] = _History(self.window,
+                                                      self.first_interval)
+            elif now > history.last_arrival:
+                history.add(now - history.last_arrival)
+            history.last_arrival = now
+            deadline = now + self._suspicion_delay(history)
+        self.deadlines.schedule(peer, deadline)
+
+    def phi(self, peer, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            history = self.peers.get(peer)
+            if history is None:
+                return 0.0
+            elapsed = now - history.last_arrival
+            mean = history.mean() + self.acceptable_pause
+            std = max(history.std(), self.min_std)
+        return _phi(elapsed, mean, std)
+
+    def suspected(self, now=None):
+        # Peers, deren phi seit dem letzten Aufruf die Schwelle erreicht hat
+        suspects = self.deadlines.pop_due(now)
+        with self.lock:
+            for peer in suspects:
+                self.peers.pop(peer, None)
+        return suspects
+
+    def forget(self, peer):
+        with self.lock:
+            self.peers.pop(peer, None)
+        self.deadlines.cancel(peer)
+
+    def _suspicion_delay(self, history):
+        std = max(history.std(), self.min_std)
+        return history.mean() + self.acceptable_pause + self.threshold_y * std
+
+
+def _phi(elapsed, mean, std):
+    # Logistische Näherung der Normalverteilung (wie in Akka)
+    # phi = log10(1 + e^z), so umgestellt, dass exp() bei großem |z|
+    # weder überläuft noch auf 0 fällt
+    y = (elapsed - mean) / std
+    z = y * (1.5976 + 0.070566 * y * y)
+    if z > 0:
+        return (z + math.log1p(math.exp(-z))) / math.log(10)
+    return math.log1p(math.exp(z)) / math.log(10)
+
+
+def _solve_threshold(threshold):
+    # y mit phi(y) = threshold per Newton-Verfahren bestimmen
+    p = 10 ** -threshold
+    target = -math.log(p / (1.0 - p))
+    y = 1.0
+    for _ in range(50):
+        f = y * (1.5976 + 0.070566 * y * y) - target
+        y -= f / (1.5976 + 3 * 0.070566 * y * y)
+    return y
@@ -0,0 +1,130 @@
+import random
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import wire
+
+# Zerlegt große Pakete in Fragmente, die unter die MTU passen, und setzt sie
+# beim Empfänger wieder zusammen. Unvollständige Nachrichten verfallen nach
+# einem Timeout; der belegte Speicher ist nach oben begrenzt.
+
+# Frame-Header + Nachrichten-ID, Offset, Gesamtlänge
+FRAGMENT_HEADER = struct.Struct("!BBBIIII")
+
+MAX_DATAGRAM = 1200  # Bleibt auch mit IP/UDP-Header unter üblichen MTUs
+MAX_MESSAGE_SIZE = 256 * 1024
+RECV_BUFFER_SIZE = 65535  # Größtes mögliches UDP-Datagramm
+
+
+class MessageTooLarge(ValueError):
+    pass
+
+
+class Fragmenter:
+    def __init__(self, max_datagram=MAX_DATAGRAM,
+                 max_message_size=MAX_MESSAGE_SIZE):
+        self.max_datagram = max_datagram
+        self.max_message_size = max_message_size
+        self.chunk_size = max_datagram - FRAGMENT_HEADER.size
+        self.next_id = random.getrandbits(32)
+        self.lock = threading.Lock()
+
+    def split(self, data):
+        # Liefert die zu sendenden Datagramme (unverändert, wenn klein genug)
+        total = len(data)
+        if total <= self.max_datagram:
+            return [data]
+        if total > self.max_message_size:
+            raise MessageTooLarge(
+                f"Message of {total} bytes exceeds limit of {self.max_message_size}")
+        with self.lock:
+            message_id = self.next_id
+            self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+
+        view = memoryview(data)
+        datagrams = []
+        for offset in range(0, total, self.chunk_size):
+            chunk = view[offset:offset + self.chunk_size]
+            datagrams.append(FRAGMENT_HEADER.pack(
+                wire.MAGIC, wire.VERSION, wire.KIND_FRAGMENT,
+                FRAGMENT_HEADER.size - wire.HEADER.size + len(chunk),
+                message_id, offset, total) + chunk)
+        return datagrams
+
+
+class _Partial:
+    def __init__(self, total):
+        self.buffer = bytearray(total)
+        self.offsets = set()
+        self.received = 0
+        self.started = time.time()
+
+
+class Reassembler:
+    def __init__(self, max_message_size=MAX_MESSAGE_SIZE, timeout=5.0,
+                 memory_limit=16 * 1024 * 1024):
+        self.max_message_size = max_message_size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.partials = OrderedDict()  # (peer, message_id): _Partial
+        self.buffered = 0
+        self.lock = threading.Lock()
+
+    def add(self, data, peer):
+        # Nimmt ein Datagramm an. Liefert das vollständige Paket, sobald es
+        # komplett ist; Datagramme ohne Fragmentierung werden durchgereicht.
+        if not is_fragment(data):
+            return data
+        if len(data) < FRAGMENT_HEADER.size:
+            raise ValueError("Truncated fragment header")
+        _, version, _, length, message_id, offset, total = \
+            FRAGMENT_HEADER.unpack_from(data, 0)
+        if version != wire.VERSION:
+            raise ValueError(f"Unsupported wire version {version}")
+        chunk = memoryview(data)[FRAGMENT_HEADER.size:wire.HEADER.size + length]
+        if total > self.max_message_size or offset + len(chunk) > total:
+            raise MessageTooLarge(f"Fragmented message of {total} bytes rejected")
+
+        with self.lock:
+            self.expire()
+            key = (peer, message_id)
+            partial = self.partials.get(key)
+            if partial is None:
+                self.make_room(total)
+                partial = self.partials[key] = _Partial(total)
+                self.buffered += total
+            if offset in partial.offsets:
+                return None  # Doppeltes Fragment
+            partial.buffer[offset:offset + len(chunk)] = chunk
+            partial.offsets.add(offset)
+            partial.received += len(chunk)
+            if partial.received < total:
+                return None
+            del self.partials[key]
+            self.buffered -= total
+            return partial.buffer
+
+    def expire(self):
+        # Verwirft unvollständige Nachrichten, deren Timeout abgelaufen ist
+        now = time.time()
+        while self.partials:
+            key, partial = next(iter(self.partials.items()))
+            if now - partial.started < self.timeout:
+                break
+            self.drop(key)
+
+    def make_room(self, needed):
+        # Älteste unvollständige Nachrichten verwerfen, bis needed Platz hat
+        while self.partials and self.buffered + needed > self.memory_limit:
+            self.drop(next(iter(self.partials)))
+
+    def drop(self, key):
+        partial = self.partials.pop(key)
+        self.buffered -= len(partial.buffer)
+
+
+def is_fragment(data):
+    return (len(data) > 2 and data[0] == wire.MAGIC
+            and data[2] == wire.KIND_FRAGMENT)
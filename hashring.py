@@ -0,0 +1,62 @@
+import bisect
+import hashlib
+import threading
+
+# Konsistentes Hashing für die Zuordnung Client -> Server: jeder Server
+# belegt viele virtuelle Punkte auf einem Ring, ein Client gehört dem
+# ersten Punkt im Uhrzeigersinn nach seinem eigenen Hash. Kommt ein Server
+# hinzu oder fällt weg, wechseln nur die Clients, deren Punkt er übernimmt
+# bzw. abgibt (im Mittel 1/n), alle anderen bleiben, wo sie sind.
+
+VNODES = 64  # virtuelle Punkte je Server, glättet die Verteilung
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self.nodes = set()
+        self.points = []  # sortierte Hashwerte
+        self.owners = {}  # hashwert: node
+        self.lock = threading.Lock()
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def add(self, node):
+        with self.lock:
+            if node in self.nodes:
+                return
+            self.nodes.add(node)
+            for i in range(self.vnodes):
+                point = _hash(f"{node}#{i}")
+                self.owners[point] = node
+                bisect.insort(self.points, point)
+
+    def remove(self, node):
+        with self.lock:
+            if node not in self.nodes:
+                return
+            self.nodes.discard(node)
+            for i in range(self.vnodes):
+                point = _hash(f"{node}#{i}")
+                if self.owners.get(point) == node:
+                    del self.owners[point]
+                    index = bisect.bisect_left(self.points, point)
+                    del self.points[index]
+
+    def owner(self, key):
+        # Server, dem key zugeordnet ist (None bei leerem Ring)
+        with self.lock:
+            if not self.points:
+                return None
+            index = bisect.bisect(self.points, _hash(key))
+            return self.owners[self.points[index % len(self.points)]]
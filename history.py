@@ -0,0 +1,292 @@
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+import wire
+from rooms import DEFAULT_ROOM
+
+# Chat-Verlauf: die letzten Nachrichten in einem Ringpuffer im Speicher,
+# optional dauerhaft in einem Append-only-Log aus Segmenten auf der Platte.
+# Jedes Segment deckt einen festen Bereich von Sequenznummern ab; sein Index
+# (per mmap eingeblendet) speichert je Sequenznummer den Offset im Log.
+
+RECORD_LENGTH = struct.Struct("!I")
+INDEX_ENTRY = struct.Struct("!Q")  # Offset + 1, 0 = nicht vorhanden
+
+RING_SIZE = 1000
+SEGMENT_ENTRIES = 65536
+MAX_SEGMENTS = 16
+MAX_PAGE = 100
+MAX_SENDERS = 4096  # gemerkte Absender für die Erkennung doppelter Nachrichten
+MAX_REORDER = 1024  # je Absender gemerkte msg_ids oberhalb einer Lücke
+
+
+class Segment:
+    def __init__(self, directory, base, entries):
+        self.base = base
+        self.entries = entries
+        name = os.path.join(directory, f"{base:020d}")
+        self.log = open(name + ".log", "ab+")
+        self.index_file = open(name + ".idx", "a+b")
+        if os.path.getsize(name + ".idx") < entries * INDEX_ENTRY.size:
+            self.index_file.truncate(entries * INDEX_ENTRY.size)
+        self.index = mmap.mmap(self.index_file.fileno(),
+                               entries * INDEX_ENTRY.size)
+
+    def append(self, seq, data):
+        offset = self.log.seek(0, os.SEEK_END)
+        self.log.write(RECORD_LENGTH.pack(len(data)) + data)
+        self.log.flush()
+        INDEX_ENTRY.pack_into(self.index, (seq - self.base) * INDEX_ENTRY.size,
+                              offset + 1)
+
+    def read(self, seq):
+        entry = INDEX_ENTRY.unpack_from(
+            self.index, (seq - self.base) * INDEX_ENTRY.size)[0]
+        if entry == 0:
+            return None
+        self.log.seek(entry - 1)
+        length = RECORD_LENGTH.unpack(self.log.read(RECORD_LENGTH.size))[0]
+        return wire.decode(self.log.read(length))
+
+    def last_seq(self):
+        # Höchste belegte Sequenznummer, von hinten im Index gesucht
+        for slot in range(self.entries - 1, -1, -1):
+            if INDEX_ENTRY.unpack_from(self.index, slot * INDEX_ENTRY.size)[0]:
+                return self.base + slot
+        return None
+
+    def close(self):
+        self.index.close()
+        self.index_file.close()
+        self.log.close()
+
+
+class SegmentLog:
+    def __init__(self, directory, entries=SEGMENT_ENTRIES,
+                 max_segments=MAX_SEGMENTS, max_open=4):
+        self.directory = directory
+        self.entries = entries
+        self.max_segments = max_segments
+        self.max_open = max_open
+        self.open_segments = OrderedDict()  # base: Segment
+        os.makedirs(directory, exist_ok=True)
+        self.bases = sorted(int(name[:-4]) for name in os.listdir(directory)
+                            if name.endswith(".idx"))
+
+    def base_for(self, seq):
+        return ((seq - 1) // self.entries) * self.entries + 1
+
+    def segment(self, base, create=False):
+        segment = self.open_segments.get(base)
+        if segment is not None:
+            self.open_segments.move_to_end(base)
+            return segment
+        if base not in self.bases:
+            if not create:
+                return None
+            self.bases.append(base)
+            self.bases.sort()
+            self.apply_retention()
+        segment = self.open_segments[base] = Segment(
+            self.directory, base, self.entries)
+        while len(self.open_segments) > self.max_open:
+            self.open_segments.popitem(last=False)[1].close()
+        return segment
+
+    def apply_retention(self):
+        # Älteste Segmente löschen, wenn es zu viele gibt
+        while len(self.bases) > self.max_segments:
+            base = self.bases.pop(0)
+            old = self.open_segments.pop(base, None)
+            if old is not None:
+                old.close()
+            for suffix in (".log", ".idx"):
+                path = os.path.join(self.directory, f"{base:020d}{suffix}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def append(self, seq, data):
+        self.segment(self.base_for(seq), create=True).append(seq, data)
+
+    def read(self, seq):
+        segment = self.segment(self.base_for(seq))
+        return segment.read(seq) if segment is not None else None
+
+    def first_seq(self):
+        return self.bases[0] if self.bases else None
+
+    def last_seq(self):
+        for base in reversed(self.bases):
+            seq = self.segment(base).last_seq()
+            if seq is not None:
+                return seq
+        return 0
+
+
+class SeenIds:
+    # msg_ids eines Absenders: alle bis "floor" und einzelne darüber. Nach
+    # einem Leaderwechsel kommen Nachrichten auf zwei Wegen (direkt und über
+    # einen Follower) und damit vertauscht an; eine kleinere msg_id als die
+    # höchste ist deshalb nicht automatisch doppelt.
+    def __init__(self, msg_id):
+        self.floor = msg_id - 1
+        self.above = set()
+        self.add(msg_id)
+
+    def __contains__(self, msg_id):
+        return msg_id <= self.floor or msg_id in self.above
+
+    def add(self, msg_id):
+        if msg_id <= self.floor:
+            return
+        self.above.add(msg_id)
+        if len(self.above) > MAX_REORDER:
+            # Lücke aufgeben, sie wird nicht mehr gefüllt
+            self.floor = min(self.above) - 1
+        while self.floor + 1 in self.above:
+            self.floor += 1
+            self.above.discard(self.floor)
+
+
+class History:
+    def __init__(self, directory=None, ring_size=RING_SIZE,
+                 segment_entries=SEGMENT_ENTRIES, max_segments=MAX_SEGMENTS):
+        self.ring = deque(maxlen=ring_size)
+        # Gesehene msg_ids je Absender: nach einem Leaderwechsel sendet der
+        # Client Unbestätigtes erneut, schon Gespeichertes wird verworfen
+        self.seen_ids = OrderedDict()  # sender: SeenIds
+        self.log = None
+        if directory:
+            self.log = SegmentLog(directory, segment_entries, max_segments)
+        last_seq = self.log.last_seq() if self.log is not None else 0
+        # Gemeinsamer Zähler im Shared Memory, damit auch Worker-Prozesse
+        # eindeutige Sequenznummern vergeben können
+        self.counter = multiprocessing.Value("Q", last_seq)
+        self.lock = threading.Lock()
+        if self.log is not None:
+            self.warm_up(last_seq)
+
+    @property
+    def last_seq(self):
+        return self.counter.value
+
+    def allocate(self):
+        # Nächste Sequenznummer vergeben
+        with self.counter.get_lock():
+            self.counter.value += 1
+            return self.counter.value
+
+    def advance(self, seq):
+        # Zähler mindestens auf seq setzen (z.B. nach Replikation)
+        with self.counter.get_lock():
+            if self.counter.value < seq:
+                self.counter.value = seq
+
+    def store(self, record):
+        # Nachricht mit bereits vergebener Sequenznummer ablegen. Von
+        # mehreren Prozessen vergebene Nummern können leicht vertauscht
+        # eintreffen; der Ringpuffer bleibt nach Sequenznummer sortiert.
+        with self.lock:
+            self.note_id(record["id"], record.get("msg_id"))
+            seq = record["seq"]
+            if not self.ring or self.ring[-1]["seq"] < seq:
+                self.ring.append(record)
+            else:
+                position = len(self.ring)
+                while position > 0 and self.ring[position - 1]["seq"] > seq:
+                    position -= 1
+                if len(self.ring) < self.ring.maxlen:
+                    self.ring.insert(position, record)
+                elif position > 0:
+                    # Voller Ring: ältesten Eintrag verdrängen (insert auf
+                    # einer vollen deque wirft IndexError); Nachzügler, die
+                    # älter als ring[0] sind, stehen nur noch im Log
+                    self.ring.popleft()
+                    self.ring.insert(position - 1, record)
+            if self.log is not None:
+                self.log.append(seq, wire.encode(record))
+
+    def note_id(self, sender, msg_id):
+        if msg_id is None:
+            return
+        seen = self.seen_ids.get(sender)
+        if seen is None:
+            self.seen_ids[sender] = SeenIds(msg_id)
+        else:
+            seen.add(msg_id)
+            self.seen_ids.move_to_end(sender)
+        while len(self.seen_ids) > MAX_SENDERS:
+            self.seen_ids.popitem(last=False)
+
+    def mark_seen(self, sender, msg_id):
+        # msg_id ohne Eintrag im eigenen Verlauf merken (Worker-Prozesse)
+        with self.lock:
+            self.note_id(sender, msg_id)
+
+    def is_duplicate(self, sender, msg_id):
+        # Nachricht dieses Absenders schon im Verlauf?
+        with self.lock:
+            seen = self.seen_ids.get(sender)
+            return seen is not None and msg_id in seen
+
+    def page(self, after=None, limit=50, rooms=None):
+        # Liefert (Nachrichten nach "after", weitere vorhanden?). Ohne
+        # "after" die letzten "limit" Nachrichten; mit "rooms" nur
+        # Nachrichten aus diesen Räumen.
+        limit = max(1, min(limit, MAX_PAGE))
+        latest = self.last_seq
+        if after is None:
+            after = max(0, latest - limit)
+        with self.lock:
+            if self.ring and (self.ring[0]["seq"] <= after + 1 or self.log is None):
+                records = [record for record in self.ring
+                           if record["seq"] > after
+                           and in_rooms(record, rooms)][:limit]
+            elif self.log is not None:
+                records = self.read_log(after, latest, limit, rooms)
+            else:
+                records = []
+        last = records[-1]["seq"] if records else latest
+        return records, len(records) == limit and last < latest
+
+    def read_log(self, after, latest, limit, rooms=None):
+        records = []
+        seq = max(after + 1, self.log.first_seq() or 1)
+        while seq <= latest and len(records) < limit:
+            record = self.log.read(seq)
+            if record is not None and in_rooms(record, rooms):
+                records.append(record)
+            seq += 1
+        return records
+
+    def warm_up(self, last_seq):
+        # Ringpuffer nach einem Neustart aus dem Log füllen
+        first = max(1, last_seq - self.ring.maxlen + 1)
+        for record in self.read_log(first - 1, last_seq, self.ring.maxlen):
+            self.note_id(record["id"], record.get("msg_id"))
+            self.ring.append(record)
+
+
+def make_record(seq, sender_id, sender_name, text, room=DEFAULT_ROOM,
+                msg_id=None):
+    record = {
+        "seq": seq,
+        "id": sender_id,
+        "sender_name": sender_name,
+        "text": text,
+        "room": room,
+        "time": time.time()
+    }
+    if msg_id is not None:
+        record["msg_id"] = msg_id
+    return record
+
+
+def in_rooms(record, rooms):
+    # Einträge von vor der Einführung der Räume gehören zur Lobby
+    return rooms is None or record.get("room", DEFAULT_ROOM) in rooms
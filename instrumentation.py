@@ -0,0 +1,155 @@
+import bisect
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Messwerte und Logging für den Server. Log-Ausgaben landen in einer
+# Queue und werden von einem eigenen Thread geschrieben, damit der
+# Empfangs-Thread nie auf stdout wartet. Zähler und Histogramme sind
+# billig genug für jedes Paket.
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+LOG_LEVELS = ("debug", "info", "warning", "error")
+
+# Obergrenzen der Histogramm-Klassen in Sekunden: 1 µs bis etwa 16 s
+BUCKETS = tuple(1e-6 * 2 ** k for k in range(25))
+
+_listener = None
+_queue_handler = None
+
+
+def setup_logging(level="info", stream=None):
+    # Einmal beim Start aufrufen; danach schreiben alle Logger über die Queue
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+
+def after_fork():
+    # Im geforkten Prozess fehlt der Schreib-Thread: neu aufsetzen
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    logging.getLogger().removeHandler(_queue_handler)
+    records = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    logging.getLogger().addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(records, *handlers)
+    _listener.start()
+
+
+def stop_logging():
+    # Restliche Einträge schreiben (z.B. vor dem Beenden)
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Obergrenze der Klasse, in die das Quantil fällt
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}  # name: Zahl
+        self.histograms = {}  # name: Histogram
+        self.gauges = {}  # name: Funktion, erst beim Auslesen aufgerufen
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def snapshot(self):
+        # Alle Werte als dict (z.B. für die Stats-Abfrage oder das Log)
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: histogram.summary()
+                          for name, histogram in self.histograms.items()}
+        gauges = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = repr(e)
+        return {
+            "uptime": time.time() - self.started,
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms
+        }
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,286 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from failure_detector import DeadlineHeap
+
+# Mitgliedschaft der Server nach SWIM: in jeder Runde wird ein Mitglied per
+# ping geprüft; antwortet es nicht, fragen k zufällige andere Mitglieder
+# stellvertretend nach (ping_req). Erst danach gilt es als verdächtig und
+# nach Ablauf der Frist als ausgefallen. Änderungen (alive/suspect/dead)
+# werden an die Protokollpakete angehängt und so im Cluster verbreitet;
+# die Last je Server bleibt unabhängig von der Clustergröße.
+
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+
+PROBE_PERIOD = 0.5
+PING_TIMEOUT = 0.15
+INDIRECT_PROBES = 3
+SUSPICION_TIMEOUT = 1.5
+MAX_PIGGYBACK = 8  # Änderungen je Paket
+RETRANSMIT_MULT = 3  # Änderung wird etwa RETRANSMIT_MULT * log(n) mal verbreitet
+JOIN_RETRY = 2.0
+
+# Pakettypen des Protokolls (über den Steuerport)
+MEMBERSHIP_TYPES = ("ping", "ping_req", "ping_ack")
+
+
+class Membership:
+    def __init__(self, member_id, port, send, on_alive=None, on_dead=None,
+                 period=PROBE_PERIOD, ping_timeout=PING_TIMEOUT,
+                 indirect_probes=INDIRECT_PROBES,
+                 suspicion_timeout=SUSPICION_TIMEOUT, meta=None):
+        # send(message, address) verschickt ein Protokollpaket (dict)
+        self.id = member_id
+        self.port = port
+        # Zusatzangaben über uns (z.B. weitere Ports), werden mitverbreitet
+        self.meta = meta
+        self.send = send
+        # on_alive(member), on_dead(member): Mitglied neu/zurück bzw. weg
+        self.on_alive = on_alive
+        self.on_dead = on_dead
+        self.period = period
+        self.ping_timeout = ping_timeout
+        self.indirect_probes = indirect_probes
+        self.suspicion_timeout = suspicion_timeout
+
+        self.incarnation = 0
+        self.members = {}  # id: {id, ip, port, state, incarnation, meta}
+        self.gossip = OrderedDict()  # id: [update, gesendet]
+        self.probe_order = []
+        self.next_seq = 1
+        self.probes = {}  # seq: id des geprüften Mitglieds
+        self.relays = {}  # seq: (adresse des Anfragenden, dessen seq)
+        self.deadlines = DeadlineHeap()
+        self.next_probe_at = 0
+        self.seeds = []
+        self.joined_at = 0
+        self.lock = threading.RLock()
+
+    def alive_members(self):
+        with self.lock:
+            return [m for m in self.members.values() if m["state"] != DEAD]
+
+    def join(self, seeds):
+        # Bootstrap über bekannte Seed-Adressen (host, port)
+        self.seeds = list(seeds)
+        self.joined_at = time.time()
+        for address in self.seeds:
+            self.send(self._message("ping", 0), address)
+
+    def learn(self, member_id, ip, port, meta=None):
+        # Mitglied z.B. per Broadcast-Discovery kennengelernt
+        self._merge([member_id, ip, port, ALIVE, 0, meta])
+
+    def suspect(self, member_id):
+        # Lokaler Verdacht (z.B. Ausfalldetektor oder Zustellfehler)
+        with self.lock:
+            member = self.members.get(member_id)
+            if member is None or member["state"] != ALIVE:
+                return
+            update = [member_id, member["ip"], member["port"], SUSPECT,
+                      member["incarnation"], member["meta"]]
+        self._merge(update)
+
+    def tick(self, now=None):
+        # Periodisch aufrufen: Fristen auswerten, nächste Runde starten
+        now = time.time() if now is None else now
+        for key in self.deadlines.pop_due(now):
+            kind, value = key
+            if kind == "probe":
+                self._probe_timed_out(value)
+            elif kind == "indirect":
+                self._indirect_timed_out(value)
+            elif kind == "suspect":
+                self._suspicion_expired(*value)
+            elif kind == "relay":
+                self.relays.pop(value, None)
+        if now >= self.next_probe_at:
+            self.next_probe_at = now + self.period
+            self._probe_next()
+        if (self.seeds and not self.alive_members()
+                and now - self.joined_at >= JOIN_RETRY):
+            self.join(self.seeds)
+
+    def handle(self, data, address):
+        # Verarbeitet ping, ping_req und ping_ack
+        sender_id = data["id"]
+        known = sender_id in self.members
+        if sender_id != self.id:
+            self._merge([sender_id, address[0], data["port"], ALIVE,
+                         data["inc"], data.get("meta")])
+        for update in data.get("members", ()):
+            self._merge(update)
+        for update in data.get("updates", ()):
+            self._merge(update)
+
+        kind = data["type"]
+        if kind == "ping":
+            reply = self._message("ping_ack", data["seq"])
+            if not known:
+                # Neues Mitglied bekommt die komplette Liste
+                reply["members"] = [self._update(m)
+                                    for m in self.alive_members()]
+            self.send(reply, address)
+        elif kind == "ping_req":
+            with self.lock:
+                seq = self._allocate_seq()
+                self.relays[seq] = (address, data["seq"])
+            self.deadlines.schedule(("relay", seq),
+                                    time.time() + 2 * self.ping_timeout)
+            self.send(self._message("ping", seq),
+                      (data["target_ip"], data["target_port"]))
+        elif kind == "ping_ack":
+            seq = data["seq"]
+            with self.lock:
+                relay = self.relays.pop(seq, None)
+                target = self.probes.pop(seq, None)
+            if relay is not None:
+                self.send(self._message("ping_ack", relay[1]), relay[0])
+            elif target is not None:
+                self.deadlines.cancel(("probe", seq))
+                self.deadlines.cancel(("indirect", seq))
+
+    def _probe_next(self):
+        with self.lock:
+            if not self.probe_order:
+                self.probe_order = [m["id"] for m in self.alive_members()]
+                random.shuffle(self.probe_order)
+            while self.probe_order:
+                member = self.members.get(self.probe_order.pop())
+                if member is not None and member["state"] != DEAD:
+                    break
+            else:
+                return
+            seq = self._allocate_seq()
+            self.probes[seq] = member["id"]
+        self.deadlines.schedule(("probe", seq), time.time() + self.ping_timeout)
+        self.send(self._message("ping", seq), (member["ip"], member["port"]))
+
+    def _probe_timed_out(self, seq):
+        # Keine direkte Antwort: andere Mitglieder stellvertretend fragen
+        with self.lock:
+            member = self.members.get(self.probes.get(seq))
+            if member is None:
+                self.probes.pop(seq, None)
+                return
+            helpers = [m for m in self.alive_members()
+                       if m["id"] != member["id"] and m["state"] == ALIVE]
+            helpers = random.sample(helpers,
+                                    min(self.indirect_probes, len(helpers)))
+        request = self._message("ping_req", seq)
+        request.update(target_ip=member["ip"], target_port=member["port"])
+        for helper in helpers:
+            self.send(request, (helper["ip"], helper["port"]))
+        self.deadlines.schedule(("indirect", seq),
+                                time.time() + self.period - self.ping_timeout)
+
+    def _indirect_timed_out(self, seq):
+        with self.lock:
+            member_id = self.probes.pop(seq, None)
+        if member_id is not None:
+            self.suspect(member_id)
+
+    def _suspicion_expired(self, member_id, incarnation):
+        with self.lock:
+            member = self.members.get(member_id)
+            if (member is None or member["state"] != SUSPECT
+                    or member["incarnation"] != incarnation):
+                return  # Inzwischen widerlegt
+            update = [member_id, member["ip"], member["port"], DEAD,
+                      incarnation, member["meta"]]
+        self._merge(update)
+
+    def _merge(self, update):
+        # Übernimmt eine Änderung, falls sie neuer ist als der bekannte Stand
+        member_id, ip, port, state, incarnation = update[:5]
+        meta = update[5] if len(update) > 5 else None
+        if member_id == self.id:
+            if state != ALIVE and incarnation >= self.incarnation:
+                # Verdacht gegen uns selbst widerlegen
+                with self.lock:
+                    self.incarnation = incarnation + 1
+                    self._spread([self.id, None, self.port, ALIVE,
+                                  self.incarnation, self.meta])
+            return
+
+        with self.lock:
+            member = self.members.get(member_id)
+            if member is None:
+                if ip is None:
+                    return  # Widerlegung für ein unbekanntes Mitglied
+                previous = None
+            else:
+                previous = member["state"]
+                current = member["incarnation"]
+                if member["meta"] is None and meta is not None:
+                    member["meta"] = meta  # auch aus einer älteren Änderung
+                if previous == DEAD and state != ALIVE:
+                    return  # Nur ein neueres alive (Wiedereintritt) zählt
+                if state == ALIVE and incarnation <= current:
+                    return
+                if state == SUSPECT and (incarnation < current or (
+                        incarnation == current and previous != ALIVE)):
+                    return
+            member = self.members[member_id] = {
+                "id": member_id,
+                "ip": ip if ip is not None else member["ip"],
+                "port": port,
+                "state": state,
+                "incarnation": incarnation,
+                "meta": meta if meta is not None else (
+                    member["meta"] if member is not None else None)
+            }
+            self._spread(self._update(member))
+
+        if state == SUSPECT:
+            self.deadlines.schedule(("suspect", (member_id, incarnation)),
+                                    time.time() + self.suspicion_timeout)
+        elif state == ALIVE and previous != ALIVE:
+            if self.on_alive is not None:
+                self.on_alive(member)
+        elif state == DEAD and previous is not None:
+            if self.on_dead is not None:
+                self.on_dead(member)
+
+    def _spread(self, update):
+        self.gossip[update[0]] = [update, 0]
+        self.gossip.move_to_end(update[0])
+
+    def _piggyback(self):
+        # Die am seltensten verbreiteten Änderungen anhängen
+        with self.lock:
+            limit = RETRANSMIT_MULT * math.ceil(
+                math.log10(len(self.members) + 1) + 1)
+            entries = sorted(self.gossip.values(), key=lambda e: e[1])
+            updates = []
+            for entry in entries[:MAX_PIGGYBACK]:
+                entry[1] += 1
+                updates.append(entry[0])
+                if entry[1] >= limit:
+                    del self.gossip[entry[0][0]]
+            return updates
+
+    def _message(self, kind, seq):
+        return {
+            "type": kind,
+            "id": self.id,
+            "port": self.port,
+            "inc": self.incarnation,
+            "seq": seq,
+            "meta": self.meta,
+            "updates": self._piggyback()
+        }
+
+    def _update(self, member):
+        return [member["id"], member["ip"], member["port"], member["state"],
+                member["incarnation"], member["meta"]]
+
+    def _allocate_seq(self):
+        seq = self.next_seq
+        self.next_seq += 1
+        return seq
@@ -0,0 +1,205 @@
+import ctypes
+import socket
+import sys
+import threading
+from collections import deque
+
+import wire
+from fragment import MAX_DATAGRAM
+
+# Ausgehende Pakete an Clients: je Client eine begrenzte Warteschlange, die
+# im Takt des Koaleszenzfensters geleert wird. Kleine Pakete werden dabei
+# zu einem Batch-Frame zusammengefasst (vor der Zustellschicht, also ein
+# zuverlässiges Datagramm für mehrere Chat-Nachrichten). Kommt ein Client
+# nicht hinterher, bleiben seine Pakete in der Schlange; läuft sie über,
+# werden die ältesten verworfen und durch einen Hinweis ersetzt.
+
+COALESCE_WINDOW = 0.005
+MAX_QUEUE = 256
+# Platz für Header der Zustellschicht, damit ein Batch nicht fragmentiert
+MAX_BATCH_BYTES = MAX_DATAGRAM - 64
+
+
+class _Queue:
+    def __init__(self, batch):
+        self.batch = batch
+        self.payloads = deque()
+        self.dropped = 0
+
+
+class OutboundScheduler:
+    def __init__(self, send, can_send=None, summarize=None,
+                 max_queue=MAX_QUEUE, max_batch_bytes=MAX_BATCH_BYTES):
+        # send(key, payload) verschickt ein fertiges Paket an den Client key
+        self.send = send
+        # can_send(key): False, solange der Client noch nicht nachkommt
+        self.can_send = can_send
+        # summarize(key, dropped): Ersatzpaket für verworfene Pakete
+        self.summarize = summarize
+        self.max_queue = max_queue
+        self.max_batch_bytes = max_batch_bytes
+        self.queues = {}  # key: _Queue
+        self.lock = threading.Lock()
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def enqueue(self, key, payload, batch=True):
+        # Paket für key einreihen; batch=False für Clients ohne Batch-Frames
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = _Queue(batch)
+            if len(queue.payloads) >= self.max_queue:
+                queue.payloads.popleft()
+                queue.dropped += 1
+                self.dropped += 1
+            queue.payloads.append(payload)
+            self.enqueued += 1
+
+    def forget(self, key):
+        with self.lock:
+            self.queues.pop(key, None)
+
+    def pending(self, key):
+        with self.lock:
+            queue = self.queues.get(key)
+            return 0 if queue is None else len(queue.payloads)
+
+    def flush(self):
+        # Im Takt des Koaleszenzfensters aufrufen
+        ready = []
+        with self.lock:
+            for key, queue in list(self.queues.items()):
+                if self.can_send is not None and not self.can_send(key):
+                    continue  # Langsamer Client: Schlange bleibt stehen
+                del self.queues[key]
+                ready.append((key, queue))
+        for key, queue in ready:
+            payloads = list(queue.payloads)
+            if queue.dropped and self.summarize is not None:
+                payloads.insert(0, self.summarize(key, queue.dropped))
+            if queue.batch:
+                payloads = self.pack(payloads)
+            for payload in payloads:
+                self.send(key, payload)
+                self.sent += 1
+
+    def pack(self, payloads):
+        # Aufeinanderfolgende kleine Pakete zu Batches zusammenfassen
+        packed = []
+        group = []
+        size = 0
+        for payload in payloads:
+            entry = len(payload) + 4
+            if group and size + entry > self.max_batch_bytes:
+                packed.append(self._finish(group))
+                group, size = [], 0
+            group.append(payload)
+            size += entry
+        if group:
+            packed.append(self._finish(group))
+        return packed
+
+    def _finish(self, group):
+        return group[0] if len(group) == 1 else wire.batch(group)
+
+
+# sendmmsg(2) über ctypes: viele Datagramme mit einem Systemaufruf
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IoVec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort),
+                ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_ubyte * 4),
+                ("sin_zero", ctypes.c_ubyte * 8)]
+
+
+def _load_sendmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr),
+                         ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+class BulkSender:
+    def __init__(self, sock, fallback):
+        # fallback(datagram, address): Einzelversand, falls sendmmsg fehlt
+        # oder nicht alle Datagramme angenommen wurden
+        self.sock = sock
+        self.fallback = fallback
+        self.available = _sendmmsg is not None and sock.family == socket.AF_INET
+        self.addresses = {}  # (ip, port): _SockAddrIn
+        self.calls = 0
+
+    def send(self, datagrams):
+        # datagrams: Liste von (bytes, (ip, port)); liefert die Anzahl der
+        # per sendmmsg verschickten, der Rest geht über fallback
+        if not datagrams:
+            return 0
+        sent = 0
+        if self.available:
+            sent = self._sendmmsg(datagrams)
+        for datagram, address in datagrams[sent:]:
+            self.fallback(datagram, address)
+        return sent
+
+    def _sendmmsg(self, datagrams):
+        count = len(datagrams)
+        messages = (_MMsgHdr * count)()
+        vectors = (_IoVec * count)()
+        buffers = []
+        for i, (datagram, address) in enumerate(datagrams):
+            buffer = ctypes.create_string_buffer(bytes(datagram), len(datagram))
+            buffers.append(buffer)
+            vectors[i].iov_base = ctypes.cast(buffer, ctypes.c_void_p)
+            vectors[i].iov_len = len(datagram)
+            name = self._address(address)
+            header = messages[i].msg_hdr
+            header.msg_name = ctypes.cast(ctypes.pointer(name), ctypes.c_void_p)
+            header.msg_namelen = ctypes.sizeof(name)
+            header.msg_iov = ctypes.pointer(vectors[i])
+            header.msg_iovlen = 1
+        self.calls += 1
+        sent = _sendmmsg(self.sock.fileno(), messages, count, 0)
+        return max(sent, 0)
+
+    def _address(self, address):
+        name = self.addresses.get(address)
+        if name is None:
+            if len(self.addresses) > 4096:
+                self.addresses.clear()
+            name = _SockAddrIn()
+            name.sin_family = socket.AF_INET
+            name.sin_port = socket.htons(address[1])
+            name.sin_addr[:] = socket.inet_aton(socket.gethostbyname(address[0]))
+            self.addresses[address] = name
+        return name
@@ -0,0 +1,83 @@
+import threading
+import time
+
+# Zulassung auf dem Datenpfad: je Client ein Token-Bucket. Jedes Paket
+# kostet ein Token, Tokens füllen sich mit fester Rate bis zur Burst-Größe
+# wieder auf. Ein einzelner Client, der flutet, verbraucht so nur seinen
+# eigenen Anteil und verzögert weder andere Clients noch den Leader.
+
+CLIENT_RATE = 50.0  # Pakete pro Sekunde im Mittel
+CLIENT_BURST = 100  # kurzzeitig erlaubte Spitze
+MAX_BUCKETS = 4096  # darüber werden volle (ruhende) Buckets entfernt
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+        self.streak = 0  # abgelehnte Pakete seit dem letzten zugelassenen
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.streak = 0
+            return True
+        self.streak += 1
+        return False
+
+
+class RateLimiter:
+    def __init__(self, rate=CLIENT_RATE, burst=CLIENT_BURST,
+                 max_buckets=MAX_BUCKETS):
+        # rate <= 0 schaltet die Begrenzung ab
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_buckets = max_buckets
+        self.buckets = {}  # key: TokenBucket
+        self.lock = threading.Lock()
+
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self, key, now=None):
+        # True, falls das Paket von key bearbeitet werden darf
+        if self.rate <= 0:
+            return True
+        now = time.time() if now is None else now
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self.buckets[key] = TokenBucket(self.rate,
+                                                         self.burst, now)
+            if bucket.take(now):
+                self.admitted += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def streak(self, key):
+        # Anzahl der zuletzt in Folge abgelehnten Pakete von key
+        with self.lock:
+            bucket = self.buckets.get(key)
+            return 0 if bucket is None else bucket.streak
+
+    def forget(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+    def _prune(self, now):
+        for key, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self.buckets[key]
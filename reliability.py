@@ -0,0 +1,267 @@
+import random
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+import wire
+
+# Zuverlässige, geordnete Zustellung über UDP. Jeder Sender nummeriert seine
+# Pakete je Empfänger fortlaufend; Empfänger bestätigen kumulativ und selektiv
+# (gesammelt im Takt von tick()) und melden Lücken per NACK. Unbestätigte
+# Pakete werden nach Timeout erneut gesendet, höchstens "window" Pakete sind
+# gleichzeitig unterwegs.
+
+# Frame-Header + session, epoch, seq, base (ältestes noch vorgehaltenes Paket).
+# session kennzeichnet den sendenden Prozess, epoch den Strom zu einem Peer.
+DATA_HEADER = struct.Struct("!BBBIIHII")
+# session, epoch, kumulatives ACK, Anzahl SACKs, Anzahl NACKs
+ACK_HEADER = struct.Struct("!IHIHH")
+SEQ = struct.Struct("!I")
+
+MAX_NACKS = 32
+
+
+class _Outgoing:
+    def __init__(self, rto, max_retries):
+        self.epoch = random.getrandbits(16)
+        self.rto = rto
+        self.max_retries = max_retries
+        self.next_seq = 1
+        self.unacked = OrderedDict()  # seq: [frame, gesendet_um, versuche]
+        self.backlog = deque()
+
+
+class _Incoming:
+    def __init__(self):
+        self.expected = 1
+        self.buffered = {}  # seq: payload (außer der Reihe empfangen)
+        self.ack_due = False
+        self.last_activity = time.time()
+
+
+class ReliableChannel:
+    def __init__(self, send, window=64, max_backlog=1024, rto=0.5,
+                 max_retries=6, idle_timeout=120, session=None,
+                 on_give_up=None, on_foreign_ack=None):
+        # send(frame, peer) verschickt ein fertiges Datagramm
+        self.send_raw = send
+        self.window = window
+        self.max_backlog = max_backlog
+        self.rto = rto
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.session = session if session is not None else new_session()
+        # on_give_up(peer, payloads): Empfänger antwortet nicht mehr
+        self.on_give_up = on_give_up
+        # on_foreign_ack(frame, peer, session): ACK für eine andere Sitzung
+        self.on_foreign_ack = on_foreign_ack
+
+        self.outgoing = {}  # peer: _Outgoing
+        self.incoming = {}  # (peer, session, epoch): _Incoming
+        self.lock = threading.RLock()
+
+    def send(self, payload, peer, rto=None, max_retries=None):
+        # Verschickt ein bereits kodiertes Paket zuverlässig an peer.
+        # rto/max_retries gelten abweichend für den gesamten Strom zu peer
+        # (z.B. kürzere Timeouts zwischen Servern).
+        with self.lock:
+            out = self.outgoing.get(peer)
+            if out is None:
+                out = self.outgoing[peer] = _Outgoing(
+                    self.rto if rto is None else rto,
+                    self.max_retries if max_retries is None else max_retries)
+            if len(out.unacked) < self.window:
+                self._transmit(out, payload, peer)
+                return True
+            if len(out.backlog) >= self.max_backlog:
+                out.backlog.popleft()  # Ältestes Paket verwerfen
+                out.backlog.append(payload)
+                return False
+            out.backlog.append(payload)
+            return True
+
+    def receive(self, data, peer):
+        # Liefert die in Reihenfolge zustellbaren Pakete eines Datagramms.
+        # Nicht zuverlässige Datagramme werden unverändert durchgereicht.
+        if not wire.is_binary(data):
+            return [data]
+        kind = data[2]
+        if kind == wire.KIND_RELIABLE:
+            return self._receive_data(data, peer)
+        if kind == wire.KIND_ACK:
+            self._receive_ack(data, peer)
+            return []
+        return [data]
+
+    def tick(self):
+        # Periodisch aufrufen: gesammelte ACKs senden, Timeouts behandeln
+        now = time.time()
+        given_up = []
+        with self.lock:
+            for key, inc in list(self.incoming.items()):
+                if inc.ack_due:
+                    self._send_ack(key, inc)
+                elif now - inc.last_activity > self.idle_timeout:
+                    del self.incoming[key]
+
+            for peer, out in list(self.outgoing.items()):
+                for seq, entry in out.unacked.items():
+                    frame, sent_at, retries = entry
+                    if now - sent_at < out.rto * (2 ** retries):
+                        continue
+                    if retries >= out.max_retries:
+                        given_up.append((peer, self._drop_peer(peer)))
+                        break
+                    entry[1] = now
+                    entry[2] = retries + 1
+                    self.send_raw(frame, peer)
+
+        if self.on_give_up is not None:
+            for peer, payloads in given_up:
+                self.on_give_up(peer, payloads)
+
+    def forget(self, peer):
+        # Entfernt allen Zustand zu peer (z.B. nach dem Abmelden)
+        with self.lock:
+            self.outgoing.pop(peer, None)
+            for key in [key for key in self.incoming if key[0] == peer]:
+                del self.incoming[key]
+
+    def take_pending(self, peer):
+        # Entfernt den Strom zu peer und liefert seine unbestätigten und
+        # wartenden Pakete, z.B. um sie an einen anderen Peer zu senden
+        with self.lock:
+            if peer not in self.outgoing:
+                return []
+            return self._drop_peer(peer)
+
+    def pending(self, peer):
+        # Anzahl unbestätigter und wartender Pakete für peer
+        with self.lock:
+            out = self.outgoing.get(peer)
+            return 0 if out is None else len(out.unacked) + len(out.backlog)
+
+    def _transmit(self, out, payload, peer):
+        seq = out.next_seq
+        out.next_seq += 1
+        base = next(iter(out.unacked), seq)
+        frame = DATA_HEADER.pack(
+            wire.MAGIC, wire.VERSION, wire.KIND_RELIABLE,
+            DATA_HEADER.size - wire.HEADER.size + len(payload),
+            self.session, out.epoch, seq, base) + payload
+        out.unacked[seq] = [frame, time.time(), 0]
+        self.send_raw(frame, peer)
+
+    def _drop_peer(self, peer):
+        out = self.outgoing.pop(peer)
+        payloads = [bytes(entry[0][DATA_HEADER.size:])
+                    for entry in out.unacked.values()]
+        return payloads + list(out.backlog)
+
+    def _receive_data(self, data, peer):
+        if len(data) < DATA_HEADER.size:
+            raise ValueError("Truncated reliable frame")
+        _, version, _, _, session, epoch, seq, base = DATA_HEADER.unpack_from(
+            data, 0)
+        if version != wire.VERSION:
+            raise ValueError(f"Unsupported wire version {version}")
+        payload = memoryview(data)[DATA_HEADER.size:]
+
+        with self.lock:
+            key = (peer, session, epoch)
+            inc = self.incoming.get(key)
+            if inc is None:
+                inc = self.incoming[key] = _Incoming()
+            inc.last_activity = time.time()
+            inc.ack_due = True
+
+            # Ältere Pakete hält der Sender nicht mehr vor (z.B. nach einem
+            # Neustart des Empfängers): direkt zum ältesten offenen springen
+            if base > inc.expected:
+                inc.expected = base
+                for old in [s for s in inc.buffered if s < base]:
+                    del inc.buffered[old]
+
+            if seq < inc.expected or seq in inc.buffered:
+                return []  # Duplikat, wird nur erneut bestätigt
+            if seq > inc.expected:
+                if seq - inc.expected < 2 * self.window:
+                    inc.buffered[seq] = bytes(payload)
+                return []
+
+            delivered = [payload]
+            inc.expected += 1
+            while inc.expected in inc.buffered:
+                delivered.append(inc.buffered.pop(inc.expected))
+                inc.expected += 1
+            return delivered
+
+    def _send_ack(self, key, inc):
+        peer, session, epoch = key
+        sacks = sorted(inc.buffered)
+        nacks = []
+        if sacks:
+            received = set(sacks)
+            for seq in range(inc.expected, sacks[-1]):
+                if seq not in received:
+                    nacks.append(seq)
+                    if len(nacks) >= MAX_NACKS:
+                        break
+        body = ACK_HEADER.pack(session, epoch, inc.expected - 1,
+                               len(sacks), len(nacks))
+        body += b"".join(SEQ.pack(seq) for seq in sacks + nacks)
+        self.send_raw(wire.frame(wire.KIND_ACK, body), peer)
+        inc.ack_due = False
+
+    def _receive_ack(self, data, peer):
+        kind, body = wire.unpack_frame(data)
+        session, epoch, cumulative, n_sack, n_nack = ACK_HEADER.unpack_from(
+            body, 0)
+        if session != self.session:
+            if self.on_foreign_ack is not None:
+                self.on_foreign_ack(data, peer, session)
+            return
+        offset = ACK_HEADER.size
+        sacks = [SEQ.unpack_from(body, offset + 4 * i)[0] for i in range(n_sack)]
+        offset += 4 * n_sack
+        nacks = [SEQ.unpack_from(body, offset + 4 * i)[0] for i in range(n_nack)]
+
+        with self.lock:
+            out = self.outgoing.get(peer)
+            if out is None or out.epoch != epoch:
+                return  # ACK für einen bereits verworfenen Strom
+            while out.unacked:
+                seq = next(iter(out.unacked))
+                if seq > cumulative:
+                    break
+                del out.unacked[seq]
+            for seq in sacks:
+                out.unacked.pop(seq, None)
+
+            # NACK: Lücke sofort schließen, aber nicht öfter als nötig
+            now = time.time()
+            for seq in nacks:
+                entry = out.unacked.get(seq)
+                if entry is not None and now - entry[1] >= out.rto / 4:
+                    entry[1] = now
+                    self.send_raw(entry[0], peer)
+
+            while out.backlog and len(out.unacked) < self.window:
+                self._transmit(out, out.backlog.popleft(), peer)
+
+
+def new_session():
+    return random.getrandbits(32)
+
+
+def payload_of(data):
+    # Nutzdaten eines zuverlässigen Frames, andere Datagramme unverändert
+    if wire.is_binary(data) and len(data) > 2 and data[2] == wire.KIND_RELIABLE:
+        return data[DATA_HEADER.size:]
+    return data
+
+
+def is_ack(data):
+    # Reine Bestätigung ohne Nutzdaten
+    return wire.is_binary(data) and len(data) > 2 and data[2] == wire.KIND_ACK
@@ -0,0 +1,86 @@
+from collections import deque
+
+# Replikation vom Leader zu den Followern: jede Änderung an der Client-
+# Registry (join/leave) und jede Chat-Nachricht wird als Eintrag mit
+# fortlaufendem Index in ein Log geschrieben und an die Follower gestreamt.
+# Wer zu weit zurückliegt, bekommt einen Snapshot in mehreren Teilen.
+
+LOG_SIZE = 10000
+SNAPSHOT_PART_SIZE = 500  # Clients je Snapshot-Teil
+
+
+class ReplicationLog:
+    def __init__(self, max_entries=LOG_SIZE):
+        self.entries = deque(maxlen=max_entries)  # (index, entry)
+        self.last_index = 0
+
+    def append(self, entry):
+        # Neuer Eintrag auf dem Leader, liefert seinen Index
+        self.last_index += 1
+        self.entries.append((self.last_index, entry))
+        return self.last_index
+
+    def append_at(self, index, entry):
+        # Vom Leader übernommener Eintrag auf einem Follower
+        self.entries.append((index, entry))
+        self.last_index = index
+
+    def reset(self, index):
+        # Nach einem Snapshot: älteres Log ist nicht mehr gültig
+        self.entries.clear()
+        self.last_index = index
+
+    def since(self, after):
+        # Einträge nach "after" oder None, falls nicht mehr vorhanden
+        if after == self.last_index:
+            return []
+        if after > self.last_index or not self.entries:
+            return None
+        first_index = self.entries[0][0]
+        if after + 1 < first_index:
+            return None
+        return [entry for entry in self.entries if entry[0] > after]
+
+
+def snapshot_parts(leader, index, clients, next_client_number, last_seq,
+                   rooms, part_size=SNAPSHOT_PART_SIZE):
+    # Zerlegt den Zustand in Pakete, die auch bei vielen Clients
+    # handlich groß bleiben. rooms(client_id) liefert die Räume eines Clients.
+    items = list(clients.items())
+    chunks = [dict(items[i:i + part_size])
+              for i in range(0, len(items), part_size)] or [{}]
+    return [{
+        "type": "snapshot",
+        "leader": leader,
+        "index": index,
+        "part": number,
+        "parts": len(chunks),
+        "clients": chunk,
+        "rooms": {client_id: rooms(client_id) for client_id in chunk},
+        "next_client_number": next_client_number,
+        "last_seq": last_seq
+    } for number, chunk in enumerate(chunks)]
+
+
+class SnapshotAssembler:
+    def __init__(self):
+        self.index = None
+        self.parts = {}
+
+    def add(self, part):
+        # Liefert den vollständigen Snapshot, sobald alle Teile da sind
+        if part["index"] != self.index:
+            self.index = part["index"]
+            self.parts = {}
+        self.parts[part["part"]] = part
+        if len(self.parts) < part["parts"]:
+            return None
+        clients = {}
+        rooms = {}
+        for number in sorted(self.parts):
+            clients.update(self.parts[number]["clients"])
+            rooms.update(self.parts[number]["rooms"])
+        snapshot = dict(part, clients=clients, rooms=rooms)
+        self.index = None
+        self.parts = {}
+        return snapshot
@@ -0,0 +1,70 @@
+import threading
+
+# Räume: Nachrichten gehen nur an die Abonnenten eines Raums. Der Index
+# führt beide Richtungen (Raum -> Clients, Client -> Räume), damit Fan-out,
+# Abmelden und Replikation ohne Durchsuchen aller Clients auskommen.
+
+DEFAULT_ROOM = "lobby"
+MAX_ROOM_NAME = 64
+
+
+def valid_room(room):
+    return isinstance(room, str) and 0 < len(room) <= MAX_ROOM_NAME
+
+
+class RoomIndex:
+    def __init__(self):
+        self.subscribers = {}  # room: set(client_id)
+        self.rooms = {}  # client_id: set(room)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def join(self, client_id, room):
+        # Liefert False, falls der Client schon im Raum war
+        with self.lock:
+            rooms = self.rooms.setdefault(client_id, set())
+            if room in rooms:
+                return False
+            rooms.add(room)
+            self.subscribers.setdefault(room, set()).add(client_id)
+            return True
+
+    def leave(self, client_id, room):
+        # Liefert False, falls der Client nicht im Raum war
+        with self.lock:
+            rooms = self.rooms.get(client_id)
+            if not rooms or room not in rooms:
+                return False
+            rooms.discard(room)
+            self._unsubscribe(client_id, room)
+            return True
+
+    def set_rooms(self, client_id, rooms):
+        # Mitgliedschaften eines Clients komplett ersetzen (Replikation)
+        self.remove_client(client_id)
+        for room in rooms:
+            self.join(client_id, room)
+
+    def remove_client(self, client_id):
+        with self.lock:
+            rooms = self.rooms.pop(client_id, set())
+            for room in rooms:
+                self._unsubscribe(client_id, room)
+            return rooms
+
+    def members(self, room):
+        with self.lock:
+            return tuple(self.subscribers.get(room, ()))
+
+    def rooms_of(self, client_id):
+        with self.lock:
+            return sorted(self.rooms.get(client_id, ()))
+
+    def _unsubscribe(self, client_id, room):
+        members = self.subscribers.get(room)
+        if members is not None:
+            members.discard(client_id)
+            if not members:
+                del self.subscribers[room]
@@ -1,343 +1,1986 @@
 import socket
 import threading
+import asyncio
+import argparse
 import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
 import uuid
 import time
+from collections import deque
+
+import wire
+from fragment import (Fragmenter, Reassembler, MAX_MESSAGE_SIZE,
+                      RECV_BUFFER_SIZE)
+from reliability import ReliableChannel, is_ack, new_session, payload_of
+from history import History, make_record
+from replication import ReplicationLog, SnapshotAssembler, snapshot_parts
+from election import ALGORITHMS, ElectionStats, RingIndex
+from failure_detector import DeadlineHeap, PhiAccrualDetector, PHI_THRESHOLD
+from membership import Membership, MEMBERSHIP_TYPES
+from rooms import DEFAULT_ROOM, RoomIndex, valid_room
+from outbound import BulkSender, OutboundScheduler, COALESCE_WINDOW, MAX_QUEUE
+from ratelimit import RateLimiter, CLIENT_RATE, CLIENT_BURST
+from hashring import HashRing
+from instrumentation import (Metrics, LOG_LEVELS, after_fork, setup_logging,
+                             stop_logging)
+from discovery import DISCOVERY_ADDRESS, DISCOVERY_PORT, open_discovery_socket
+from statefile import SAVE_INTERVAL, StateFile
+
+log = logging.getLogger("server")
+
+# Zustellung zwischen Servern: nach etwa 3 s gilt ein Server als ausgefallen
+SERVER_RTO = 0.2
+SERVER_MAX_RETRIES = 3
+# Bully: Wartezeit auf Antworten höherer Server bzw. auf deren Ankündigung
+BULLY_ANSWER_TIMEOUT = 1.0
+BULLY_COORDINATOR_TIMEOUT = 3.0
+# Takt für Heartbeats des Leaders, Discovery und die Prüfung der Fristen
+HEARTBEAT_INTERVAL = 0.2
+DISCOVERY_INTERVAL = 1.0
+FAILURE_CHECK_INTERVAL = 0.05
+# Client-Leases: ohne Keepalive, Nachricht oder Join verfällt ein Client
+LEASE_DURATION = 15.0
+LEASE_CHECK_INTERVAL = 0.5
+SERVER_PORT = 5002
+# Steuerverkehr zwischen Servern läuft über einen eigenen Port und wird
+# nie hinter Chat-Nachrichten eingereiht
+CONTROL_PORT = 5003
+CONTROL_TYPES = MEMBERSHIP_TYPES + (
+    "heartbeat", "leader", "election", "bully_election", "bully_answer",
+    "replicate", "sync_request", "snapshot", "stats", "who_is_leader")
+# DSCP CS6 (Netzsteuerung) bzw. Socket-Priorität für den Steuerport
+CONTROL_TOS = 0xC0
+CONTROL_PRIORITY = 6
+# Verteilter Betrieb: diese Client-Pakete ändern Registry oder Verlauf und
+# werden von den übrigen Servern an den Leader weitergereicht
+RELAYED_TYPES = ("join", "leave", "join_room", "leave_room", "message")
+MAX_PENDING_RELAYS = 1024  # gepuffert, solange kein Leader bekannt ist
+# Neustart als früherer Leader: so lange auf einen anderen Leader warten,
+# bevor die Rolle ohne Wahl wieder übernommen wird
+RESUME_DELAY = 0.3
+
+
+class DatagramHandler(asyncio.DatagramProtocol):
+    # Leitet empfangene Datagramme im asyncio-Modus an den Server weiter
+    def __init__(self, handler):
+        self.handler = handler
+
+    def datagram_received(self, data, addr):
+        self.handler(data, addr)
+
+    def error_received(self, exc):
+        log.error("Datagram error: %s", exc)
 
 
 class ChatServer:
-    def __init__(self):
-        # Server- und Discovery-Port
-        self.port = 5002  # Port individuell setzen je Server-Instanz
-        self.discovery_port = 5010
+    def __init__(self, use_asyncio=False, wire_format=wire.FORMAT_BINARY,
+                 workers=1, max_message_size=MAX_MESSAGE_SIZE,
+                 history_dir=None, election="ring", election_delay=2,
+                 heartbeat_interval=HEARTBEAT_INTERVAL,
+                 phi_threshold=PHI_THRESHOLD, seeds=(), broadcast=True,
+                 lease_duration=LEASE_DURATION, coalesce_window=COALESCE_WINDOW,
+                 client_queue=MAX_QUEUE, client_rate=CLIENT_RATE,
+                 client_burst=CLIENT_BURST, distribute=False, stats_interval=0,
+                 port=SERVER_PORT, control_port=CONTROL_PORT,
+                 discovery_port=DISCOVERY_PORT,
+                 discovery_address=DISCOVERY_ADDRESS, bind_address="",
+                 state_file=None):
+        # Server-, Steuer- und Discovery-Port; Port 0 wählt einen freien
+        # Port, mehrere Server auf einem Rechner brauchen eigene Ports
+        self.port = port
+        self.control_port = control_port
+        self.discovery_port = discovery_port
+        # Ziel für Discovery, Beacons und Leader-Ankündigungen: Broadcast,
+        # Loopback-Broadcast oder Multicast-Gruppe
+        self.discovery_address = discovery_address
+        self.bind_address = bind_address
+
+        # Anzahl Prozesse, die den Server-Port per SO_REUSEPORT teilen
+        if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            log.warning("SO_REUSEPORT not available, running without workers.")
+            workers = 1
+        if workers > 1 and distribute:
+            log.warning("Client distribution runs without workers.")
+            workers = 1
+        self.workers = workers
+        self.worker_index = 0  # 0 = Koordinator bzw. einziger Prozess
+        self.worker_updates = []  # Registry-Änderungen je Worker
+        self.worker_sessions = {}  # Sitzung der Zustellschicht: Worker-Queue
+        self.coordinator_queue = None  # Worker -> Koordinator
+
+        # Optionaler Schnappschuss auf der Platte; nach einem Neustart
+        # behält der Server seine ID und kennt Peers und Clients sofort
+        self.state_file = StateFile(state_file) if state_file else None
+        state = self.load_state()
 
         # Eindeutige Server-ID und Leader-Status
-        self.id = str(uuid.uuid4())
+        self.id = (state or {}).get("id") or str(uuid.uuid4())
+        self.resume_leadership = False
         self.is_leader = False
-        self.last_heartbeat = time.time()
         self.voted = False
+        self.leader_id = None
+
+        # Ausfallerkennung: adaptiv je Server aus den Abständen seiner
+        # Heartbeats bzw. Discovery-Pakete gelernt
+        self.heartbeat_interval = heartbeat_interval
+        self.failure_detector = PhiAccrualDetector(
+            threshold=phi_threshold, first_interval=DISCOVERY_INTERVAL)
+
+        # Wahlverfahren: Token im Ring (LCR) oder Bully
+        self.election = election
+        self.election_delay = election_delay
+        self.ring = RingIndex([self.id])  # sortierte IDs aller bekannten Server
+        self.election_stats = ElectionStats()
+        self.election_round = 0
+        self.bully_running = False
+        self.bully_answered = False
 
         # UDP-Sockets erstellen
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.server_socket.bind(('', self.port))
-        self.ip = socket.gethostbyname(socket.gethostname())
-
-        self.discovery_socket = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM)
-        self.discovery_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.discovery_socket.setsockopt(
-            socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.discovery_socket.bind(('', self.discovery_port))
+        self.server_socket = self.create_server_socket()
+        self.control_socket = self.create_control_socket()
+        self.ip = bind_address or socket.gethostbyname(socket.gethostname())
+        self.discovery_socket = open_discovery_socket(
+            discovery_port, discovery_address, bind_address)
 
         # Client- und Server-Listen
         self.known_clients = {}  # client_id: {ip, port, name}
-        self.known_servers = {}  # server_id: {ip, port, isLeader, last_heartbeat}
+        self.rooms = RoomIndex()  # Raum <-> abonnierte Clients
+
+        # Leases der Clients (nur auf dem Leader): Fristen im Heap, damit
+        # abgestürzte Clients nicht dauerhaft in der Registry bleiben
+        self.lease_duration = lease_duration
+        self.leases = DeadlineHeap()
+        self.evictions = 0
+        self.leaves = 0
+        self.known_servers = {}  # server_id: {ip, port, control_port, isLeader, last_heartbeat}
+
+        # Verteilter Betrieb: der Leader ordnet Clients per konsistentem
+        # Hashing einem Server zu, jeder Server bedient seine eigenen Clients
+        self.distribute = distribute
+        self.hash_ring = HashRing([self.id])
+        self.peer_addresses = {}  # (ip, Server-Port): server_id
+        # Weiterreichungen ohne Leader; der Client hat sie schon bestätigt
+        # bekommen und sendet sie nicht erneut
+        self.pending_relays = deque(maxlen=MAX_PENDING_RELAYS)
+
+        # Mitgliedschaft per SWIM-Gossip; Broadcast nur noch zum Bootstrap
+        # (und damit Clients den Leader finden), Seeds für Netze ohne Broadcast
+        self.seeds = list(seeds)
+        self.broadcast = broadcast
+        self.beacon_sent_at = 0
+        self.membership = Membership(self.id, self.control_port,
+                                     self.send_membership,
+                                     on_alive=self.on_member_alive,
+                                     on_dead=self.on_member_dead,
+                                     meta={"port": self.port})
+
+        # Ausführungsmodell: Threads (Standard) oder ein asyncio-Event-Loop
+        self.use_asyncio = use_asyncio
+        self.loop = None
+        self.server_transport = None
+        self.control_transport = None
+        self.discovery_transport = None
+        self.heartbeat_running = False
+
+        # Format für eigene Pakete; Clients bekommen ihr beim Join gemeldetes
+        self.wire_format = wire_format
+
+        # Große Pakete werden fragmentiert und beim Empfang zusammengesetzt
+        self.fragmenter = Fragmenter(max_message_size=max_message_size)
+        self.reassembler = Reassembler(max_message_size=max_message_size)
+        self.control_reassembler = Reassembler(max_message_size=max_message_size)
+
+        # Chat-Verlauf (Ringpuffer, optional Log auf der Platte)
+        self.history = History(history_dir)
+
+        # Replikation: der Leader streamt Registry und Verlauf an die
+        # Follower, damit ein neuer Leader sofort alle Clients kennt
+        self.next_client_number = 1
+        self.replication_log = ReplicationLog()
+        self.pending_replication = []
+        self.replication_lock = threading.Lock()
+        self.replication_leader = None  # Leader, dessen Log übernommen wird
+        self.snapshot_assembler = SnapshotAssembler()
+        self.sync_requested_at = 0
+
+        # Zuverlässige Zustellung für Clients, die sie beim Join anmelden;
+        # zwischen Servern ein eigener Kanal über den Steuerport
+        self.reliability = self.create_reliability(new_session())
+        self.control_reliability = ReliableChannel(
+            self.send_control, on_give_up=self.on_delivery_failed)
+
+        # Token-Bucket je Client-Adresse auf dem Datenpfad
+        self.rate_limiter = RateLimiter(client_rate, client_burst)
+
+        # Zähler und Histogramme (Abfrage per "stats" oder periodisch im Log)
+        self.metrics = Metrics()
+        self.stats_interval = stats_interval
+        self.register_gauges()
+
+        # Ausgehende Client-Pakete: je Client eine begrenzte Schlange, im
+        # Koaleszenzfenster gebündelt und per sendmmsg verschickt
+        self.coalesce_window = coalesce_window
+        self.outbound = OutboundScheduler(self.send_queued,
+                                          can_send=self.client_ready,
+                                          summarize=self.summarize_dropped,
+                                          max_queue=client_queue)
+        self.bulk = threading.local()
+        # Format des gerade bearbeiteten Pakets, für Antworten an Unbekannte
+        self.inbound = threading.local()
+        self.bulk_sender = BulkSender(self.server_socket, self.send_datagram)
+
+        if state:
+            self.restore_state(state)
+
+    def load_state(self):
+        if self.state_file is None:
+            return None
+        try:
+            state = self.state_file.load()
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable state file %s: %s",
+                        self.state_file.path, e)
+            return None
+        if state is None:
+            return None
+        try:
+            return parse_state(state)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            log.warning("Ignoring invalid state file %s: %r",
+                        self.state_file.path, e)
+            return None
+
+    def restore_state(self, state):
+        # Geprüfter Zustand aus parse_state(). Frühere Peers als Seeds;
+        # höhere Inkarnation, damit ein inzwischen als ausgefallen gemeldeter
+        # Server wieder aufgenommen wird.
+        self.membership.incarnation = state["incarnation"] + 1
+        for address in state["seeds"]:
+            if address not in self.seeds:
+                self.seeds.append(address)
+        # Clients nur, solange ihre Leases noch laufen könnten
+        age = self.state_file.age()
+        if age is not None and age < self.lease_duration:
+            for client_id, info in state["clients"].items():
+                self.known_clients[client_id] = info
+                self.rooms.set_rooms(client_id, state["rooms"][client_id])
+            if state["next_client_number"] is not None:
+                self.next_client_number = state["next_client_number"]
+            self.resume_leadership = state["leader"] == self.id
+        log.info("Restored state from %s: %s servers, %s clients.",
+                 self.state_file.path, len(state["seeds"]),
+                 len(self.known_clients))
+
+    def save_state(self):
+        # Periodisch: Mitgliedschaft und Registry auf die Platte
+        self.state_file.save({
+            "id": self.id,
+            "incarnation": self.membership.incarnation,
+            "leader": self.leader_id,
+            "servers": {
+                server_id: {"ip": info["ip"], "port": info["port"],
+                            "control_port": info["control_port"]}
+                for server_id, info in list(self.known_servers.items())
+            },
+            "clients": dict(self.known_clients),
+            "rooms": {client_id: self.rooms.rooms_of(client_id)
+                      for client_id in list(self.known_clients)},
+            "next_client_number": self.next_client_number
+        })
+
+    def register_gauges(self):
+        # Werte, die erst beim Auslesen der Statistik ermittelt werden
+        gauge = self.metrics.gauge
+        gauge("leader", lambda: self.is_leader)
+        gauge("registry", self.registry_metrics)
+        gauge("servers", lambda: len(self.known_servers))
+        gauge("election", lambda: {
+            "count": self.election_stats.count,
+            "last_s": self.election_stats.last_duration
+        })
+        gauge("rooms", lambda: len(self.rooms))
+        gauge("leases", lambda: len(self.leases))
+        gauge("last_seq", lambda: self.history.last_seq)
+        gauge("outbound", lambda: {
+            "enqueued": self.outbound.enqueued,
+            "sent": self.outbound.sent,
+            "dropped": self.outbound.dropped,
+            "queues": len(self.outbound.queues),
+            "bulk_calls": self.bulk_sender.calls
+        })
+        gauge("rate_limit", lambda: {
+            "admitted": self.rate_limiter.admitted,
+            "rejected": self.rate_limiter.rejected
+        })
+
+    def encode(self, message, fmt=None):
+        # Kodieren und je Pakettyp zählen
+        self.metrics.count("out." + message["type"])
+        return wire.encode(message, fmt or self.wire_format)
+
+    def dump_stats(self):
+        log.info("stats %s", json.dumps(self.metrics.snapshot(), default=str))
+
+    def create_server_socket(self):
+        # Socket für den Server-Port; mit Workern teilen sich alle Prozesse
+        # den Port und der Kernel verteilt die Datagramme
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.workers > 1:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.bind_address, self.port))
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def create_control_socket(self):
+        # Eigener Socket für Wahl, Heartbeats, Replikation und SWIM, damit
+        # diese Pakete nicht hinter einer Flut von Chat-Nachrichten warten;
+        # im Netz zusätzlich als Netzsteuerung markiert
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, CONTROL_TOS)
+            if hasattr(socket, "SO_PRIORITY"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_PRIORITY,
+                                CONTROL_PRIORITY)
+        except OSError as e:
+            log.warning("Control socket priority not available: %s", e)
+        sock.bind((self.bind_address, self.control_port))
+        self.control_port = sock.getsockname()[1]
+        return sock
+
+    def create_reliability(self, session):
+        return ReliableChannel(self.send_server, session=session,
+                               on_give_up=self.on_client_delivery_failed,
+                               on_foreign_ack=self.route_foreign_ack)
 
     def start_server(self):
         # Serverstart und Start der parallelen Threads
-        print(f"Server IP: {self.ip} Server ID: {self.id}")
-        print(f"Server running on port {self.port} ...")
-        print(
-            f"Listening for discovery messages on port {self.discovery_port} ...")
+        # Worker vor allen Threads forken
+        self.start_workers()
+        if self.use_asyncio:
+            asyncio.run(self.run_event_loop())
+            return
 
+        self.print_startup_info()
+
+        threading.Thread(target=self.listen_on_control_port,
+                         daemon=True).start()
         threading.Thread(target=self.listen_on_server_port,
                          daemon=True).start()
         threading.Thread(target=self.listen_on_discovery_port,
                          daemon=True).start()
-        threading.Thread(target=self.monitor_heartbeat, daemon=True).start()
-        threading.Thread(target=self.broadcast_discovery, daemon=True).start()
-        threading.Thread(target=self.remove_dead_servers, daemon=True).start()
+        self.membership.join(self.seeds)
+        self.probe_leader()
+        self.start_periodic_tasks()
 
-        time.sleep(10)  # Zeit für Discovery der anderen Server
-        print("Initiating leader election at startup...")
-        self.initiate_leader_election()
+        # Zeit für Discovery der anderen Server; antwortet ein Leader auf
+        # die Anfrage, endet das Warten sofort
+        deadline = time.time() + self.startup_delay()
+        while self.leader_id is None and time.time() < deadline:
+            time.sleep(0.01)
+        self.initiate_startup_election()
 
         # Hauptthread am Leben halten
         while True:
             time.sleep(1)
 
-    def broadcast_discovery(self):
-        # Regelmäßige Broadcast-Nachrichten zur Server-Discovery
-        while True:
-            msg = {
-                "type": "discover",
-                "id": self.id,
-                "port": self.port,
-                "isLeader": self.is_leader
-            }
-            self.discovery_socket.sendto(json.dumps(
-                msg).encode(), ('<broadcast>', self.discovery_port))
-            time.sleep(10)
+    async def run_event_loop(self):
+        # Alternative Engine: alle Ports als DatagramProtocol-Endpunkte,
+        # periodische Aufgaben als Timer im selben Event-Loop. Jeder Socket
+        # wird je Durchlauf einzeln bedient, Steuerpakete warten also nicht
+        # hinter den Chat-Nachrichten.
+        self.loop = asyncio.get_running_loop()
+        self.print_startup_info()
 
-    def broadcast_heartbeat(self):
-        # Nur der Leader verschickt regelmäßige Heartbeats
-        while self.is_leader:
-            msg = {
-                "type": "heartbeat",
-                "id": self.id,
-                "port": self.port
-            }
-            self.discovery_socket.sendto(json.dumps(
-                msg).encode(), ('<broadcast>', self.discovery_port))
-            print("Heartbeat sent by the leader.")
-            time.sleep(10)
+        self.control_transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: DatagramHandler(self.on_control_datagram),
+            sock=self.control_socket)
+        self.server_transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: DatagramHandler(self.on_server_datagram),
+            sock=self.server_socket)
+        self.discovery_transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: DatagramHandler(self.on_discovery_datagram),
+            sock=self.discovery_socket)
 
-    def monitor_heartbeat(self):
-        # Prüft regelmäßig, ob Heartbeat vom Leader noch empfangen wird
-        while True:
-            time.sleep(10)
-            if not self.is_leader and (time.time() - self.last_heartbeat > 20):
-                print("Leader unresponsive. Initiating leader election.")
-                self.initiate_leader_election()
+        self.membership.join(self.seeds)
+        self.probe_leader()
+        self.start_periodic_tasks()
+        self.loop.call_later(self.startup_delay(),
+                             self.initiate_startup_election)
+
+        # Event-Loop am Leben halten
+        await asyncio.Future()
+
+    def start_periodic_tasks(self):
+        # Gemeinsam für beide Engines; schedule_periodic wählt Thread oder
+        # Timer im Event-Loop
+        self.schedule_periodic(DISCOVERY_INTERVAL, self.broadcast_discovery)
+        self.schedule_periodic(FAILURE_CHECK_INTERVAL, self.check_failures)
+        self.schedule_periodic(LEASE_CHECK_INTERVAL, self.expire_leases)
+        # ACKs gesammelt senden, Timeouts für Wiederholungen prüfen
+        self.schedule_periodic(0.05, self.control_reliability.tick)
+        self.schedule_periodic(0.05, self.reliability.tick)
+        self.schedule_periodic(0.1, self.flush_replication)
+        if self.coalesce_window > 0:
+            self.schedule_periodic(self.coalesce_window, self.flush_outbound)
+        if self.stats_interval > 0:
+            self.schedule_periodic(self.stats_interval, self.dump_stats,
+                                   initial_delay=self.stats_interval)
+        if self.state_file is not None:
+            self.schedule_periodic(SAVE_INTERVAL, self.save_state,
+                                   initial_delay=SAVE_INTERVAL)
+
+    def print_startup_info(self):
+        log.info("Server IP: %s Server ID: %s", self.ip, self.id)
+        log.info("Server running on port %s ...", self.port)
+        log.info("Control traffic on port %s ...", self.control_port)
+        log.info("Listening for discovery messages on port %s ...", self.discovery_port)
+        log.info("Engine: %s", 'asyncio event loop' if self.use_asyncio else 'threads')
+        log.info("Election: %s", self.election)
+
+    def startup_delay(self):
+        return RESUME_DELAY if self.resume_leadership else self.election_delay
+
+    def initiate_startup_election(self):
+        # Hat ein laufender Leader schon geantwortet, ist keine Wahl nötig
+        if self.leader_id is not None:
+            log.info("Leader %s already known, no election needed.", self.leader_id)
+            return
+        if self.resume_leadership:
+            # Neustart des Leaders, kein anderer hat übernommen
+            log.info("Resuming leadership with %s restored clients.",
+                     len(self.known_clients))
+            self.become_leader()
+            return
+        log.info("Initiating leader election at startup...")
+        self.initiate_leader_election()
+
+    def call_later(self, delay, callback):
+        # Einmaliger Timer: im Event-Loop oder als Thread
+        if self.loop is not None:
+            self.loop.call_later(delay, callback)
+        else:
+            timer = threading.Timer(delay, callback)
+            timer.daemon = True
+            timer.start()
+
+    def schedule_periodic(self, interval, task, initial_delay=0, condition=None):
+        # Führt task periodisch aus: als Timer im Event-Loop oder als Thread.
+        # Läuft, solange condition() wahr ist (falls angegeben).
+        if self.loop is not None:
+            def tick():
+                if condition is not None and not condition():
+                    return
+                try:
+                    task()
+                except Exception as e:
+                    log.error("Error in %s: %s", task.__name__, e)
+                self.loop.call_later(interval, tick)
+
+            self.loop.call_later(initial_delay, tick)
+            return
+
+        def run():
+            time.sleep(initial_delay)
+            while condition is None or condition():
+                try:
+                    task()
+                except Exception as e:
+                    log.error("Error in %s: %s", task.__name__, e)
+                time.sleep(interval)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def send_server(self, payload, address):
+        # Versand über den Server-Port; während flush_outbound werden die
+        # Datagramme gesammelt und danach gemeinsam verschickt
+        datagrams = getattr(self.bulk, "datagrams", None)
+        for datagram in self.fragmenter.split(payload):
+            if datagrams is not None:
+                datagrams.append((datagram, address))
+            else:
+                self.send_datagram(datagram, address)
+
+    def send_datagram(self, datagram, address):
+        # Einzelnes Datagramm (Transport im asyncio-Modus)
+        self.metrics.count("datagrams.out.data")
+        if self.server_transport is not None:
+            self.server_transport.sendto(datagram, address)
+        else:
+            self.server_socket.sendto(datagram, address)
+
+    def flush_outbound(self):
+        # Warteschlangen der Clients leeren, alles mit einem Systemaufruf
+        self.flush_replication()
+        self.bulk.datagrams = []
+        start = time.perf_counter()
+        try:
+            self.outbound.flush()
+        finally:
+            datagrams, self.bulk.datagrams = self.bulk.datagrams, None
+            # Der Einzelversand (send_datagram) zählt selbst
+            sent = self.bulk_sender.send(datagrams)
+        if sent:
+            self.metrics.count("datagrams.out.data", sent)
+        if datagrams:
+            self.metrics.observe("flush", time.perf_counter() - start)
+
+    def send_queued(self, client_id, payload):
+        info = self.known_clients.get(client_id)
+        if info is None:
+            return
+        try:
+            self.send_to_client(info, payload)
+        except Exception as e:
+            log.error("Send error to %s: %s", client_id, e)
+
+    def client_ready(self, client_id):
+        # Backpressure: solange die Zustellschicht ein volles Fenster
+        # unbestätigter Pakete hat, bleibt die Schlange des Clients stehen
+        info = self.known_clients.get(client_id)
+        if info is None or not info.get("reliable"):
+            return True
+        return (self.reliability.pending((info["ip"], info["port"]))
+                < self.reliability.window)
+
+    def summarize_dropped(self, client_id, dropped):
+        info = self.known_clients.get(client_id)
+        fmt = info["wire"] if info is not None else self.wire_format
+        return self.encode({
+            "type": "notice",
+            "text": f"{dropped} Nachrichten ausgelassen (Verbindung zu langsam)."
+        }, fmt)
 
-    def remove_dead_servers(self):
-        # Entfernt Server, die zu lange keinen Heartbeat gesendet haben
+    def send_control(self, payload, address):
+        # Versand über den Steuerport (Transport im asyncio-Modus)
+        for datagram in self.fragmenter.split(payload):
+            self.metrics.count("datagrams.out.control")
+            if self.control_transport is not None:
+                self.control_transport.sendto(datagram, address)
+            else:
+                self.control_socket.sendto(datagram, address)
+
+    def send_discovery(self, payload, address):
+        # Versand über den Discovery-Port (Transport im asyncio-Modus)
+        if self.discovery_transport is not None:
+            self.discovery_transport.sendto(payload, address)
+        else:
+            self.discovery_socket.sendto(payload, address)
+
+    def start_workers(self):
+        # Startet zusätzliche Empfangsprozesse für den Server-Port. Dieser
+        # Prozess bleibt Koordinator: er besitzt die Client-Registry, schickt
+        # Änderungen an die Worker und bearbeitet alle Pakete außer "message".
+        if self.workers <= 1:
+            return
+        ctx = multiprocessing.get_context("fork")
+        self.coordinator_queue = ctx.Queue()
+        for index in range(1, self.workers):
+            updates = ctx.Queue()
+            session = new_session()
+            self.worker_updates.append(updates)
+            self.worker_sessions[session] = updates
+            ctx.Process(target=self.run_worker,
+                        args=(index, updates, session, os.getpid()),
+                        daemon=True).start()
+        threading.Thread(target=self.drain_coordinator_queue,
+                         daemon=True).start()
+        log.info("Started %s worker processes on port %s.", self.workers - 1, self.port)
+
+    def run_worker(self, index, updates, session, coordinator_pid):
+        # Läuft im geforkten Worker: eigener SO_REUSEPORT-Socket, eigene
+        # Sitzung der Zustellschicht und eine lokale Kopie der Client-Registry
+        after_fork()
+        self.server_socket.close()
+        self.control_socket.close()
+        self.discovery_socket.close()
+        self.server_socket = self.create_server_socket()
+        self.worker_index = index
+        self.worker_updates = []
+        self.worker_sessions = {}
+        self.reliability = self.create_reliability(session)
+        self.bulk_sender = BulkSender(self.server_socket, self.send_datagram)
+        self.schedule_periodic(0.05, self.reliability.tick)
+        if self.coalesce_window > 0:
+            self.schedule_periodic(self.coalesce_window, self.flush_outbound)
+
+        def apply_updates():
+            for op, key, value in iter(updates.get, None):
+                if op == "put":
+                    self.known_clients[key] = value
+                elif op == "pop":
+                    info = self.known_clients.pop(key, None)
+                    self.rooms.remove_client(key)
+                    if info is not None:
+                        self.reliability.forget((info["ip"], info["port"]))
+                elif op == "rooms":
+                    self.rooms.set_rooms(key, value)
+                elif op == "msg_id":
+                    self.history.mark_seen(key, value)
+                elif op == "frame":
+                    # ACK für diesen Worker, bei einem anderen Prozess gelandet
+                    self.reliability.receive(value, key)
+
+        def exit_with_coordinator():
+            # Worker beenden, sobald der Koordinator nicht mehr läuft
+            while os.getppid() == coordinator_pid:
+                time.sleep(1)
+            os._exit(0)
+
+        threading.Thread(target=apply_updates, daemon=True).start()
+        threading.Thread(target=exit_with_coordinator, daemon=True).start()
+        log.info("Worker %s receiving on port %s.", index, self.port)
+
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
         while True:
-            time.sleep(5)
-            now = time.time()
-            to_remove = []
-            for server_id, info in list(self.known_servers.items()):
-                if server_id == self.id:
+            nbytes, address = self.server_socket.recvfrom_into(buffer)
+            try:
+                message = self.reassembler.add(view[:nbytes], address)
+                if message is None:
+                    continue
+                if not self.admit(message, address):
                     continue
-                last_hb = info.get("last_heartbeat", 0)
-                if now - last_hb > 20:
-                    print(
-                        f"Remove dead server {server_id} ({info['ip']}:{info['port']}) from known_servers.")
-                    to_remove.append(server_id)
-            for server_id in to_remove:
-                self.known_servers.pop(server_id, None)
+                for payload in self.reliability.receive(message, address):
+                    data = wire.decode(payload)
+                    if data["type"] == "message" and data["id"] in self.known_clients:
+                        self.handle_server_message(data, address)
+                    else:
+                        self.coordinator_queue.put(
+                            ("payload", bytes(payload), address))
+            except Exception as e:
+                log.error("Worker %s error: %s", index, e)
 
-    def listen_on_discovery_port(self):
-        # Empfang von Discovery-, Heartbeat- oder Leader-Nachrichten
+    def drain_coordinator_queue(self):
+        # Koordinator: von Workern weitergeleitete Pakete bearbeiten
         while True:
-            message, address = self.discovery_socket.recvfrom(1024)
-            data = json.loads(message.decode())
-            server_id = data['id']
-            server_ip = address[0]
-
-            if data["type"] == "discover":
-                if server_id not in self.known_servers:
-                    self.known_servers[server_id] = {
-                        "id": server_id,
-                        "ip": server_ip,
-                        "port": data['port'],
-                        "isLeader": data['isLeader'],
-                        "last_heartbeat": time.time()
-                    }
-                    print(f"Discovered new server: {server_ip}:{data['port']}")
-                else:
-                    self.known_servers[server_id]["ip"] = server_ip
-                    self.known_servers[server_id]["port"] = data["port"]
-
-            elif data["type"] == "leader":
-                # Leader wurde verkündet
-                leader_id = server_id
-                self.is_leader = (leader_id == self.id)
-                self.voted = False
-                print(f"Server {leader_id} has been elected as leader.")
-
-                if leader_id in self.known_servers:
-                    self.known_servers[leader_id]["isLeader"] = True
-                else:
-                    self.known_servers[leader_id] = {
-                        "id": leader_id,
-                        "ip": address[0],
-                        "port": data["port"],
-                        "isLeader": True,
-                        "last_heartbeat": time.time()
-                    }
-
-            elif data["type"] == "heartbeat":
-                if server_id != self.id:
-                    self.last_heartbeat = time.time()
-                    if server_id in self.known_servers:
-                        self.known_servers[server_id]["last_heartbeat"] = time.time(
-                        )
+            kind, message, address = self.coordinator_queue.get()
+            try:
+                if kind == "record":
+                    # Von einem Worker verteilte Nachricht im Verlauf ablegen
+                    if self.loop is not None:
+                        self.loop.call_soon_threadsafe(self.store_record,
+                                                       message)
                     else:
-                        self.known_servers[server_id] = {
-                            "id": server_id,
-                            "ip": server_ip,
-                            "port": data['port'],
-                            "isLeader": False,
-                            "last_heartbeat": time.time()
-                        }
-                    print(
-                        f"Heartbeat received from leader {server_ip}:{data['port']}.")
+                        self.store_record(message)
+                    continue
+                handler = (self.on_server_payload if kind == "payload"
+                           else self.on_server_datagram)
+                if self.loop is not None:
+                    self.loop.call_soon_threadsafe(handler, message, address)
+                else:
+                    handler(message, address)
+            except Exception:
+                # Ein fehlerhaftes Paket darf den Koordinator nicht anhalten
+                log.exception("Coordinator error (%s) from %s", kind, address)
 
-    def forward_token(self, token_id):
-        # Leitet den Wahltoken im Ring weiter
-        sorted_servers = sorted(
-            self.known_servers.values(), key=lambda x: x["id"])
-        my_index = next((i for i, s in enumerate(
-            sorted_servers) if s["id"] == self.id), None)
-        if my_index is None:
-            print("This server not in known_servers.")
-            return
-
-        if len(sorted_servers) == 1:
-            print("Only one server in the ring. I become the leader.")
-            self.is_leader = True
-            self.broadcast_leader()
-            threading.Thread(target=self.broadcast_heartbeat,
-                             daemon=True).start()
-            self.voted = True
+    def route_foreign_ack(self, frame, peer, session):
+        # ACKs landen bei dem Prozess, dem der Kernel den Absender zuordnet;
+        # Worker reichen sie an den Koordinator, dieser an den Besitzer
+        if self.coordinator_queue is None:
             return
+        if self.worker_index:
+            self.coordinator_queue.put(("frame", bytes(frame), peer))
+            return
+        updates = self.worker_sessions.get(session)
+        if updates is not None:
+            updates.put(("frame", peer, bytes(frame)))
 
-        for offset in range(1, len(sorted_servers)):
-            next_index = (my_index + offset) % len(sorted_servers)
-            next_server = sorted_servers[next_index]
-            next_address = (next_server["ip"], next_server["port"])
-            if next_server["id"] == self.id:
-                print("No other reachable server. I will become the leader.")
-                self.is_leader = True
-                self.broadcast_leader()
-                threading.Thread(
-                    target=self.broadcast_heartbeat, daemon=True).start()
-                self.voted = True
-                return
-            try:
-                print(
-                    f"Send election token to {next_server['ip']}:{next_server['port']} (ID: {next_server['id']})")
-                self.server_socket.sendto(json.dumps({
-                    "type": "election",
-                    "token": token_id
-                }).encode(), next_address)
+    def register_client(self, client_id, info):
+        # Client in die Registry aufnehmen (und an Worker verteilen)
+        self.known_clients[client_id] = info
+        for updates in self.worker_updates:
+            updates.put(("put", client_id, info))
+        self.replicate({"op": "join", "client": info})
+
+    def unregister_client(self, client_id):
+        # Client aus der Registry entfernen (und an Worker verteilen)
+        info = self.known_clients.pop(client_id, None)
+        self.rooms.remove_client(client_id)
+        self.outbound.forget(client_id)
+        if info is not None:
+            self.reliability.forget((info["ip"], info["port"]))
+        for updates in self.worker_updates:
+            updates.put(("pop", client_id, None))
+        if info is not None:
+            self.replicate({"op": "leave", "client_id": client_id})
+        return info
+
+    def publish_rooms(self, client_id):
+        # Räume eines Clients an Worker und Follower verteilen
+        rooms = self.rooms.rooms_of(client_id)
+        for updates in self.worker_updates:
+            updates.put(("rooms", client_id, rooms))
+        self.replicate({"op": "rooms", "client_id": client_id, "rooms": rooms})
+
+    def renew_lease(self, client_id):
+        # Nur der Koordinator führt die Leases
+        if not self.worker_index:
+            self.leases.schedule(client_id, time.time() + self.lease_duration)
+
+    def expire_leases(self):
+        # Clients ohne Lebenszeichen entfernen, wie nach einem "leave"
+        for client_id in self.leases.pop_due():
+            if self.serves(client_id):
+                self.evict_client(client_id, "lease expired")
+
+    def evict_client(self, client_id, reason):
+        self.evictions += 1
+        if not self.is_leader:
+            # Verteilter Betrieb: Abmeldung übernimmt der Leader
+            info = self.known_clients[client_id]
+            log.info("Evicting %s: %s.", info['name'], reason)
+            self.relay_to_leader({"type": "leave", "id": client_id},
+                                 (info["ip"], info["port"]))
+            return
+        name = self.remove_client(client_id)
+        metrics = self.registry_metrics()
+        log.info("Evicted %s: %s (%s clients, %s evictions).", name, reason,
+                 metrics['clients'], metrics['evictions'])
+
+    def serves(self, client_id):
+        # Ist dieser Server für die Verbindung des Clients zuständig?
+        if not self.distribute:
+            return self.is_leader
+        info = self.known_clients.get(client_id)
+        return info is not None and info.get("server") == self.id
+
+    def remove_client(self, client_id):
+        # Client abmelden und die Mitglieder seiner Räume benachrichtigen
+        name = self.known_clients[client_id]["name"]
+        log.info("%s hat den Chat verlassen.", name)
+        rooms = self.rooms.rooms_of(client_id)
+        self.unregister_client(client_id)
+        self.leases.cancel(client_id)
+
+        notice = {
+            "type": "notice",
+            "text": f"{name} hat den Chat verlassen."
+        }
+        self.broadcast_to_rooms(rooms, notice)
+        return name
+
+    def registry_metrics(self):
+        return {
+            "clients": len(self.known_clients),
+            "served": sum(1 for client_id in list(self.known_clients)
+                          if self.serves(client_id)),
+            "evictions": self.evictions,
+            "leaves": self.leaves
+        }
+
+    def replicate(self, entry):
+        # Leader: Änderung ins Replikationslog, Versand gesammelt im Takt
+        if not self.is_leader or self.worker_index:
+            return
+        index = self.replication_log.append(entry)
+        self.pending_replication.append([index, entry])
+
+    def flush_replication(self):
+        # Gesammelte Log-Einträge an alle Follower streamen
+        # Auch vor jeder Zustellung an Clients aufgerufen: was ein Client
+        # gesehen hat, ist schon an die Follower unterwegs. Sonst vergibt
+        # ein neuer Leader die Sequenznummern nicht replizierter Nachrichten
+        # ein zweites Mal.
+        if not self.pending_replication:
+            return
+        with self.replication_lock:
+            entries, self.pending_replication = self.pending_replication, []
+            if entries and self.is_leader:
+                self.send_to_followers({
+                    "type": "replicate",
+                    "leader": self.id,
+                    "entries": entries
+                })
+
+    def send_to_followers(self, message):
+        payload = wire.LazyPayload(message)
+        for server_id, info in list(self.known_servers.items()):
+            if server_id != self.id:
+                self.metrics.count("out." + message["type"])
+                self.send_to_server(payload.get(self.wire_format),
+                                    (info["ip"], info["control_port"]))
+
+    def send_to_server(self, payload, address):
+        # Zwischen Servern kürzere Timeouts: ein ausgefallener Server soll
+        # nach wenigen Sekunden erkannt und aus dem Ring genommen werden
+        self.control_reliability.send(payload, address, rto=SERVER_RTO,
+                                      max_retries=SERVER_MAX_RETRIES)
+
+    def on_replicate(self, data):
+        # Follower: Einträge in Reihenfolge anwenden, bei Lücken nachfordern
+        if self.is_leader:
+            return
+        leader_id = data["leader"]
+        for index, entry in data["entries"]:
+            if (leader_id != self.replication_leader
+                    or index > self.replication_log.last_index + 1):
+                self.request_sync(leader_id)
                 return
-            except Exception as e:
-                print(
-                    f"Remove unreachable server {next_server['id']}: {e}")
-                self.known_servers.pop(next_server["id"], None)
+            if index <= self.replication_log.last_index:
+                continue  # Bereits angewendet
+            self.apply_entry(entry)
+            self.replication_log.append_at(index, entry)
+
+    def apply_entry(self, entry):
+        op = entry["op"]
+        if op == "join":
+            info = entry["client"]
+            self.register_client(info["id"], info)
+            self.next_client_number = max(self.next_client_number,
+                                          info["number"] + 1)
+        elif op == "leave":
+            self.unregister_client(entry["client_id"])
+        elif op == "rooms":
+            self.rooms.set_rooms(entry["client_id"], entry["rooms"])
+            self.publish_rooms(entry["client_id"])
+        elif op == "message":
+            record = entry["record"]
+            self.history.advance(record["seq"])
+            self.history.store(record)
+            self.publish_msg_id(record)
+
+    def request_sync(self, leader_id):
+        # Fehlende Einträge oder einen Snapshot beim Leader anfordern
+        leader = self.known_servers.get(leader_id)
+        if leader is None or time.time() - self.sync_requested_at < 1:
+            return
+        self.sync_requested_at = time.time()
+        log.info("Requesting state sync from leader %s.", leader_id)
+        self.send_to_server(self.encode({
+            "type": "sync_request",
+            "id": self.id,
+            "leader": self.replication_leader,
+            "after": self.replication_log.last_index
+        }, self.wire_format), (leader["ip"], leader["control_port"]))
+
+    def on_sync_request(self, data, address):
+        # Leader: Follower mit Log-Einträgen oder Snapshot versorgen
+        if not self.is_leader:
+            return
+        entries = None
+        if data["leader"] == self.id:
+            entries = self.replication_log.since(data["after"])
+        if entries is not None:
+            for start in range(0, len(entries), 200):
+                self.send_to_server(self.encode({
+                    "type": "replicate",
+                    "leader": self.id,
+                    "entries": [list(entry) for entry in entries[start:start + 200]]
+                }, self.wire_format), address)
+            return
+        log.info("Sending snapshot to follower %s.", data['id'])
+        for part in snapshot_parts(self.id, self.replication_log.last_index,
+                                   self.known_clients, self.next_client_number,
+                                   self.history.last_seq, self.rooms.rooms_of):
+            self.send_to_server(self.encode(part, self.wire_format), address)
+
+    def apply_snapshot(self, snapshot):
+        # Follower: kompletten Zustand des Leaders übernehmen
+        clients = snapshot["clients"]
+        for client_id in list(self.known_clients):
+            if client_id not in clients:
+                self.unregister_client(client_id)
+        for client_id, info in clients.items():
+            self.register_client(client_id, info)
+            self.rooms.set_rooms(client_id, snapshot["rooms"].get(client_id, ()))
+            self.publish_rooms(client_id)
+        self.next_client_number = snapshot["next_client_number"]
+        self.history.advance(snapshot["last_seq"])
+        self.replication_log.reset(snapshot["index"])
+        self.replication_leader = snapshot["leader"]
+        log.info("Applied snapshot from leader %s (%s clients).",
+                 snapshot['leader'], len(clients))
+
+    def send_membership(self, message, address):
+        self.send_control(self.encode(message, self.wire_format), address)
+
+    def on_member_alive(self, member):
+        # Über Gossip, Seed oder Broadcast neu (oder wieder) bekannter Server
+        log.info("Discovered new server: %s:%s", member['ip'], member['port'])
+        self.add_server(member["id"], {
+            "id": member["id"],
+            "ip": member["ip"],
+            "port": (member["meta"] or {}).get("port"),
+            "control_port": member["port"],
+            "isLeader": False,
+            "last_heartbeat": time.time()
+        })
+        # Neuer Server soll den Leader sofort kennen statt erst
+        # nach dem nächsten periodischen Heartbeat
+        if self.is_leader:
+            self.send_control(self.heartbeat_payload(),
+                              (member["ip"], member["port"]))
+
+    def on_member_dead(self, member):
+        server_id = member["id"]
+        log.warning("Remove dead server %s (%s:%s) from known_servers.",
+                    server_id, member['ip'], member['port'])
+        was_leader = server_id == self.leader_id
+        self.remove_server(server_id)
+        if was_leader and not self.is_leader:
+            log.warning("Leader unresponsive. Initiating leader election.")
+            self.initiate_leader_election()
+
+    def broadcast_discovery(self):
+        # Broadcast-Nachricht zur Server-Discovery (periodisch aufgerufen).
+        # Nur zum Bootstrap: sobald andere Server bekannt sind, übernimmt
+        # der Gossip die Verbreitung der Mitgliedschaft.
+        if not self.broadcast or self.membership.alive_members():
+            return
+        msg = {
+            "type": "discover",
+            "id": self.id,
+            "port": self.port,
+            "control_port": self.control_port,
+            "isLeader": self.is_leader
+        }
+        self.send_discovery(self.encode(
+            msg, self.wire_format), (self.discovery_address, self.discovery_port))
+
+    def probe_leader(self):
+        # Aktive Discovery beim Start: der Leader antwortet sofort per
+        # Unicast an den Steuerport, statt dass wir auf seinen Beacon warten
+        query = self.encode({
+            "type": "who_is_leader",
+            "id": self.id,
+            "reply_port": self.control_port
+        }, self.wire_format)
+        if self.broadcast:
+            self.send_discovery(query, (self.discovery_address,
+                                        self.discovery_port))
+        for address in self.seeds:
+            self.send_control(query, address)
+
+    def answer_leader_query(self, data, address):
+        # Nur der Leader antwortet, mit einem Heartbeat an den Absender
+        if self.is_leader and data["id"] != self.id:
+            self.send_control(self.heartbeat_payload(),
+                              (address[0], data.get("reply_port", address[1])))
 
-        print("No reachable server in the ring. I will become the leader.")
+    def heartbeat_payload(self):
+        return self.encode({
+            "type": "heartbeat",
+            "id": self.id,
+            "port": self.port,
+            "control_port": self.control_port
+        }, self.wire_format)
+
+    def broadcast_heartbeat(self):
+        # Nur der Leader verschickt regelmäßige Heartbeats: per Unicast an
+        # alle Server, seltener per Broadcast, damit Clients ihn finden
+        payload = self.heartbeat_payload()
+        for server_id, info in list(self.known_servers.items()):
+            if server_id != self.id:
+                self.send_control(payload, (info["ip"], info["control_port"]))
+        now = time.time()
+        if self.broadcast and now - self.beacon_sent_at >= DISCOVERY_INTERVAL:
+            self.beacon_sent_at = now
+            self.send_discovery(payload, (self.discovery_address, self.discovery_port))
+
+    def start_heartbeat(self):
+        # Startet den Heartbeat genau einmal, solange man Leader ist
+        if self.heartbeat_running:
+            return
+        self.heartbeat_running = True
+
+        def still_leader():
+            if not self.is_leader:
+                self.heartbeat_running = False
+            return self.is_leader
+
+        self.schedule_periodic(self.heartbeat_interval, self.broadcast_heartbeat,
+                               condition=still_leader)
+
+    def become_leader(self):
+        # Übernimmt die Leader-Rolle und kündigt sie an
         self.is_leader = True
+        self.follow_leader(self.id)
+        self.replication_leader = self.id
+        self.bully_running = False
+        self.election_converged()
         self.broadcast_leader()
-        threading.Thread(target=self.broadcast_heartbeat, daemon=True).start()
-        self.voted = True
+        self.start_heartbeat()
+        self.voted = False
+        # Leases der übernommenen Clients beginnen neu
+        for client_id in list(self.known_clients):
+            self.renew_lease(client_id)
+        if self.distribute:
+            self.rebalance(announce=True)
+        else:
+            self.announce_leader_to_clients()
+        self.flush_relays()
+
+    def announce_leader_to_clients(self):
+        # Replizierte Clients direkt auf den neuen Leader umlenken,
+        # ohne dass sie erneut beitreten müssen
+        if not self.known_clients:
+            return
+        log.info("Taking over %s replicated clients.", len(self.known_clients))
+        self.broadcast_to_others({
+            "type": "leader",
+            "id": self.id,
+            "port": self.port,
+            "last_seq": self.history.last_seq
+        })
+
+    def check_failures(self):
+        # Follower prüft SWIM; den Leader überwacht zusätzlich der
+        # Ausfalldetektor über dessen regelmäßige Heartbeats. Erreicht phi
+        # die Schwelle, wird sofort neu gewählt, ohne auf die Bestätigung
+        # per Gossip zu warten.
+        self.membership.tick()
+        for server_id in self.failure_detector.suspected():
+            if server_id != self.leader_id or self.is_leader:
+                continue
+            log.warning("Leader unresponsive. Initiating leader election.")
+            self.membership.suspect(server_id)
+            self.remove_server(server_id)
+            self.initiate_leader_election()
+
+    def add_server(self, server_id, info):
+        # Server aufnehmen und in den sortierten Ring einfügen
+        self.known_servers[server_id] = info
+        self.ring.add(server_id)
+        self.hash_ring.add(server_id)
+        if info.get("port") is not None:
+            self.peer_addresses[(info["ip"], info["port"])] = server_id
+        self.rebalance()
+
+    def remove_server(self, server_id):
+        # Server entfernen; der eigene Eintrag bleibt immer im Ring
+        if server_id == self.id:
+            return
+        info = self.known_servers.pop(server_id, None)
+        self.ring.remove(server_id)
+        self.hash_ring.remove(server_id)
+        if info is not None:
+            self.peer_addresses.pop((info["ip"], info.get("port")), None)
+        self.failure_detector.forget(server_id)
+        if server_id == self.leader_id:
+            self.leader_id = None
+            if info is not None and info.get("port") is not None:
+                self.hold_relays((info["ip"], info["port"]))
+        self.rebalance()
+
+    def peer_address(self, server_id):
+        # Server-Port eines anderen Servers; fehlt er noch, aus den per
+        # Gossip verbreiteten Angaben nachtragen
+        info = self.known_servers.get(server_id)
+        if info is None:
+            return None
+        if info.get("port") is None:
+            member = self.membership.members.get(server_id)
+            if member is None or not member["meta"]:
+                return None
+            info["port"] = member["meta"]["port"]
+            self.peer_addresses[(info["ip"], info["port"])] = server_id
+        return (info["ip"], info["port"])
+
+    def listen_on_discovery_port(self):
+        # Empfang von Discovery-, Heartbeat- oder Leader-Nachrichten
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            nbytes, address = self.discovery_socket.recvfrom_into(buffer)
+            self.on_discovery_datagram(view[:nbytes], address)
+
+    def on_discovery_datagram(self, message, address):
+        self.metrics.count("datagrams.in.discovery")
+        data = self.decode(message, address)
+        if data is None:
+            return
+        try:
+            self.dispatch(self.handle_discovery_message, data, address)
+        except Exception:
+            self.metrics.count("errors.discovery")
+            log.exception("Discovery error from %s", address)
+
+    def decode(self, payload, address):
+        # Unlesbare Pakete zählen und verwerfen
+        try:
+            return wire.decode(payload)
+        except Exception as e:
+            self.metrics.count("errors.decode")
+            log.warning("Undecodable packet from %s: %s", address, e)
+            return None
+
+    def dispatch(self, handler, data, address):
+        # Pakettyp zählen und die Bearbeitungszeit je Typ messen
+        kind = data["type"]
+        self.metrics.count("in." + kind)
+        start = time.perf_counter()
+        handler(data, address)
+        self.metrics.observe("handle." + kind, time.perf_counter() - start)
+
+    def handle_discovery_message(self, data, address):
+        server_id = data['id']
+        server_ip = address[0]
+
+        if data["type"] == "who_is_leader":
+            # Server oder Client sucht den Leader
+            self.answer_leader_query(data, address)
+
+        elif data["type"] == "discover":
+            if server_id != self.id:
+                self.membership.learn(server_id, server_ip,
+                                      data["control_port"], {"port": data["port"]})
+
+        elif data["type"] == "leader":
+            # Leader wurde verkündet
+            leader_id = server_id
+            self.is_leader = (leader_id == self.id)
+            self.follow_leader(leader_id)
+            self.voted = False
+            self.bully_running = False
+            log.info("Server %s has been elected as leader.", leader_id)
+            self.election_converged()
+
+            if leader_id != self.id:
+                self.membership.learn(leader_id, server_ip,
+                                      data["control_port"], {"port": data["port"]})
+            if leader_id in self.known_servers:
+                self.known_servers[leader_id]["isLeader"] = True
+
+            # Zustand des (neuen) Leaders übernehmen
+            if leader_id != self.id and leader_id != self.replication_leader:
+                self.request_sync(leader_id)
+            self.flush_relays()
+
+        elif data["type"] == "heartbeat":
+            if server_id != self.id:
+                self.failure_detector.heartbeat(server_id)
+                if server_id != self.leader_id:
+                    log.debug("Heartbeat received from leader %s:%s.",
+                              server_ip, data['port'])
+                self.follow_leader(server_id)
+                if server_id != self.replication_leader:
+                    self.request_sync(server_id)
+                self.flush_relays()
+                self.membership.learn(server_id, server_ip,
+                                      data["control_port"], {"port": data["port"]})
+                if server_id in self.known_servers:
+                    self.known_servers[server_id]["last_heartbeat"] = time.time(
+                    )
+
+    def forward_token(self, token_id):
+        # Leitet den Wahltoken an den Nachfolger im Ring weiter
+        next_id = self.ring.successor(self.id)
+        if next_id is None:
+            log.info("Only one server in the ring. I become the leader.")
+            self.become_leader()
+            return
+        next_server = self.known_servers[next_id]
+        address = (next_server["ip"], next_server["control_port"])
+        log.debug("Send election token to %s:%s (ID: %s)", address[0],
+                  address[1], next_id)
+        self.send_to_server(self.encode({
+            "type": "election",
+            "token": token_id
+        }, self.wire_format), address)
+
+    def start_bully_election(self):
+        # Bully: alle Server mit höherer ID anfragen; antwortet keiner,
+        # ist man selbst der Leader
+        if self.bully_running:
+            return
+        higher = self.ring.higher(self.id)
+        if not higher:
+            log.info("No server with a higher ID. I become the leader.")
+            self.become_leader()
+            return
+        self.bully_running = True
+        self.bully_answered = False
+        self.election_round += 1
+        election_round = self.election_round
+        payload = self.encode({
+            "type": "bully_election",
+            "id": self.id
+        }, self.wire_format)
+        for server_id in higher:
+            info = self.known_servers.get(server_id)
+            if info is not None:
+                self.send_to_server(payload, (info["ip"], info["control_port"]))
+        self.call_later(BULLY_ANSWER_TIMEOUT,
+                        lambda: self.check_bully_answers(election_round))
+
+    def check_bully_answers(self, election_round):
+        if not self.bully_running or election_round != self.election_round:
+            return
+        if not self.bully_answered:
+            log.info("No higher server answered. I become the leader.")
+            self.become_leader()
+            return
+        # Ein höherer Server führt die Wahl fort; auf seine Ankündigung warten
+        self.call_later(BULLY_COORDINATOR_TIMEOUT,
+                        lambda: self.check_bully_coordinator(election_round))
+
+    def check_bully_coordinator(self, election_round):
+        if not self.bully_running or election_round != self.election_round:
+            return
+        log.warning("No leader announced. Restarting bully election.")
+        self.bully_running = False
+        self.start_bully_election()
+
+    def election_converged(self):
+        # Dauer vom Beginn der Wahl bis zur Einigung auf einen Leader
+        duration = self.election_stats.converged()
+        if duration is not None:
+            self.metrics.count("elections")
+            self.metrics.observe("election", duration)
+            log.info("Election converged in %.0f ms (%s elections).",
+                     duration * 1000, self.election_stats.count)
 
     def broadcast_leader(self):
-        # Broadcastet, dass man selbst der neue Leader ist
-        msg = {
+        # Kündigt an, dass man selbst der neue Leader ist: zuverlässig an
+        # alle Server, per Broadcast zusätzlich für die Clients
+        payload = self.encode({
             "type": "leader",
             "id": self.id,
-            "port": self.port
-        }
-        self.discovery_socket.sendto(json.dumps(
-            msg).encode(), ('<broadcast>', self.discovery_port))
-        print(f"Leader {self.id} announced.")
+            "port": self.port,
+            "control_port": self.control_port
+        }, self.wire_format)
+        for server_id, info in list(self.known_servers.items()):
+            if server_id != self.id:
+                self.send_to_server(payload, (info["ip"], info["control_port"]))
+        if self.broadcast:
+            self.send_discovery(payload, (self.discovery_address, self.discovery_port))
+        log.info("Leader %s announced.", self.id)
 
-    def listen_on_server_port(self):
-        # Empfang von Nachrichten von Clients oder Wahltokens
+    def listen_on_control_port(self):
+        # Eigener Thread für den Steuerverkehr zwischen den Servern
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
         while True:
+            nbytes, address = self.control_socket.recvfrom_into(buffer)
+            self.on_control_datagram(view[:nbytes], address)
+
+    def on_control_datagram(self, message, address):
+        self.metrics.count("datagrams.in.control")
+        try:
+            message = self.control_reassembler.add(message, address)
+            if message is None:
+                return
+            payloads = self.control_reliability.receive(message, address)
+        except Exception as e:
+            self.metrics.count("errors.decode")
+            log.warning("Bad control datagram from %s: %r", address, e)
+            return
+        for payload in payloads:
+            data = self.decode(payload, address)
+            if data is None:
+                continue
+            if data["type"] not in CONTROL_TYPES:
+                log.warning("Ignored %s from %s on the control port.",
+                            data['type'], address)
+                continue
             try:
-                message, address = self.server_socket.recvfrom(1024)
-                data = json.loads(message.decode())
-
-                if data["type"] == "join":
-                    # Client möchte beitreten
-                    client_id = data["id"]
-                    client_ip = address[0]
-                    client_port = data["port"]
-
-                    if client_id not in self.known_clients:
-                        client_number = len(self.known_clients) + 1
-                        self.known_clients[client_id] = {
-                            "id": client_id,
-                            "ip": client_ip,
-                            "port": client_port,
-                            "name": f"Client {client_number}"
-                        }
-                        print(
-                            f"{self.known_clients[client_id]['name']} connected from {client_ip}:{client_port}")
-
-                        # Antworte Client mit seinem Namen
-                        welcome = {
-                            "type": "welcome",
-                            "name": f"Client {client_number}"
-                        }
-                        self.server_socket.sendto(json.dumps(
-                            welcome).encode(), (client_ip, client_port))
-
-                        # Benachrichtige andere Clients über Beitritt
-                        notice = {
-                            "type": "notice",
-                            "text": f"Client {client_number} ist beigetreten."
-                        }
-                        self.broadcast_to_others(notice, exclude=client_id)
-
-                elif data["type"] == "message":
-                    # Nachricht von Client empfangen
-                    sender_id = data["id"]
-                    text = data["text"]
-                    print(f"Message from {sender_id}: {text}")
-                    self.broadcast_message(data, sender_id)
-
-                elif data["type"] == "leave":
-                    # Client hat den Chat verlassen
-                    client_id = data["id"]
-                    if client_id in self.known_clients:
-                        name = self.known_clients[client_id]["name"]
-                        print(f"{name} hat den Chat verlassen.")
-                        self.known_clients.pop(client_id)
-
-                        notice = {
-                            "type": "notice",
-                            "text": f"{name} hat den Chat verlassen."
-                        }
-                        self.broadcast_to_others(notice)
-
-                elif data["type"] == "election":
-                    # Wahltoken empfangen und verarbeiten
-                    token_id = data["token"]
-                    if not self.voted:
-                        if token_id > self.id:
-                            self.forward_token(token_id)
-                            self.voted = True
-                        elif token_id < self.id:
-                            self.forward_token(self.id)
-                            self.voted = True
-                        elif token_id == self.id:
-                            print("I have won the election!")
-                            self.is_leader = True
-                            self.broadcast_leader()
-                            threading.Thread(
-                                target=self.broadcast_heartbeat, daemon=True).start()
-                            self.voted = True
-                    else:
-                        pass  # Kein doppeltes Voting
+                self.dispatch(self.handle_control_message, data, address)
+            except Exception:
+                self.metrics.count("errors.control")
+                log.exception("Control error from %s", address)
 
-            except Exception as e:
-                print("Server error:", e)
+    def listen_on_server_port(self):
+        # Empfang von Nachrichten der Clients
+        # Ein vorab angelegter Puffer für alle Datagramme; die Pakete werden
+        # vollständig verarbeitet, bevor der nächste Empfang ihn überschreibt
+        buffer = bytearray(RECV_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            nbytes, address = self.server_socket.recvfrom_into(buffer)
+            self.on_server_datagram(view[:nbytes], address)
+
+    def on_server_datagram(self, message, address):
+        self.metrics.count("datagrams.in.data")
+        try:
+            message = self.reassembler.add(message, address)
+            if message is None or not self.admit(message, address):
+                return
+            payloads = self.reliability.receive(message, address)
+        except Exception as e:
+            self.metrics.count("errors.decode")
+            log.warning("Bad datagram from %s: %r", address, e)
+            return
+        for payload in payloads:
+            self.on_server_payload(payload, address)
+
+    def admit(self, message, address):
+        # Token-Bucket des Absenders; beim ersten abgelehnten Paket einer
+        # Folge bekommt der Client einen Hinweis. Andere Server und ACKs
+        # sind frei. Geprüft wird vor der Zustellschicht: ein abgelehntes
+        # Paket wird nicht bestätigt, der Client wiederholt es später.
+        if (address in self.peer_addresses or is_ack(message)
+                or self.rate_limiter.admit(address)):
+            return True
+        self.metrics.count("in.rate_limited")
+        if self.rate_limiter.streak(address) == 1:
+            log.warning("Rate limit reached for %s:%s.", address[0], address[1])
+            self.send_server(self.encode({
+                "type": "notice",
+                "text": "Zu viele Nachrichten, bitte langsamer senden."
+            }, self.reply_format(address, wire.format_of(payload_of(message)))),
+                address)
+        return False
+
+    def reply_format(self, address, fmt=None):
+        # Antwort an einen Absender in dessen Format: bekannter Client wie
+        # beim Join angegeben, sonst wie das eingegangene Paket
+        for info in list(self.known_clients.values()):
+            if (info["ip"], info["port"]) == address:
+                return info["wire"]
+        return fmt or getattr(self.inbound, "format", None) or self.wire_format
+
+    def on_server_payload(self, payload, address):
+        data = self.decode(payload, address)
+        if data is None:
+            return
+        self.inbound.format = wire.format_of(payload)
+        try:
+            self.dispatch(self.handle_server_message, data, address)
+        except Exception:
+            self.metrics.count("errors.data")
+            log.exception("Server error from %s", address)
+
+    def on_delivery_failed(self, peer, payloads):
+        # Zustellschicht hat aufgegeben: Empfänger gilt als nicht erreichbar
+        for payload in payloads:
+            data = wire.decode(payload)
+            if data.get("type") not in ("election", "bully_election"):
+                continue
+            # Wahlnachricht kam nicht an: Server aus dem Ring nehmen und beim
+            # Ring-Verfahren den Token an den nächsten Nachfolger geben
+            for server_id, info in list(self.known_servers.items()):
+                if (info["ip"], info["control_port"]) == peer and server_id != self.id:
+                    log.warning("Remove unreachable server %s.", server_id)
+                    self.remove_server(server_id)
+                    self.membership.suspect(server_id)
+            if data["type"] == "election":
+                self.forward_token(data["token"])
+            return
+        log.warning("Delivery to %s:%s failed, %s packets dropped.", peer[0],
+                    peer[1], len(payloads))
+
+    def on_client_delivery_failed(self, peer, payloads):
+        # Zustellschicht des Server-Ports hat aufgegeben. Die Pakete werden
+        # nicht dekodiert (Bündel aus dem Scheduler sind keine Nachrichten);
+        # ein Client unter dieser Adresse wird wie nach der Lease entfernt.
+        log.warning("Delivery to %s:%s failed, %s packets dropped.", peer[0],
+                    peer[1], len(payloads))
+        if self.worker_index:
+            return
+        for client_id, info in list(self.known_clients.items()):
+            if (info["ip"], info["port"]) == peer and self.serves(client_id):
+                self.leases.cancel(client_id)
+                self.evict_client(client_id, "delivery failed")
+
+    def send_to_client(self, info, payload):
+        # Zuverlässig, falls der Client es beim Join angemeldet hat
+        address = (info["ip"], info["port"])
+        if info.get("reliable"):
+            self.reliability.send(payload, address)
+        else:
+            self.send_server(payload, address)
+
+    def handle_server_message(self, data, address, via=None):
+        # Pakete der Clients; Steuerpakete kommen nur über den Steuerport.
+        # via: Server, der das Paket eines seiner Clients weitergereicht hat
+        if data["type"] in ("relay", "deliver"):
+            # Zwischen Servern im verteilten Betrieb
+            self.on_peer_message(data, address)
+            return
+        if (self.distribute and not self.is_leader
+                and data["type"] in RELAYED_TYPES):
+            self.relay_to_leader(data, address)
+            return
+
+        if data["type"] == "join":
+            # Client möchte beitreten
+            client_id = data["id"]
+            client_ip = address[0]
+            client_port = data["port"]
+            # Verteilter Betrieb: zuständig ist der Server laut Hash-Ring
+            owner = self.hash_ring.owner(client_id) if self.distribute else self.id
+
+            known = self.known_clients.get(client_id)
+            info = {
+                "id": client_id,
+                "ip": client_ip,
+                "port": client_port,
+                # Ältere Clients ohne Angabe sprechen nur JSON
+                "wire": data.get("wire", wire.FORMAT_JSON),
+                "reliable": data.get("reliable", False),
+                "batch": data.get("batch", False),
+                "server": owner
+            }
+            if owner != (via or self.id):
+                # Falscher Server: der zuständige schickt den Client zu sich
+                self.send_to_clients([client_id], self.redirect_message(
+                    owner, join=True), infos={client_id: info})
+                return
+
+            if known is None:
+                client_number = self.next_client_number
+                self.next_client_number += 1
+                info.update(name=f"Client {client_number}", number=client_number)
+                self.register_client(client_id, info)
+                # Neue Clients sind zunächst in der Lobby
+                self.rooms.join(client_id, DEFAULT_ROOM)
+                self.publish_rooms(client_id)
+                log.info("%s connected from %s:%s", info['name'], client_ip,
+                         client_port)
+            elif ((known["ip"], known["port"]) != (client_ip, client_port)
+                    or known.get("server") != owner):
+                # Bekannter Client (z.B. repliziert) mit neuer Adresse
+                self.register_client(client_id, dict(
+                    known, ip=client_ip, port=client_port, server=owner))
+
+            # Antworte Client mit seinem Namen
+            info = self.known_clients[client_id]
+            self.renew_lease(client_id)
+            welcome = {
+                "type": "welcome",
+                "name": info["name"],
+                "last_seq": self.history.last_seq,
+                "lease": self.lease_duration
+            }
+            self.send_to_clients([client_id], welcome,
+                                 infos={client_id: info})
+
+            if known is None:
+                # Benachrichtige die anderen Clients in der Lobby
+                notice = {
+                    "type": "notice",
+                    "room": DEFAULT_ROOM,
+                    "text": f"{info['name']} ist beigetreten."
+                }
+                self.broadcast_to_rooms([DEFAULT_ROOM], notice,
+                                        exclude=client_id)
+
+        elif data["type"] == "join_room":
+            # Client abonniert einen Raum
+            client_id = data["id"]
+            room = data["room"]
+            if client_id in self.known_clients and valid_room(room):
+                self.renew_lease(client_id)
+                if self.rooms.join(client_id, room):
+                    self.publish_rooms(client_id)
+                    name = self.known_clients[client_id]["name"]
+                    self.broadcast_to_rooms([room], {
+                        "type": "notice",
+                        "room": room,
+                        "text": f"{name} ist dem Raum {room} beigetreten."
+                    })
+
+        elif data["type"] == "leave_room":
+            # Client verlässt einen Raum; er bekommt die Meldung noch selbst
+            client_id = data["id"]
+            room = data["room"]
+            if room in self.rooms.rooms_of(client_id):
+                self.renew_lease(client_id)
+                name = self.known_clients[client_id]["name"]
+                self.broadcast_to_rooms([room], {
+                    "type": "notice",
+                    "room": room,
+                    "text": f"{name} hat den Raum {room} verlassen."
+                })
+                self.rooms.leave(client_id, room)
+                self.publish_rooms(client_id)
+
+        elif data["type"] == "message":
+            # Nachricht von Client empfangen
+            sender_id = data["id"]
+            text = data["text"]
+            log.debug("Message from %s: %s", sender_id, text)
+            self.renew_lease(sender_id)
+            self.broadcast_message(data, sender_id)
+
+        elif data["type"] == "keepalive":
+            # Lease verlängern; unbekannte Clients (z.B. nach Ablauf)
+            # sollen sich neu anmelden
+            client_id = data["id"]
+            if client_id in self.known_clients:
+                self.renew_lease(client_id)
+            elif self.is_leader or self.distribute:
+                self.send_server(self.encode({"type": "lease_expired"},
+                                             self.reply_format(address)),
+                                 address)
+
+        elif data["type"] == "history":
+            # Client fragt Nachrichten ab, die er verpasst hat
+            client_id = data["id"]
+            if client_id in self.known_clients:
+                self.renew_lease(client_id)
+                records, more = self.history.page(
+                    data.get("after"), data.get("limit", 50),
+                    set(self.rooms.rooms_of(client_id)))
+                reply = {
+                    "type": "history",
+                    "messages": records,
+                    "more": more,
+                    "last_seq": self.history.last_seq
+                }
+                info = self.known_clients[client_id]
+                self.send_to_client(info, self.encode(reply, info["wire"]))
+
+        elif data["type"] == "leave":
+            # Client hat den Chat verlassen
+            client_id = data["id"]
+            if client_id in self.known_clients:
+                self.leaves += 1
+                self.remove_client(client_id)
+
+    def handle_control_message(self, data, address):
+        # Pakete anderer Server über den Steuerport
+        if data["type"] in MEMBERSHIP_TYPES:
+            # SWIM-Protokoll zwischen Servern
+            self.membership.handle(data, address)
+
+        elif data["type"] in ("heartbeat", "leader", "who_is_leader"):
+            # Per Unicast statt Broadcast vom Leader bzw. an bekannte Server
+            self.handle_discovery_message(data, address)
+
+        elif data["type"] == "replicate":
+            # Log-Einträge vom Leader
+            self.on_replicate(data)
+
+        elif data["type"] == "sync_request":
+            # Follower fordert fehlende Einträge oder einen Snapshot an
+            self.on_sync_request(data, address)
+
+        elif data["type"] == "snapshot":
+            # Teil eines Snapshots vom Leader
+            snapshot = self.snapshot_assembler.add(data)
+            if snapshot is not None:
+                self.apply_snapshot(snapshot)
+
+        elif data["type"] == "election":
+            # Wahltoken empfangen und verarbeiten
+            token_id = data["token"]
+            self.election_stats.start()
+            # LCR: höhere Tokens immer weiterreichen, niedrigere nur einmal
+            # durch den eigenen ersetzen; kommt der eigene Token zurück, ist
+            # man die höchste ID im Ring
+            if token_id == self.id:
+                if not self.is_leader:
+                    log.info("I have won the election!")
+                    self.become_leader()
+            elif token_id > self.id:
+                self.forward_token(token_id)
+                self.voted = True
+            elif not self.voted:
+                self.forward_token(self.id)
+                self.voted = True
+
+        elif data["type"] == "bully_election":
+            # Niedrigerer Server fragt an: antworten und selbst übernehmen
+            self.election_stats.start()
+            self.send_to_server(self.encode({
+                "type": "bully_answer",
+                "id": self.id
+            }, self.wire_format), address)
+            if self.is_leader:
+                self.broadcast_leader()
+            else:
+                self.start_bully_election()
+
+        elif data["type"] == "bully_answer":
+            self.bully_answered = True
+
+        elif data["type"] == "stats":
+            # Lokale Abfrage der Messwerte (z.B. vom Benchmark)
+            if address[0].startswith("127."):
+                self.send_control(self.encode({
+                    "type": "stats",
+                    "id": self.id,
+                    "metrics": self.metrics.snapshot()
+                }, data.get("wire", wire.FORMAT_JSON)), address)
 
     def broadcast_message(self, message, sender):
-        # Nachricht an alle Clients außer dem Sender senden
+        # Nachricht an alle Abonnenten des Raums außer dem Sender senden;
+        # ältere Clients ohne Raumangabe schreiben in die Lobby
+        room = message.setdefault("room", DEFAULT_ROOM)
+        if room not in self.rooms.rooms_of(sender):
+            log.warning("Message from %s to room %s without subscription dropped.",
+                        sender, room)
+            return
+        msg_id = message.get("msg_id")
+        if msg_id is not None and self.history.is_duplicate(sender, msg_id):
+            # Nach einem Leaderwechsel erneut gesendet, schon im Verlauf
+            self.metrics.count("in.duplicate")
+            log.debug("Duplicate message %s from %s dropped.", msg_id, sender)
+            return
         sender_name = self.known_clients[sender]["name"]
         message["sender_name"] = sender_name
 
-        for client_id, info in self.known_clients.items():
-            if client_id != sender:
-                try:
-                    self.server_socket.sendto(json.dumps(
-                        message).encode(), (info["ip"], info["port"]))
-                except Exception as e:
-                    print(f"Send error to {client_id}: {e}")
+        # Sequenznummer vergeben und im Verlauf ablegen
+        record = make_record(self.history.allocate(), sender, sender_name,
+                             message["text"], room, msg_id)
+        message["seq"] = record["seq"]
+        self.record_message(record)
+
+        self.broadcast_to_rooms([room], message, exclude=sender)
+
+    def record_message(self, record):
+        # Worker geben den Eintrag an den Koordinator, der den Verlauf führt
+        if self.worker_index:
+            self.history.mark_seen(record["id"], record.get("msg_id"))
+            self.coordinator_queue.put(("record", record, None))
+        else:
+            self.store_record(record)
+
+    def store_record(self, record):
+        self.history.store(record)
+        self.publish_msg_id(record)
+        self.replicate({"op": "message", "record": record})
+
+    def publish_msg_id(self, record):
+        # Worker erkennen doppelte Nachrichten an ihrer Kopie der msg_ids;
+        # neue kommen wie die Registry über ihre Queues
+        if record.get("msg_id") is not None:
+            for updates in self.worker_updates:
+                updates.put(("msg_id", record["id"], record["msg_id"]))
 
     def broadcast_to_others(self, message, exclude=None):
         # Nachricht an alle Clients außer 'exclude' (optional)
-        for client_id, info in self.known_clients.items():
-            if client_id != exclude:
-                try:
-                    self.server_socket.sendto(json.dumps(
-                        message).encode(), (info["ip"], info["port"]))
-                except Exception as e:
-                    print(f"Broadcast error to {client_id}: {e}")
+        self.send_to_clients(
+            [client_id for client_id in list(self.known_clients)
+             if client_id != exclude], message)
+
+    def broadcast_to_rooms(self, rooms, message, exclude=None):
+        with self.metrics.timer("fanout"):
+            self.fan_out(rooms, message, exclude)
+
+    def fan_out(self, rooms, message, exclude):
+        # Nachricht an die Abonnenten der Räume (jeder Client nur einmal)
+        recipients = set()
+        for room in rooms:
+            recipients.update(self.rooms.members(room))
+        recipients.discard(exclude)
+        if not self.distribute:
+            self.deliver_locally(recipients, message)
+            return
+        # Ein Paket je Server mit den hier bestimmten Empfängern: die
+        # replizierten Räume des anderen Servers können noch veraltet sein
+        self.send_to_clients(recipients, message)
+
+    def send_to_clients(self, client_ids, message, infos=None):
+        # infos: Angaben zu Clients, die (noch) nicht in der Registry stehen
+        if not self.distribute:
+            self.deliver_locally(client_ids, message, infos)
+            return
+        local, remote = self.partition(client_ids, infos)
+        if remote:
+            self.flush_replication()
+        self.deliver_locally(local, message, infos)
+        for server_id, ids in remote.items():
+            deliver = {"type": "deliver", "clients": ids, "message": message}
+            if infos:
+                deliver["infos"] = {client_id: infos[client_id]
+                                    for client_id in ids if client_id in infos}
+            self.send_to_peer(server_id, deliver)
+
+    def partition(self, client_ids, infos=None):
+        # Empfänger nach zuständigem Server aufteilen
+        local = []
+        remote = {}
+        for client_id in client_ids:
+            info = (infos or {}).get(client_id) or self.known_clients.get(client_id)
+            if info is None:
+                continue
+            server_id = info.get("server", self.id)
+            if server_id != self.id and server_id not in self.hash_ring:
+                # Zuständiger Server ist weg, rebalance() steht noch aus
+                server_id = self.hash_ring.owner(client_id)
+            if server_id == self.id:
+                local.append(client_id)
+            else:
+                remote.setdefault(server_id, []).append(client_id)
+        return local, remote
+
+    def deliver_locally(self, client_ids, message, infos=None):
+        # Einmal kodieren, denselben Puffer für alle Empfänger verwenden;
+        # mit Koaleszenzfenster über die Schlangen des Schedulers
+        payload = wire.LazyPayload(message)
+        self.metrics.count("out." + message["type"], len(client_ids))
+        for client_id in client_ids:
+            if infos and client_id in infos:
+                # Antwort auf einen Join: direkt, ohne Schlange
+                info = infos[client_id]
+                self.send_to_client(info, payload.get(info["wire"]))
+                continue
+            info = self.known_clients.get(client_id)
+            if info is None:
+                continue
+            if self.coalesce_window > 0:
+                self.outbound.enqueue(client_id, payload.get(info["wire"]),
+                                      batch=info.get("batch", False))
+                continue
+            self.flush_replication()
+            try:
+                self.send_to_client(info, payload.get(info["wire"]))
+            except Exception as e:
+                log.error("Send error to %s: %s", client_id, e)
+
+    def send_to_peer(self, server_id, message):
+        # Zuverlässig an den Server-Port eines anderen Servers
+        address = self.peer_address(server_id)
+        if address is None:
+            log.warning("No address for server %s, %s dropped.", server_id,
+                        message['type'])
+            return
+        self.reliability.send(self.encode(message, self.wire_format), address)
+
+    def relay_to_leader(self, data, address):
+        # Paket eines eigenen Clients an den Leader weiterreichen
+        client_id = data.get("id")
+        if client_id in self.known_clients:
+            self.renew_lease(client_id)
+        relay = {
+            "type": "relay",
+            "server": self.id,
+            "address": list(address),
+            "data": data
+        }
+        if self.leader_id is None:
+            log.debug("No leader known, %s from %s held back.", data['type'], address)
+            self.pending_relays.append(relay)
+            return
+        self.send_to_peer(self.leader_id, relay)
+
+    def follow_leader(self, leader_id):
+        # Leaderwechsel, auch bevor der alte Leader als ausgefallen gilt:
+        # was er nicht bestätigt hat, geht zuerst an den neuen
+        previous = self.leader_id
+        if previous not in (None, self.id, leader_id):
+            address = self.peer_address(previous)
+            if address is not None:
+                self.hold_relays(address)
+        self.leader_id = leader_id
+
+    def hold_relays(self, address):
+        # Noch unbestätigte Weiterreichungen an einen ausgefallenen Leader
+        # zurückholen; sie gehen an den nächsten Leader, und zwar vor den
+        # später zurückgehaltenen, da der Leader ältere msg_ids verwirft
+        relays = []
+        for payload in self.reliability.take_pending(address):
+            message = wire.decode(payload)
+            if message["type"] == "relay":
+                relays.append(message)
+        self.pending_relays.extendleft(reversed(relays))
+
+    def flush_relays(self):
+        # Leader bekannt: zurückgehaltene Weiterreichungen zustellen. Ist
+        # es dieser Server, bearbeitet er sie selbst; doppelte Nachrichten
+        # verwirft der Leader anhand der msg_id.
+        while self.pending_relays and self.leader_id is not None:
+            relay = self.pending_relays.popleft()
+            if self.leader_id == self.id:
+                self.handle_server_message(relay["data"],
+                                           tuple(relay["address"]),
+                                           via=self.id)
+            else:
+                self.send_to_peer(self.leader_id, relay)
+
+    def on_peer_message(self, data, address):
+        # Nur von bekannten Servern annehmen, nicht von Clients
+        server_id = self.peer_addresses.get(address)
+        if server_id is None:
+            log.warning("Ignored %s from unknown server %s.", data['type'], address)
+            return
+        if data["type"] == "relay":
+            self.handle_server_message(data["data"], tuple(data["address"]),
+                                       via=server_id)
+            return
+        message = data["message"]
+        client_ids = data["clients"]
+        if message["type"] in ("welcome", "redirect"):
+            # Neue bzw. übernommene Clients: dieser Server führt die Lease.
+            # Die Registry wird nur verzögert repliziert; ohne die Angaben
+            # aus dem Paket gingen die nächsten Zustellungen verloren.
+            infos = data.get("infos") if message["type"] == "welcome" else None
+            for client_id in client_ids:
+                info = (infos or {}).get(client_id)
+                if info is not None and client_id not in self.known_clients:
+                    self.known_clients[client_id] = info
+                    for updates in self.worker_updates:
+                        updates.put(("put", client_id, info))
+                self.renew_lease(client_id)
+        self.deliver_locally(client_ids, message, data.get("infos"))
+
+    def redirect_message(self, server_id, join=False):
+        # Wird vom Zielserver selbst verschickt; der Client übernimmt
+        # dessen Absenderadresse
+        port = self.port if server_id == self.id else self.peer_address(server_id)[1]
+        return {
+            "type": "redirect",
+            "id": server_id,
+            "leader": self.id,
+            "port": port,
+            "join": join,
+            "last_seq": self.history.last_seq
+        }
+
+    def rebalance(self, announce=False):
+        # Leader: Clients nach dem Hash-Ring neu zuordnen. Beim konsistenten
+        # Hashing wechseln nur Clients, deren Server hinzukam oder wegfiel.
+        # announce: nach einer Wahl alle Clients über den Leader informieren
+        if not (self.distribute and self.is_leader):
+            return
+        targets = {}  # server_id: [client_id]
+        moved = {}  # client_id: neue Angaben (dem Zielserver evtl. unbekannt)
+        for client_id, info in list(self.known_clients.items()):
+            owner = self.hash_ring.owner(client_id)
+            if owner != info.get("server"):
+                moved[client_id] = dict(info, server=owner)
+                self.register_client(client_id, moved[client_id])
+                if owner == self.id:
+                    self.renew_lease(client_id)
+            elif not announce:
+                continue
+            targets.setdefault(owner, []).append(client_id)
+        for server_id, client_ids in targets.items():
+            if server_id != self.id and self.peer_address(server_id) is None:
+                continue
+            self.send_to_clients(client_ids, self.redirect_message(server_id),
+                                 infos=moved)
+        if moved:
+            log.info("Rebalanced %s of %s clients across %s servers.",
+                     len(moved), len(self.known_clients), len(self.hash_ring))
 
     def initiate_leader_election(self):
-        # Startet die Leader-Wahl mit eigenem Token
-        print(f"Server {self.id} starting leader election...")
-        self.forward_token(self.id)
+        # Startet die Leader-Wahl mit dem gewählten Verfahren
+        log.info("Server %s starting %s leader election...", self.id, self.election)
+        self.election_stats.start()
+        if self.election == "bully":
+            self.start_bully_election()
+        else:
+            self.voted = True
+            self.forward_token(self.id)
+
+
+def parse_state(state):
+    # Schnappschuss vollständig prüfen, bevor etwas davon übernommen wird;
+    # fehlende Angaben (ältere oder abgeschnittene Datei) gelten als leer
+    if not isinstance(state, dict):
+        raise TypeError("state is not an object")
+    server_id = state.get("id")
+    seeds = [(str(info["ip"]), int(info["control_port"]))
+             for peer_id, info in state.get("servers", {}).items()
+             if peer_id != server_id]
+    clients = {}
+    for client_id, info in state.get("clients", {}).items():
+        clients[client_id] = dict(info, ip=str(info["ip"]),
+                                  port=int(info["port"]), name=str(info["name"]))
+    rooms = state.get("rooms", {})
+    next_client_number = state.get("next_client_number")
+    return {
+        "id": str(server_id) if server_id else None,
+        "incarnation": int(state.get("incarnation", 0)),
+        "leader": state.get("leader"),
+        "seeds": seeds,
+        "clients": clients,
+        "rooms": {client_id: [str(room) for room in rooms.get(client_id, ())]
+                  for client_id in clients},
+        "next_client_number": (int(next_client_number)
+                               if next_client_number is not None else None)
+    }
+
+
+def parse_address(text, default_port=CONTROL_PORT):
+    host, _, port = text.partition(":")
+    return (socket.gethostbyname(host), int(port) if port else default_port)
 
 
 if __name__ == "__main__":
-    server = ChatServer()
-    server.start_server()
+    parser = argparse.ArgumentParser(description="Verteilter Chat-Server")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="asyncio-Event-Loop statt Threads verwenden")
+    parser.add_argument("--wire-format", choices=wire.FORMATS,
+                        default=wire.FORMAT_BINARY,
+                        help="Format für Server- und Discovery-Pakete")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Prozesse, die den Server-Port teilen (SO_REUSEPORT)")
+    parser.add_argument("--max-message-size", type=int, default=MAX_MESSAGE_SIZE,
+                        help="Größte Nachricht in Bytes (wird fragmentiert)")
+    parser.add_argument("--history-dir",
+                        help="Verzeichnis für den dauerhaften Chat-Verlauf")
+    parser.add_argument("--election", choices=ALGORITHMS, default="ring",
+                        help="Verfahren für die Leader-Wahl")
+    parser.add_argument("--election-delay", type=float, default=2,
+                        help="Sekunden bis zur ersten Wahl nach dem Start")
+    parser.add_argument("--heartbeat-interval", type=float,
+                        default=HEARTBEAT_INTERVAL,
+                        help="Sekunden zwischen Heartbeats des Leaders")
+    parser.add_argument("--phi-threshold", type=float, default=PHI_THRESHOLD,
+                        help="Schwelle des Ausfalldetektors (höher = vorsichtiger)")
+    parser.add_argument("--seed", action="append", default=[],
+                        metavar="HOST[:PORT]",
+                        help="Steuerport eines bekannten Servers (mehrfach möglich)")
+    parser.add_argument("--no-broadcast", action="store_true",
+                        help="Kein Broadcast, Beitritt nur über --seed")
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+                        help="Port für Client-Pakete")
+    parser.add_argument("--control-port", type=int, default=CONTROL_PORT,
+                        help="Port für Steuerverkehr zwischen Servern")
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT,
+                        help="Port für Discovery, Beacons und Leader-Ankündigungen")
+    parser.add_argument("--discovery-address", default=DISCOVERY_ADDRESS,
+                        help="Broadcast-Adresse oder Multicast-Gruppe für Discovery "
+                             "(z.B. 127.255.255.255 oder 239.255.50.10 auf einem Rechner)")
+    parser.add_argument("--state-file",
+                        help="Datei für Mitgliedschaft und Registry (schneller Neustart)")
+    parser.add_argument("--bind", default="",
+                        help="Lokale Adresse für Server- und Steuerport (z.B. 127.0.0.1)")
+    parser.add_argument("--client-lease", type=float, default=LEASE_DURATION,
+                        help="Sekunden ohne Keepalive, bis ein Client entfernt wird")
+    parser.add_argument("--coalesce-ms", type=float,
+                        default=COALESCE_WINDOW * 1000,
+                        help="Fenster zum Bündeln ausgehender Pakete (0 = aus)")
+    parser.add_argument("--client-queue", type=int, default=MAX_QUEUE,
+                        help="Pakete je Client, bevor die ältesten verworfen werden")
+    parser.add_argument("--client-rate", type=float, default=CLIENT_RATE,
+                        help="Pakete pro Sekunde je Client (0 = unbegrenzt)")
+    parser.add_argument("--client-burst", type=int, default=CLIENT_BURST,
+                        help="Kurzzeitig erlaubte Pakete je Client über der Rate")
+    parser.add_argument("--distribute", action="store_true",
+                        help="Clients per konsistentem Hashing auf alle Server verteilen")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info",
+                        help="Ausführlichkeit des Logs (debug zeigt jede Nachricht)")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="Sekunden zwischen Statistik-Ausgaben im Log (0 = aus)")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    server = ChatServer(use_asyncio=args.asyncio, wire_format=args.wire_format,
+                        workers=args.workers,
+                        max_message_size=args.max_message_size,
+                        history_dir=args.history_dir,
+                        election=args.election,
+                        election_delay=args.election_delay,
+                        heartbeat_interval=args.heartbeat_interval,
+                        phi_threshold=args.phi_threshold,
+                        seeds=[parse_address(seed) for seed in args.seed],
+                        broadcast=not args.no_broadcast,
+                        lease_duration=args.client_lease,
+                        coalesce_window=args.coalesce_ms / 1000,
+                        client_queue=args.client_queue,
+                        client_rate=args.client_rate,
+                        client_burst=args.client_burst,
+                        distribute=args.distribute,
+                        stats_interval=args.stats_interval,
+                        port=args.port, control_port=args.control_port,
+                        discovery_port=args.discovery_port,
+                        discovery_address=args.discovery_address,
+                        bind_address=args.bind,
+                        state_file=args.state_file)
+    # SIGTERM wie Strg+C behandeln, damit das Log noch geschrieben wird
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.start_server()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_logging()
@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+# Lokaler Schnappschuss von Mitgliedschaft und Registry. Nach einem Neustart
+# dienen die gespeicherten Server als Seeds, ein früherer Leader übernimmt
+# seine Clients sofort wieder, statt auf Discovery und Wahl zu warten.
+# Geschrieben wird atomar (temporäre Datei + rename) und nur bei Änderungen,
+# spätestens aber alle REFRESH Sekunden, damit das Alter aussagekräftig ist.
+
+SAVE_INTERVAL = 1.0
+REFRESH = 5.0
+
+
+class StateFile:
+    def __init__(self, path, refresh=REFRESH):
+        self.path = path
+        self.refresh = refresh
+        self.written = None  # zuletzt geschriebener Inhalt
+        self.written_at = 0
+
+    def load(self):
+        # Gespeicherter Zustand oder None; ValueError bei defekter Datei
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def age(self):
+        # Sekunden seit dem letzten Schreiben
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def save(self, state):
+        data = json.dumps(state, sort_keys=True)
+        now = time.time()
+        if data == self.written and now - self.written_at < self.refresh:
+            return False
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.written = data
+        self.written_at = now
+        return True
@@ -0,0 +1,125 @@
+import pytest
+
+import wire
+from client_core import ClientCore
+from reliability import ReliableChannel, payload_of
+
+
+@pytest.fixture
+def client():
+    lines = []
+    messages = []
+    client = ClientCore(show=lines.append, on_message=messages.append,
+                        bind="127.0.0.1")
+    client.lines = lines
+    client.messages = messages
+    client.sent = []
+    client.send = client.sent.append  # Anfragen an den Server mitschreiben
+    yield client
+    client.close()
+
+
+def chat(seq, sender="b", text="hallo", room="lobby", msg_id=None):
+    return {"type": "message", "id": sender, "sender_name": "B", "seq": seq,
+            "room": room, "text": text, "msg_id": msg_id}
+
+
+def test_room_commands(client):
+    client.submit("/join r")
+    assert client.room == "r" and client.rooms == {"lobby", "r"}
+    client.submit("/leave")
+    assert client.room == "lobby" and client.rooms == {"lobby"}
+    client.submit("/leave lobby")
+    assert [m["type"] for m in client.sent] == ["join_room", "leave_room"]
+    assert "kann nicht verlassen" in client.lines[-1]
+
+
+def test_welcome_resubscribes_and_loads_history(client):
+    client.rooms.add("r")
+    client.handle_message({"type": "welcome", "name": "Client 3",
+                           "last_seq": 10, "lease": 3.0}, None)
+    assert client.name == "Client 3"
+    assert client.keepalive_interval == 1.0
+    assert client.joined.is_set()
+    assert [(m["type"], m.get("room"), m.get("after")) for m in client.sent] \
+        == [("join_room", "r", None), ("history", None, None)]
+
+
+def test_history_and_live_messages_shown_once(client):
+    client.last_seq = 1
+    client.handle_message({"type": "welcome", "name": "A", "last_seq": 4},
+                          None)
+    # Live-Nachricht überholt die Verlaufsseite
+    client.handle_message(chat(4), None)
+    client.handle_message({"type": "history", "more": False, "messages": [
+        chat(2), chat(3, sender=client.id), chat(4)]}, None)
+    assert [m["seq"] for m in client.messages] == [4, 2]
+    assert client.last_seq == 4
+    client.handle_message(chat(5, room="r"), None)
+    assert client.lines[-1] == "[r] B: hallo"
+
+
+def test_second_catch_up_does_not_repeat_messages(client):
+    # Zwei Anfragen laufen gleichzeitig (z.B. nach redirect und welcome);
+    # die überlappenden Seiten und Live-Nachrichten erscheinen nur einmal
+    client.last_seq = 20
+    client.handle_message({"type": "redirect", "id": "s2", "leader": "s1",
+                           "port": 9, "join": False, "last_seq": 21},
+                          ("127.0.0.1", 1))
+    client.handle_message(chat(21), None)
+    client.handle_message({"type": "welcome", "name": "A", "last_seq": 23},
+                          None)
+    client.handle_message(chat(22), None)
+    client.handle_message({"type": "history", "more": False,
+                           "messages": [chat(21), chat(22), chat(23)]}, None)
+    client.handle_message({"type": "history", "more": False,
+                           "messages": [chat(22), chat(23)]}, None)
+    client.handle_message(chat(23), None)
+    assert [m["seq"] for m in client.messages] == [21, 22, 23]
+    assert [m.get("after") for m in client.sent] == [20, 21]
+
+
+def test_history_pages_are_followed(client):
+    client.handle_message({"type": "history", "more": True,
+                           "messages": [chat(1), chat(2)]}, None)
+    assert client.sent[-1]["after"] == 2
+    assert len(client.messages) == 2
+
+
+def test_switch_resends_unacknowledged_payloads(client):
+    frames = []
+    client.reliability = ReliableChannel(
+        lambda frame, address: frames.append((frame, address)))
+    old, new = ("127.0.0.1", 1), ("127.0.0.1", 2)
+    client.switch("s1", old)
+    client.reliability.send(b"nachricht", old)
+    client.switch("s2", new)
+    assert client.server_id == "s2"
+    assert frames[-1][1] == new
+    assert payload_of(frames[-1][0]) == b"nachricht"
+    assert client.reliability.pending(old) == 0
+
+
+def test_leader_change_without_join(client):
+    client.switch("s1", ("127.0.0.1", 1))
+    client.last_seq = 3
+    client.handle_message({"type": "leader", "id": "s2", "port": 9,
+                           "last_seq": 5}, ("127.0.0.2", 1))
+    assert client.server_address == ("127.0.0.2", 9)
+    assert [m["type"] for m in client.sent] == ["history"]
+    assert client.sent[0]["after"] == 3
+
+
+def test_lease_expired_joins_again(client):
+    client.handle_message({"type": "lease_expired"}, None)
+    join = client.sent[-1]
+    assert join["type"] == "join" and join["id"] == client.id
+    assert join["wire"] == wire.FORMAT_BINARY
+
+
+def test_reused_seq_of_other_message_is_shown(client):
+    # Neuer Leader vergibt eine seq erneut, die der alte schon verwendet hat
+    client.handle_message(chat(5, msg_id=1), None)
+    client.handle_message(chat(5, sender="c", msg_id=1), None)
+    client.handle_message(chat(6, msg_id=1), None)  # erneut gespeichert
+    assert [(m["id"], m["seq"]) for m in client.messages] == [("b", 5), ("c", 5)]
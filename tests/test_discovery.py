@@ -0,0 +1,23 @@
+from discovery import (DISCOVERY_ADDRESS, LOOPBACK_BROADCAST, is_multicast,
+                       open_discovery_socket)
+
+
+def test_is_multicast():
+    assert is_multicast("239.1.2.3")
+    assert is_multicast("224.0.0.251")
+    assert not is_multicast(LOOPBACK_BROADCAST)
+    assert not is_multicast("127.0.0.1")
+    assert not is_multicast(DISCOVERY_ADDRESS)
+    assert not is_multicast("")
+
+
+def test_loopback_broadcast_reaches_discovery_socket():
+    sock = open_discovery_socket(port=0, address=LOOPBACK_BROADCAST)
+    sender = open_discovery_socket(port=0, address=LOOPBACK_BROADCAST)
+    try:
+        sock.settimeout(1.0)
+        sender.sendto(b"hallo", (LOOPBACK_BROADCAST, sock.getsockname()[1]))
+        assert sock.recv(64) == b"hallo"
+    finally:
+        sock.close()
+        sender.close()
@@ -0,0 +1,49 @@
+from election import ElectionStats, RingIndex
+
+
+def test_successor_wraps_around():
+    ring = RingIndex(["c", "a", "b"])
+    assert ring.successor("a") == "b"
+    assert ring.successor("c") == "a"
+    # Eigene ID fehlt im Ring: nächste größere bzw. erste
+    assert ring.successor("bb") == "c"
+
+
+def test_successor_alone():
+    assert RingIndex().successor("a") is None
+    assert RingIndex(["a"]).successor("a") is None
+
+
+def test_add_and_remove_keep_order():
+    ring = RingIndex(["b"])
+    ring.add("d")
+    ring.add("a")
+    ring.add("b")
+    assert ring.ids == ["a", "b", "d"]
+    ring.remove("b")
+    ring.remove("x")
+    assert ring.ids == ["a", "d"]
+    assert "a" in ring and "b" not in ring
+    assert len(ring) == 2
+
+
+def test_higher_ids_for_bully():
+    ring = RingIndex(["a", "b", "c", "d"])
+    assert ring.higher("b") == ["c", "d"]
+    assert ring.higher("d") == []
+
+
+def test_stats_measure_from_first_start():
+    stats = ElectionStats()
+    assert stats.converged() is None
+    assert stats.last_duration is None
+    stats.start()
+    first = stats.started_at
+    stats.start()
+    assert stats.started_at == first
+    duration = stats.converged()
+    assert duration >= 0
+    assert stats.count == 1
+    assert stats.last_duration == duration
+    assert stats.converged() is None
+    assert stats.count == 1
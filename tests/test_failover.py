@@ -0,0 +1,28 @@
+import argparse
+
+import wire
+from bench import BIND_ADDRESS, scenario_failover
+from discovery import LOOPBACK_BROADCAST
+
+
+def failover_args(base_port):
+    return argparse.Namespace(
+        servers=3, failover_clients=10, rate=20.0, failover_timeout=15.0,
+        base_port=base_port, bind=BIND_ADDRESS,
+        discovery_address=LOOPBACK_BROADCAST, wire_format=wire.FORMAT_BINARY,
+        server_arg=[], log_dir=None)
+
+
+def test_failover_loses_no_messages():
+    result = scenario_failover(failover_args(6400))
+    assert result["new_leader"] is not None
+    assert result["probes"] > 0
+    assert result["probes_lost"] == 0
+
+
+def test_distributed_failover_loses_no_messages():
+    # Sender hängt an einem Follower, der an den Leader weiterreicht
+    result = scenario_failover(failover_args(6420), distributed=True)
+    assert result["new_leader"] is not None
+    assert result["probes"] > 0
+    assert result["probes_lost"] == 0
@@ -0,0 +1,73 @@
+from failure_detector import DeadlineHeap, PhiAccrualDetector
+
+
+def regular_heartbeats(detector, peer, count, interval=1.0, start=0.0):
+    for n in range(count):
+        detector.heartbeat(peer, now=start + n * interval)
+    return start + (count - 1) * interval
+
+
+def test_deadline_heap_pops_due_keys_in_order():
+    heap = DeadlineHeap()
+    heap.schedule("b", 2.0)
+    heap.schedule("a", 1.0)
+    heap.schedule("c", 3.0)
+    assert heap.pop_due(now=0.5) == []
+    assert heap.pop_due(now=2.0) == ["a", "b"]
+    assert len(heap) == 1
+
+
+def test_deadline_heap_reschedule_and_cancel():
+    heap = DeadlineHeap()
+    heap.schedule("a", 1.0)
+    heap.schedule("a", 5.0)  # alte Frist verfällt
+    heap.schedule("b", 1.0)
+    heap.cancel("b")
+    assert heap.pop_due(now=2.0) == []
+    assert heap.pop_due(now=5.0) == ["a"]
+    assert len(heap) == 0
+
+
+def test_phi_grows_with_silence():
+    detector = PhiAccrualDetector()
+    last = regular_heartbeats(detector, "peer", 10)
+    assert detector.phi("peer", now=last + 1.0) < 1.0
+    assert detector.phi("peer", now=last + 2.0) < detector.phi("peer", now=last + 3.0)
+    assert detector.phi("peer", now=last + 10.0) > detector.threshold
+    assert detector.phi("unknown") == 0.0
+
+
+def test_suspected_when_phi_reaches_threshold():
+    detector = PhiAccrualDetector()
+    last = regular_heartbeats(detector, "peer", 10)
+    deadline = detector.deadlines.deadlines["peer"]
+    # Die Frist liegt genau dort, wo phi die Schwelle erreicht
+    assert abs(detector.phi("peer", now=deadline) - detector.threshold) < 0.01
+    assert detector.suspected(now=last + 1.0) == []
+    assert detector.suspected(now=deadline) == ["peer"]
+    # Verdacht wird nur einmal gemeldet, der Peer ist vergessen
+    assert detector.suspected(now=deadline + 10) == []
+    assert detector.phi("peer") == 0.0
+
+
+def test_jittery_peer_gets_longer_deadline():
+    steady = PhiAccrualDetector()
+    jittery = PhiAccrualDetector()
+    regular_heartbeats(steady, "peer", 20)
+    now = 0.0
+    for n in range(20):
+        now += 0.5 if n % 2 else 1.5
+        jittery.heartbeat("peer", now=now)
+    steady_delay = steady.deadlines.deadlines["peer"] - 19.0
+    jittery_delay = jittery.deadlines.deadlines["peer"] - now
+    assert jittery_delay > steady_delay
+
+
+def test_heartbeat_postpones_suspicion_and_forget():
+    detector = PhiAccrualDetector()
+    last = regular_heartbeats(detector, "peer", 10)
+    first_deadline = detector.deadlines.deadlines["peer"]
+    detector.heartbeat("peer", now=last + 1.0)
+    assert detector.suspected(now=first_deadline) == []
+    detector.forget("peer")
+    assert detector.suspected(now=first_deadline + 100) == []
@@ -0,0 +1,67 @@
+import random
+import time
+
+import pytest
+
+from fragment import MAX_DATAGRAM, Fragmenter, MessageTooLarge, Reassembler
+
+DATA = bytes(random.Random(1).getrandbits(8) for _ in range(10000))
+
+
+def test_small_message_is_not_fragmented():
+    assert Fragmenter().split(b"hallo") == [b"hallo"]
+    assert Reassembler().add(b"hallo", "peer") == b"hallo"
+
+
+def test_reassembly_out_of_order_with_duplicates():
+    datagrams = Fragmenter().split(DATA)
+    assert len(datagrams) > 1
+    assert all(len(datagram) <= MAX_DATAGRAM for datagram in datagrams)
+    shuffled = list(datagrams)
+    random.Random(2).shuffle(shuffled)
+    shuffled.insert(1, shuffled[0])  # Duplikat vor dem letzten Fragment
+    reassembler = Reassembler()
+    results = [reassembler.add(datagram, "peer") for datagram in shuffled]
+    complete = [result for result in results if result is not None]
+    assert [bytes(result) for result in complete] == [DATA]
+    assert reassembler.buffered == 0
+
+
+def test_lost_fragment_expires():
+    datagrams = Fragmenter().split(DATA)
+    reassembler = Reassembler(timeout=0.01)
+    for datagram in datagrams[1:]:
+        assert reassembler.add(datagram, "peer") is None
+    assert reassembler.buffered == len(DATA)
+    time.sleep(0.02)
+    reassembler.add(Fragmenter().split(b"x" * 2000)[0], "peer")
+    assert len(reassembler.partials) == 1
+    assert reassembler.buffered == 2000
+
+
+def test_fragments_are_kept_apart_per_peer():
+    fragmenter = Fragmenter()
+    datagrams = fragmenter.split(DATA)
+    reassembler = Reassembler()
+    for datagram in datagrams[:-1]:
+        assert reassembler.add(datagram, "a") is None
+    assert reassembler.add(datagrams[-1], "b") is None
+    assert bytes(reassembler.add(datagrams[-1], "a")) == DATA
+
+
+def test_memory_limit_drops_oldest_partial():
+    reassembler = Reassembler(memory_limit=15000)
+    first = Fragmenter().split(DATA)
+    second = Fragmenter().split(DATA)
+    reassembler.add(first[0], "peer")
+    reassembler.add(second[0], "peer")
+    assert len(reassembler.partials) == 1
+    assert reassembler.buffered == len(DATA)
+
+
+def test_size_limits():
+    with pytest.raises(MessageTooLarge):
+        Fragmenter(max_message_size=5000).split(DATA)
+    with pytest.raises(MessageTooLarge):
+        Reassembler(max_message_size=5000).add(Fragmenter().split(DATA)[0],
+                                               "peer")
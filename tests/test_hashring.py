@@ -0,0 +1,57 @@
+from collections import Counter
+
+from hashring import HashRing
+
+CLIENTS = [f"client-{n}" for n in range(2000)]
+
+
+def owners(ring):
+    return {client: ring.owner(client) for client in CLIENTS}
+
+
+def test_empty_ring():
+    ring = HashRing()
+    assert ring.owner("client") is None
+    ring.add("a")
+    ring.remove("a")
+    assert ring.owner("client") is None
+    assert ring.points == []
+
+
+def test_owner_is_stable_and_spread():
+    ring = HashRing(["a", "b", "c", "d"])
+    assert owners(ring) == owners(HashRing(["d", "c", "b", "a"]))
+    counts = Counter(owners(ring).values())
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(CLIENTS) / 4 / 2
+
+
+def test_removal_only_remaps_clients_of_removed_node():
+    ring = HashRing(["a", "b", "c", "d"])
+    before = owners(ring)
+    ring.remove("c")
+    after = owners(ring)
+    assert "c" not in ring and len(ring) == 3
+    for client in CLIENTS:
+        if before[client] != "c":
+            assert after[client] == before[client]
+        else:
+            assert after[client] in ("a", "b", "d")
+
+
+def test_adding_node_takes_about_its_share():
+    ring = HashRing(["a", "b", "c"])
+    before = owners(ring)
+    ring.add("d")
+    after = owners(ring)
+    moved = [client for client in CLIENTS if before[client] != after[client]]
+    assert all(after[client] == "d" for client in moved)
+    assert len(CLIENTS) / 8 < len(moved) < len(CLIENTS) / 2
+
+
+def test_add_and_remove_are_idempotent():
+    ring = HashRing(["a"], vnodes=8)
+    ring.add("a")
+    assert len(ring.points) == 8
+    ring.remove("b")
+    assert len(ring.points) == 8
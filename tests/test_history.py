@@ -0,0 +1,82 @@
+from history import History, make_record
+
+
+def fill(history, seqs):
+    for seq in seqs:
+        history.store(make_record(seq, "client", "Client", f"text {seq}"))
+
+
+def ring_seqs(history):
+    return [record["seq"] for record in history.ring]
+
+
+def test_store_in_order():
+    history = History(ring_size=3)
+    fill(history, [1, 2, 3, 4])
+    assert ring_seqs(history) == [2, 3, 4]
+
+
+def test_store_out_of_order_sorted():
+    history = History(ring_size=5)
+    fill(history, [1, 3, 2, 5, 4])
+    assert ring_seqs(history) == [1, 2, 3, 4, 5]
+
+
+def test_store_out_of_order_on_full_ring():
+    # Nachzügler in einen vollen Ring: ältester Eintrag wird verdrängt
+    history = History(ring_size=3)
+    fill(history, [1, 2, 4, 5])
+    assert ring_seqs(history) == [2, 4, 5]
+    fill(history, [3])
+    assert ring_seqs(history) == [3, 4, 5]
+
+
+def test_store_older_than_ring_on_full_ring():
+    # Älter als ring[0]: bleibt draußen, der Ring ändert sich nicht
+    history = History(ring_size=3)
+    fill(history, [2, 3, 4])
+    fill(history, [1])
+    assert ring_seqs(history) == [2, 3, 4]
+
+
+def test_store_out_of_order_full_ring_with_log(tmp_path):
+    history = History(str(tmp_path), ring_size=2, segment_entries=16)
+    fill(history, [1, 3, 4, 2])
+    assert ring_seqs(history) == [3, 4]
+    history.advance(4)
+    records, more = history.page(after=0, limit=10)
+    assert [record["seq"] for record in records] == [1, 2, 3, 4]
+    assert not more
+
+
+def test_duplicate_detection_by_msg_id():
+    history = History(ring_size=3)
+    history.store(make_record(1, "a", "A", "eins", msg_id=1))
+    history.store(make_record(2, "a", "A", "zwei", msg_id=2))
+    assert history.is_duplicate("a", 1)
+    assert history.is_duplicate("a", 2)
+    assert not history.is_duplicate("a", 3)
+    assert not history.is_duplicate("b", 1)
+
+
+def test_duplicate_detection_after_restart(tmp_path):
+    history = History(str(tmp_path), segment_entries=16)
+    history.store(make_record(history.allocate(), "a", "A", "eins", msg_id=5))
+    restarted = History(str(tmp_path), segment_entries=16)
+    assert restarted.is_duplicate("a", 5)
+    assert not restarted.is_duplicate("a", 6)
+
+
+def test_duplicate_detection_with_reordered_ids():
+    # Nach einem Leaderwechsel kommen Nachrichten auf zwei Wegen an: eine
+    # höhere msg_id zuerst, die älteren über den Follower hinterher
+    history = History(ring_size=10)
+    history.mark_seen("a", 1)
+    history.mark_seen("a", 5)
+    assert not history.is_duplicate("a", 2)
+    assert not history.is_duplicate("a", 4)
+    for msg_id in (2, 3, 4):
+        history.mark_seen("a", msg_id)
+    assert all(history.is_duplicate("a", msg_id) for msg_id in range(1, 6))
+    assert not history.is_duplicate("a", 6)
+    assert history.seen_ids["a"].above == set()
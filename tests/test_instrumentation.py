@@ -0,0 +1,55 @@
+import io
+import logging
+
+import instrumentation
+from instrumentation import Histogram, Metrics
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in [0.0005] * 90 + [0.05] * 9 + [2.0]:
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == 0.001
+    assert summary["p99"] == 0.1
+    assert histogram.quantile(1.0) == 2.0  # oberhalb aller Klassen: max
+    assert summary["max"] == 2.0
+    assert abs(summary["mean"] - (0.045 + 0.45 + 2.0) / 100) < 1e-9
+
+
+def test_empty_histogram():
+    assert Histogram().summary() == {"count": 0, "mean": 0.0, "p50": 0.0,
+                                     "p99": 0.0, "max": 0.0}
+
+
+def test_metrics_snapshot():
+    metrics = Metrics()
+    metrics.count("in")
+    metrics.count("in", 2)
+    metrics.observe("latency", 0.002)
+    with metrics.timer("latency"):
+        pass
+    metrics.gauge("clients", lambda: 3)
+    metrics.gauge("broken", lambda: 1 / 0)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"in": 3}
+    assert snapshot["histograms"]["latency"]["count"] == 2
+    assert snapshot["gauges"]["clients"] == 3
+    assert "ZeroDivisionError" in snapshot["gauges"]["broken"]
+    assert snapshot["uptime"] >= 0
+
+
+def test_stop_logging_flushes_queue():
+    stream = io.StringIO()
+    root = logging.getLogger()
+    level = root.level
+    instrumentation.setup_logging("info", stream)
+    try:
+        logging.getLogger("test").info("letzte Meldung")
+        instrumentation.stop_logging()
+        assert "letzte Meldung" in stream.getvalue()
+    finally:
+        instrumentation.stop_logging()
+        root.removeHandler(instrumentation._queue_handler)
+        root.setLevel(level)
@@ -0,0 +1,129 @@
+import time
+
+from membership import ALIVE, DEAD, SUSPECT, Membership
+
+
+class Network:
+    # Stellt Pakete sofort zu; Mitglieder in "down" antworten nicht
+    def __init__(self):
+        self.nodes = {}
+        self.down = set()
+
+    def add(self, member_id, **options):
+        address = ("127.0.0.1", len(self.nodes) + 1)
+        events = []
+        node = Membership(member_id, address[1],
+                          lambda message, to: self.deliver(message, address, to),
+                          on_alive=lambda m: events.append(("alive", m["id"])),
+                          on_dead=lambda m: events.append(("dead", m["id"])),
+                          **options)
+        node.events = events
+        self.nodes[address] = node
+        return node
+
+    def deliver(self, message, sender, to):
+        if sender[1] in self.down or to[1] in self.down:
+            return
+        node = self.nodes.get(to)
+        if node is not None:
+            node.handle(dict(message), sender)
+
+
+def state(node, member_id):
+    return node.members[member_id]["state"]
+
+
+def test_learn_then_suspect_then_dead():
+    node = Network().add("a", suspicion_timeout=1.0)
+    node.learn("b", "127.0.0.1", 99)
+    assert node.events == [("alive", "b")]
+    node.suspect("b")
+    assert state(node, "b") == SUSPECT
+    node.tick(now=time.time() + 0.5)
+    assert state(node, "b") == SUSPECT
+    node.tick(now=time.time() + 2.0)
+    assert state(node, "b") == DEAD
+    assert node.events[-1] == ("dead", "b")
+    assert node.alive_members() == []
+
+
+def test_newer_incarnation_refutes_suspicion():
+    node = Network().add("a", suspicion_timeout=1.0)
+    node.learn("b", "127.0.0.1", 99)
+    node.suspect("b")
+    node._merge(["b", "127.0.0.1", 99, ALIVE, 1, None])
+    assert state(node, "b") == ALIVE
+    node.tick(now=time.time() + 2.0)
+    assert state(node, "b") == ALIVE
+    assert ("dead", "b") not in node.events
+
+
+def test_stale_updates_are_ignored():
+    node = Network().add("a")
+    node._merge(["b", "127.0.0.1", 99, ALIVE, 3, None])
+    node._merge(["b", "127.0.0.1", 99, SUSPECT, 2, None])
+    assert state(node, "b") == ALIVE
+    node._merge(["b", "127.0.0.1", 99, DEAD, 3, None])
+    node._merge(["b", "127.0.0.1", 99, SUSPECT, 4, None])
+    assert state(node, "b") == DEAD  # nur ein neueres alive zählt
+    node._merge(["b", "127.0.0.1", 99, ALIVE, 4, None])
+    assert state(node, "b") == ALIVE
+
+
+def test_suspicion_against_self_is_refuted():
+    node = Network().add("a")
+    node._merge(["a", "127.0.0.1", 1, SUSPECT, 0, None])
+    assert node.incarnation == 1
+    update = node.gossip["a"][0]
+    assert update[3] == ALIVE and update[4] == 1
+
+
+def test_join_exchanges_member_lists():
+    network = Network()
+    a, b, c = (network.add(name) for name in "abc")
+    b.join([("127.0.0.1", 1)])
+    c.join([("127.0.0.1", 1)])
+    assert {m["id"] for m in a.alive_members()} == {"b", "c"}
+    assert {m["id"] for m in c.alive_members()} == {"a", "b"}
+
+
+def test_unreachable_member_confirmed_dead_by_probes():
+    network = Network()
+    options = dict(ping_timeout=0.1, period=0.3, suspicion_timeout=0.5)
+    a, b, c = (network.add(name, **options) for name in "abc")
+    b.join([("127.0.0.1", 1)])
+    c.join([("127.0.0.1", 1)])
+    network.down.add(3)  # c fällt aus
+
+    now = time.time()
+    for _ in range(60):
+        now += 0.1
+        for node in (a, b):
+            node.tick(now=now)
+        if state(a, "c") == DEAD and state(b, "c") == DEAD:
+            break
+    assert state(a, "c") == DEAD and state(b, "c") == DEAD
+    assert state(a, "b") == ALIVE and state(b, "a") == ALIVE
+
+
+def test_indirect_probe_keeps_member_alive():
+    # Direkter Weg a -> c gestört, b erreicht c aber noch
+    network = Network()
+    a, b, c = (network.add(name, ping_timeout=0.1) for name in "abc")
+    b.join([("127.0.0.1", 1)])
+    c.join([("127.0.0.1", 1)])
+    deliver = network.deliver
+
+    def lossy(message, sender, to):
+        if {sender[1], to[1]} == {1, 3}:
+            return
+        deliver(message, sender, to)
+    network.deliver = lossy
+
+    with a.lock:
+        seq = a._allocate_seq()
+        a.probes[seq] = "c"
+    a._probe_timed_out(seq)  # ping_req über b, dessen ping_ack kommt zurück
+    assert seq not in a.probes
+    a.tick(now=time.time() + 1.0)
+    assert state(a, "c") == ALIVE
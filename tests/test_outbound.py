@@ -0,0 +1,107 @@
+import socket
+
+import wire
+from outbound import BulkSender, OutboundScheduler
+
+
+def collect():
+    sent = []
+    return sent, lambda key, payload: sent.append((key, payload))
+
+
+def payload(n):
+    return wire.encode({"type": "message", "text": str(n)})
+
+
+def test_small_payloads_are_batched():
+    sent, send = collect()
+    scheduler = OutboundScheduler(send)
+    for n in range(5):
+        scheduler.enqueue("a", payload(n))
+    scheduler.flush()
+    assert len(sent) == 1
+    assert wire.unbatch(sent[0][1]) == [payload(n) for n in range(5)]
+    assert scheduler.pending("a") == 0
+
+
+def test_batches_respect_size_limit():
+    sent, send = collect()
+    scheduler = OutboundScheduler(send, max_batch_bytes=40)
+    payloads = [b"x" * 15 for _ in range(5)]
+    for data in payloads:
+        scheduler.enqueue("a", data)
+    scheduler.flush()
+    unpacked = [data for _, frame in sent for data in wire.unbatch(frame)]
+    assert unpacked == payloads
+    assert len(sent) == 3  # je zwei Pakete, das letzte allein
+
+
+def test_no_batch_for_old_clients():
+    sent, send = collect()
+    scheduler = OutboundScheduler(send)
+    scheduler.enqueue("a", payload(1), batch=False)
+    scheduler.enqueue("a", payload(2), batch=False)
+    scheduler.flush()
+    assert [data for _, data in sent] == [payload(1), payload(2)]
+
+
+def test_slow_client_keeps_queue_and_drops_oldest():
+    sent, send = collect()
+    ready = {"a": False}
+    scheduler = OutboundScheduler(
+        send, can_send=lambda key: ready[key],
+        summarize=lambda key, dropped: b"dropped %d" % dropped,
+        max_queue=3)
+    for n in range(5):
+        scheduler.enqueue("a", b"%d" % n, batch=False)
+    scheduler.flush()
+    assert sent == []
+    assert scheduler.pending("a") == 3
+    ready["a"] = True
+    scheduler.flush()
+    assert [data for _, data in sent] == [b"dropped 2", b"2", b"3", b"4"]
+    assert scheduler.dropped == 2
+
+
+def test_forget_discards_queue():
+    sent, send = collect()
+    scheduler = OutboundScheduler(send)
+    scheduler.enqueue("a", payload(1))
+    scheduler.forget("a")
+    scheduler.flush()
+    assert sent == []
+
+
+def test_bulk_sender_delivers_all_datagrams():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1.0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        fallback = []
+        bulk = BulkSender(sender, lambda data, address: (
+            fallback.append(data), sender.sendto(data, address)))
+        address = receiver.getsockname()
+        datagrams = [(b"paket %d" % n, address) for n in range(4)]
+        sent = bulk.send(datagrams)
+        assert sent + len(fallback) == 4
+        if bulk.available:
+            assert sent == 4 and bulk.calls == 1
+        assert sorted(receiver.recv(64) for _ in range(4)) == sorted(
+            data for data, _ in datagrams)
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_bulk_sender_fallback_without_sendmmsg():
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        fallback = []
+        bulk = BulkSender(sender, lambda data, address: fallback.append(data))
+        bulk.available = False
+        assert bulk.send([(b"a", ("127.0.0.1", 9)), (b"b", ("127.0.0.1", 9))]) == 0
+        assert fallback == [b"a", b"b"]
+        assert bulk.send([]) == 0
+    finally:
+        sender.close()
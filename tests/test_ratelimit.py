@@ -0,0 +1,47 @@
+from ratelimit import RateLimiter, TokenBucket
+
+
+def test_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=10, burst=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(4)] == [True, True, True, False]
+    assert not bucket.take(0.05)  # erst ein halbes Token
+    assert bucket.take(0.1)
+    assert not bucket.take(0.1)
+
+
+def test_refill_capped_at_burst():
+    bucket = TokenBucket(rate=10, burst=3, now=0.0)
+    bucket.take(0.0)
+    bucket.refill(100.0)
+    assert bucket.tokens == 3
+    bucket.refill(50.0)  # Zeit läuft nicht rückwärts
+    assert bucket.tokens == 3
+
+
+def test_limiter_counts_streak_per_client():
+    limiter = RateLimiter(rate=1, burst=2)
+    assert limiter.admit("a", now=0.0) and limiter.admit("a", now=0.0)
+    assert not limiter.admit("a", now=0.0)
+    assert not limiter.admit("a", now=0.1)
+    assert limiter.streak("a") == 2
+    # Ein flutender Client bremst andere nicht
+    assert limiter.admit("b", now=0.1)
+    assert limiter.admit("a", now=1.1)
+    assert limiter.streak("a") == 0
+    assert (limiter.admitted, limiter.rejected) == (4, 2)
+
+
+def test_zero_rate_disables_limit():
+    limiter = RateLimiter(rate=0)
+    assert all(limiter.admit("a", now=0.0) for _ in range(1000))
+    assert limiter.buckets == {}
+
+
+def test_idle_buckets_are_pruned():
+    limiter = RateLimiter(rate=10, burst=5, max_buckets=2)
+    limiter.admit("a", now=0.0)
+    limiter.admit("b", now=0.0)
+    limiter.admit("c", now=10.0)  # a und b sind wieder voll
+    assert set(limiter.buckets) == {"c"}
+    limiter.forget("c")
+    assert limiter.streak("c") == 0
@@ -0,0 +1,124 @@
+import time
+
+import wire
+from reliability import ReliableChannel, is_ack
+
+
+def test_take_pending_returns_unacked_and_backlog():
+    sent = []
+    channel = ReliableChannel(lambda frame, peer: sent.append(peer), window=2)
+    old, new = ("127.0.0.1", 1), ("127.0.0.1", 2)
+    payloads = [wire.encode({"type": "message", "text": str(n)})
+                for n in range(4)]
+    for payload in payloads:
+        channel.send(payload, old)
+    assert channel.take_pending(old) == payloads
+    assert channel.pending(old) == 0
+    assert channel.take_pending(old) == []
+
+
+def test_is_ack():
+    frames = []
+    acks = []
+    sender = ReliableChannel(lambda frame, peer: frames.append(frame))
+    receiver = ReliableChannel(lambda frame, peer: acks.append(frame))
+    sender.send(wire.encode({"type": "message"}), "receiver")
+    receiver.receive(frames[0], "sender")
+    receiver.tick()
+    assert not is_ack(frames[0])
+    assert acks and is_ack(acks[0])
+    assert not is_ack(wire.encode({"type": "message"}, wire.FORMAT_JSON))
+
+
+class Link:
+    # Zwei Kanäle, deren Datagramme in Listen landen statt im Netz
+    def __init__(self, **options):
+        self.to_b = []
+        self.to_a = []
+        self.a = ReliableChannel(lambda frame, peer: self.to_b.append(frame),
+                                 **options)
+        self.b = ReliableChannel(lambda frame, peer: self.to_a.append(frame))
+
+    def deliver_to_b(self, frames):
+        received = []
+        for frame in frames:
+            received += [bytes(payload) for payload in self.b.receive(frame, "a")]
+        return received
+
+    def ack(self):
+        self.b.tick()
+        frames, self.to_a[:] = list(self.to_a), []
+        for frame in frames:
+            self.a.receive(frame, "b")
+
+
+def payloads(count):
+    return [wire.encode({"n": n}) for n in range(count)]
+
+
+def test_in_order_delivery_despite_reordering_and_duplicates():
+    link = Link()
+    sent = payloads(5)
+    for payload in sent:
+        link.a.send(payload, "b")
+    frames = link.to_b
+    received = link.deliver_to_b([frames[2], frames[0], frames[0], frames[4],
+                                  frames[1], frames[3], frames[3]])
+    assert received == sent
+
+
+def test_ack_clears_unacked():
+    link = Link()
+    for payload in payloads(3):
+        link.a.send(payload, "b")
+    link.deliver_to_b(link.to_b)
+    assert link.a.pending("b") == 3
+    link.ack()
+    assert link.a.pending("b") == 0
+
+
+def test_lost_frame_is_retransmitted():
+    link = Link(rto=0.01)
+    sent = payloads(2)
+    for payload in sent:
+        link.a.send(payload, "b")
+    first, second = link.to_b
+    assert link.deliver_to_b([second]) == []
+    link.to_b.clear()
+    time.sleep(0.02)
+    link.a.tick()
+    assert link.deliver_to_b(link.to_b) == sent
+
+
+def test_window_holds_back_and_ack_releases():
+    link = Link(window=2)
+    for payload in payloads(5):
+        link.a.send(payload, "b")
+    assert len(link.to_b) == 2
+    assert link.a.pending("b") == 5
+    link.deliver_to_b(link.to_b)
+    link.to_b.clear()
+    link.ack()
+    assert len(link.to_b) == 2
+
+
+def test_give_up_reports_payloads():
+    failed = []
+    channel = ReliableChannel(lambda frame, peer: None, rto=0.001,
+                              max_retries=1,
+                              on_give_up=lambda peer, items: failed.append(
+                                  (peer, items)))
+    sent = payloads(2)
+    for payload in sent:
+        channel.send(payload, "b")
+    for _ in range(20):
+        time.sleep(0.002)
+        channel.tick()
+    assert failed == [("b", sent)]
+    assert channel.pending("b") == 0
+
+
+def test_unreliable_datagrams_pass_through():
+    channel = ReliableChannel(lambda frame, peer: None)
+    data = wire.encode({"type": "keepalive"})
+    assert channel.receive(data, "a") == [data]
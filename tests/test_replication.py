@@ -0,0 +1,59 @@
+from replication import ReplicationLog, SnapshotAssembler, snapshot_parts
+
+
+def test_since_returns_missing_entries():
+    log = ReplicationLog()
+    for n in range(5):
+        log.append({"op": "message", "n": n})
+    assert log.since(5) == []
+    assert [index for index, _ in log.since(3)] == [4, 5]
+
+
+def test_since_needs_snapshot_when_entries_are_gone():
+    log = ReplicationLog(max_entries=3)
+    for n in range(10):
+        log.append({"n": n})
+    assert [index for index, _ in log.since(7)] == [8, 9, 10]
+    assert log.since(6) is None  # Eintrag 7 ist schon verdrängt
+    assert log.since(11) is None
+
+
+def test_follower_log_and_reset():
+    log = ReplicationLog()
+    log.append_at(7, {"n": 7})
+    assert log.last_index == 7
+    log.reset(20)
+    assert log.last_index == 20
+    assert log.since(20) == []
+    assert log.since(7) is None
+
+
+def test_snapshot_round_trip_in_parts():
+    clients = {f"c{n}": {"id": f"c{n}", "number": n} for n in range(7)}
+    parts = snapshot_parts("leader", 42, clients, 8, 100,
+                           lambda client_id: ["lobby"], part_size=3)
+    assert len(parts) == 3
+    assembler = SnapshotAssembler()
+    assert assembler.add(parts[2]) is None
+    assert assembler.add(parts[0]) is None
+    snapshot = assembler.add(parts[1])
+    assert snapshot["clients"] == clients
+    assert snapshot["rooms"] == {client_id: ["lobby"] for client_id in clients}
+    assert (snapshot["index"], snapshot["next_client_number"],
+            snapshot["last_seq"]) == (42, 8, 100)
+
+
+def test_empty_snapshot_has_one_part():
+    parts = snapshot_parts("leader", 1, {}, 1, 0, lambda client_id: [])
+    assert len(parts) == 1
+    assert SnapshotAssembler().add(parts[0])["clients"] == {}
+
+
+def test_newer_snapshot_replaces_incomplete_one():
+    clients = {f"c{n}": {"id": f"c{n}"} for n in range(4)}
+    old = snapshot_parts("leader", 1, clients, 5, 0, lambda c: [], part_size=2)
+    new = snapshot_parts("leader", 2, clients, 5, 0, lambda c: [], part_size=2)
+    assembler = SnapshotAssembler()
+    assembler.add(old[0])
+    assert assembler.add(new[1]) is None
+    assert assembler.add(new[0])["index"] == 2
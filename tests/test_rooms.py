@@ -0,0 +1,52 @@
+from rooms import MAX_ROOM_NAME, RoomIndex, valid_room
+
+
+def test_join_and_leave_keep_both_directions():
+    rooms = RoomIndex()
+    assert rooms.join("a", "lobby")
+    assert not rooms.join("a", "lobby")
+    rooms.join("b", "lobby")
+    rooms.join("a", "r")
+    assert sorted(rooms.members("lobby")) == ["a", "b"]
+    assert rooms.rooms_of("a") == ["lobby", "r"]
+    assert rooms.leave("a", "lobby")
+    assert not rooms.leave("a", "lobby")
+    assert rooms.members("lobby") == ("b",)
+    assert rooms.rooms_of("a") == ["r"]
+
+
+def test_empty_room_disappears():
+    rooms = RoomIndex()
+    rooms.join("a", "r")
+    rooms.leave("a", "r")
+    assert len(rooms) == 0
+    assert rooms.members("r") == ()
+
+
+def test_remove_client_from_all_rooms():
+    rooms = RoomIndex()
+    for room in ("lobby", "r", "s"):
+        rooms.join("a", room)
+    rooms.join("b", "r")
+    assert rooms.remove_client("a") == {"lobby", "r", "s"}
+    assert rooms.rooms_of("a") == []
+    assert rooms.members("r") == ("b",)
+    assert len(rooms) == 1
+    assert rooms.remove_client("unbekannt") == set()
+
+
+def test_set_rooms_replaces_memberships():
+    rooms = RoomIndex()
+    rooms.join("a", "lobby")
+    rooms.set_rooms("a", ["r", "s"])
+    assert rooms.rooms_of("a") == ["r", "s"]
+    assert rooms.members("lobby") == ()
+
+
+def test_valid_room():
+    assert valid_room("lobby")
+    assert valid_room("x" * MAX_ROOM_NAME)
+    assert not valid_room("")
+    assert not valid_room("x" * (MAX_ROOM_NAME + 1))
+    assert not valid_room(None)
+    assert not valid_room(["lobby"])
@@ -0,0 +1,167 @@
+import json
+import queue
+import socket
+import time
+
+import wire
+from fragment import RECV_BUFFER_SIZE
+from history import make_record
+from reliability import ReliableChannel
+from server import ChatServer
+
+
+def make_server(**options):
+    return ChatServer(bind_address="127.0.0.1", port=0, control_port=0,
+                      discovery_port=0, **options)
+
+
+def close(server):
+    for sock in (server.server_socket, server.control_socket,
+                 server.discovery_socket):
+        sock.close()
+
+
+def test_msg_ids_reach_workers():
+    # Worker prüfen Doppelte gegen ihre Kopie; der Koordinator verteilt
+    # jede neu gespeicherte msg_id über die Update-Queues
+    server = make_server()
+    try:
+        updates = queue.SimpleQueue()
+        server.worker_updates.append(updates)
+        server.store_record(make_record(server.history.allocate(), "a", "A",
+                                        "hallo", msg_id=7))
+        assert updates.get_nowait() == ("msg_id", "a", 7)
+    finally:
+        close(server)
+
+
+def client_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1.0)
+    return sock
+
+
+def test_lease_expired_in_client_format():
+    server = make_server()
+    sock = client_socket()
+    try:
+        server.is_leader = True
+        keepalive = {"type": "keepalive", "id": "unbekannt"}
+        server.on_server_datagram(wire.encode(keepalive, wire.FORMAT_JSON),
+                                  sock.getsockname())
+        reply = sock.recv(RECV_BUFFER_SIZE)
+        assert wire.format_of(reply) == wire.FORMAT_JSON
+        assert wire.decode(reply)["type"] == "lease_expired"
+    finally:
+        sock.close()
+        close(server)
+
+
+def test_rate_limit_notice_in_client_format():
+    server = make_server(client_rate=1, client_burst=1)
+    sock = client_socket()
+    try:
+        frames = []
+        channel = ReliableChannel(lambda frame, peer: frames.append(frame))
+        for n in range(2):
+            channel.send(wire.encode({"type": "message", "id": "a",
+                                      "text": str(n)}, wire.FORMAT_JSON),
+                         "server")
+        for frame in frames:
+            server.on_server_datagram(frame, sock.getsockname())
+        # ACKs gehen erst mit tick() raus, das erste Paket ist der Hinweis
+        notice = sock.recv(RECV_BUFFER_SIZE)
+        assert wire.format_of(notice) == wire.FORMAT_JSON
+        assert wire.decode(notice)["type"] == "notice"
+    finally:
+        sock.close()
+        close(server)
+
+
+def test_valid_state_file_is_restored(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({
+        "id": "s1", "incarnation": 3, "leader": "s1",
+        "servers": {"s2": {"ip": "127.0.0.1", "port": 7001,
+                           "control_port": 7002}},
+        "clients": {"c1": {"id": "c1", "ip": "127.0.0.1", "port": 7100,
+                           "name": "Client 4", "number": 4, "wire": "json"}},
+        "rooms": {"c1": ["lobby", "r"]},
+        "next_client_number": 5
+    }))
+    server = make_server(state_file=str(path))
+    try:
+        assert server.id == "s1"
+        assert server.membership.incarnation == 4
+        assert ("127.0.0.1", 7002) in server.seeds
+        assert list(server.known_clients) == ["c1"]
+        assert set(server.rooms.rooms_of("c1")) == {"lobby", "r"}
+        assert server.next_client_number == 5
+        assert server.resume_leadership
+    finally:
+        close(server)
+
+
+def test_malformed_state_file_changes_nothing(tmp_path):
+    # Gültiges JSON, aber der zweite Client ist kaputt: nichts übernehmen
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({
+        "id": "s1", "incarnation": 3, "leader": "s1",
+        "servers": {"s2": {"ip": "127.0.0.1", "control_port": 7002}},
+        "clients": {"c1": {"ip": "127.0.0.1", "port": 7100, "name": "A"},
+                    "c2": {"ip": "127.0.0.1"}}
+    }))
+    server = make_server(state_file=str(path))
+    try:
+        assert server.id != "s1"
+        assert server.seeds == []
+        assert server.known_clients == {}
+        assert not server.resume_leadership
+    finally:
+        close(server)
+
+
+def test_state_file_without_keys(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"id": "s1"}))
+    server = make_server(state_file=str(path))
+    try:
+        assert server.id == "s1"
+        assert server.known_clients == {}
+    finally:
+        close(server)
+
+
+def test_election_duration_in_stats():
+    server = make_server()
+    try:
+        server.election_stats.start()
+        server.election_converged()
+        election = server.metrics.snapshot()["gauges"]["election"]
+        assert election["count"] == 1
+        assert election["last_s"] is not None
+    finally:
+        close(server)
+
+
+def test_lease_expiry_evicts_silent_client():
+    server = make_server(lease_duration=0.05)
+    sock = client_socket()
+    try:
+        server.is_leader = True
+        channel = ReliableChannel(
+            lambda frame, peer: server.on_server_datagram(
+                frame, sock.getsockname()))
+        join = {"type": "join", "id": "c1", "port": sock.getsockname()[1]}
+        channel.send(wire.encode(join, wire.FORMAT_JSON), "server")
+        assert "c1" in server.known_clients
+        server.expire_leases()
+        assert "c1" in server.known_clients
+        time.sleep(0.1)
+        server.expire_leases()
+        assert "c1" not in server.known_clients
+        assert server.evictions == 1
+    finally:
+        sock.close()
+        close(server)
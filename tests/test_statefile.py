@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from server import parse_state
+from statefile import StateFile
+
+
+def test_save_and_load(tmp_path):
+    state_file = StateFile(str(tmp_path / "state.json"))
+    assert state_file.load() is None
+    assert state_file.age() is None
+    assert state_file.save({"id": "s1", "clients": {}})
+    assert StateFile(state_file.path).load() == {"id": "s1", "clients": {}}
+    assert 0 <= state_file.age() < 5
+    assert not os.path.exists(state_file.path + ".tmp")
+
+
+def test_unchanged_state_written_only_after_refresh(tmp_path):
+    state_file = StateFile(str(tmp_path / "state.json"), refresh=60)
+    assert state_file.save({"id": "s1"})
+    assert not state_file.save({"id": "s1"})
+    assert state_file.save({"id": "s2"})
+    state_file.written_at -= 61
+    assert state_file.save({"id": "s2"})
+
+
+def test_defective_file_raises_value_error(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text('{"id": "s1", "clie')  # abgeschnitten
+    with pytest.raises(ValueError):
+        StateFile(str(path)).load()
+
+
+def test_parse_state_skips_own_entry_and_fills_defaults():
+    parsed = parse_state({
+        "id": "s1",
+        "servers": {"s1": {"ip": "127.0.0.1", "control_port": 1},
+                    "s2": {"ip": "127.0.0.1", "control_port": "2"}},
+        "clients": {"c1": {"ip": "127.0.0.1", "port": 7100, "name": "A"}},
+        "rooms": {"c1": ["lobby"], "weg": ["r"]}
+    })
+    assert parsed["seeds"] == [("127.0.0.1", 2)]
+    assert parsed["rooms"] == {"c1": ["lobby"]}
+    assert parsed["incarnation"] == 0
+    assert parsed["next_client_number"] is None
+
+
+@pytest.mark.parametrize("state", [
+    [],
+    {"servers": {"s2": {"ip": "127.0.0.1"}}},
+    {"clients": {"c1": {"ip": "127.0.0.1", "port": "x", "name": "A"}}},
+    {"clients": {"c1": {"ip": "127.0.0.1", "port": 1, "name": "A"}},
+     "rooms": {"c1": 5}},
+    {"incarnation": "drei"},
+])
+def test_parse_state_rejects_malformed(state):
+    with pytest.raises((AttributeError, KeyError, TypeError, ValueError)):
+        parse_state(json.loads(json.dumps(state)))
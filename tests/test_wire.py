@@ -0,0 +1,64 @@
+import pytest
+
+import wire
+
+MESSAGE = {
+    "type": "message",
+    "id": "c1",
+    "seq": 2**40,
+    "count": 300,
+    "small": -5,
+    "ratio": 0.25,
+    "text": "Grüße " * 20000,  # lang genug für das 32-Bit-Längenfeld
+    "flags": [True, False, None],
+    "nested": {"rooms": ["lobby", "r"], "empty": {}}
+}
+
+
+@pytest.mark.parametrize("fmt", wire.FORMATS)
+def test_round_trip(fmt):
+    data = wire.encode(MESSAGE, fmt)
+    assert wire.format_of(data) == fmt
+    assert wire.decode(data) == MESSAGE
+
+
+def test_binary_bytes_round_trip():
+    message = {"raw": b"\x00\xff" * 10}
+    assert wire.decode(wire.encode(message)) == message
+
+
+def test_binary_is_smaller_than_json():
+    message = {"type": "message", "id": "c1", "seq": 12345, "text": "hallo"}
+    assert (len(wire.encode(message, wire.FORMAT_BINARY))
+            < len(wire.encode(message, wire.FORMAT_JSON)))
+
+
+def test_decode_rejects_truncated_and_unknown_frames():
+    data = wire.encode(MESSAGE)
+    with pytest.raises(ValueError):
+        wire.decode(data[:-3])
+    with pytest.raises(ValueError):
+        wire.decode(wire.frame(wire.KIND_ACK, b""))
+    header = bytearray(data)
+    header[1] = wire.VERSION + 1
+    with pytest.raises(ValueError):
+        wire.decode(bytes(header))
+
+
+def test_encode_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        wire.encode({"value": object()})
+
+
+def test_batch_round_trip():
+    payloads = [wire.encode({"n": n}) for n in range(5)]
+    batch = wire.batch(payloads)
+    assert [bytes(payload) for payload in wire.unbatch(batch)] == payloads
+    single = wire.encode({"n": 1})
+    assert wire.unbatch(single) == [single]
+
+
+def test_lazy_payload_encodes_once_per_format():
+    payload = wire.LazyPayload({"type": "notice"})
+    assert payload.get(wire.FORMAT_BINARY) is payload.get(wire.FORMAT_BINARY)
+    assert wire.decode(payload.get(wire.FORMAT_JSON)) == {"type": "notice"}
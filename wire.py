@@ -0,0 +1,214 @@
+import json
+import struct
+
+# Wire-Format für alle Pakete zwischen Servern und Clients.
+# Binär: versionierter, längenpräfixierter Frame mit kompakter Kodierung
+# (ähnlich msgpack). JSON bleibt als Fallback für ältere Teilnehmer.
+
+FORMAT_BINARY = "binary"
+FORMAT_JSON = "json"
+FORMATS = (FORMAT_BINARY, FORMAT_JSON)
+
+MAGIC = 0xC7
+VERSION = 1
+
+# Frame-Header: magic, version, kind, Länge des Inhalts
+HEADER = struct.Struct("!BBBI")
+KIND_MESSAGE = 0
+KIND_RELIABLE = 1  # siehe reliability.py
+KIND_ACK = 2
+KIND_FRAGMENT = 3  # siehe fragment.py
+KIND_BATCH = 4  # mehrere Pakete in einem Datagramm, siehe outbound.py
+
+_INT8 = struct.Struct("!b")
+_INT32 = struct.Struct("!i")
+_INT64 = struct.Struct("!q")
+_FLOAT = struct.Struct("!d")
+_LEN16 = struct.Struct("!H")
+_LEN32 = struct.Struct("!I")
+
+
+def encode(message, fmt=FORMAT_BINARY):
+    # Kodiert eine Nachricht (dict) im gewünschten Format
+    if fmt == FORMAT_JSON:
+        return json.dumps(message).encode()
+    body = bytearray()
+    _pack_value(message, body)
+    return frame(KIND_MESSAGE, body)
+
+
+def decode(data):
+    # Dekodiert ein Paket; erkennt binäre Frames am Magic-Byte
+    if is_binary(data):
+        kind, body = unpack_frame(data)
+        if kind != KIND_MESSAGE:
+            raise ValueError(f"Unexpected frame kind {kind}")
+        value, _ = _unpack_value(body, 0)
+        return value
+    return json.loads(bytes(data).decode())
+
+
+def is_binary(data):
+    return len(data) > 0 and data[0] == MAGIC
+
+
+def format_of(data):
+    # Format eines kodierten Pakets, z.B. um im selben Format zu antworten
+    return FORMAT_BINARY if is_binary(data) else FORMAT_JSON
+
+
+def frame(kind, body):
+    # Setzt Header und Inhalt zu einem Frame zusammen
+    return HEADER.pack(MAGIC, VERSION, kind, len(body)) + body
+
+
+def unpack_frame(data):
+    # Liefert (kind, Inhalt) eines binären Frames ohne Kopie des Inhalts
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated frame header")
+    magic, version, kind, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary frame")
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire version {version}")
+    body = memoryview(data)[HEADER.size:HEADER.size + length]
+    if len(body) != length:
+        raise ValueError("Truncated frame body")
+    return kind, body
+
+
+def batch(payloads):
+    # Packt mehrere kodierte Pakete (je mit Längenpräfix) in einen Frame
+    body = bytearray()
+    for payload in payloads:
+        body += _LEN32.pack(len(payload))
+        body += payload
+    return frame(KIND_BATCH, body)
+
+
+def unbatch(data):
+    # Liefert die Pakete eines Batch-Frames; andere Pakete unverändert
+    if not (is_binary(data) and len(data) > 2 and data[2] == KIND_BATCH):
+        return [data]
+    _, body = unpack_frame(data)
+    payloads = []
+    offset = 0
+    while offset < len(body):
+        length = _LEN32.unpack_from(body, offset)[0]
+        offset += _LEN32.size
+        if offset + length > len(body):
+            raise ValueError("Truncated batch entry")
+        payloads.append(body[offset:offset + length])
+        offset += length
+    return payloads
+
+
+class LazyPayload:
+    # Kodiert eine Nachricht höchstens einmal je Format und liefert danach
+    # immer denselben Puffer (für Fan-out an viele Empfänger)
+    def __init__(self, message):
+        self.message = message
+        self.encoded = {}
+
+    def get(self, fmt=FORMAT_BINARY):
+        payload = self.encoded.get(fmt)
+        if payload is None:
+            payload = encode(self.message, fmt)
+            self.encoded[fmt] = payload
+        return payload
+
+
+def _pack_value(value, out):
+    if value is None:
+        out += b"N"
+    elif value is True:
+        out += b"T"
+    elif value is False:
+        out += b"F"
+    elif isinstance(value, int):
+        if -128 <= value <= 127:
+            out += b"b" + _INT8.pack(value)
+        elif -2**31 <= value < 2**31:
+            out += b"i" + _INT32.pack(value)
+        else:
+            out += b"q" + _INT64.pack(value)
+    elif isinstance(value, float):
+        out += b"d" + _FLOAT.pack(value)
+    elif isinstance(value, str):
+        _pack_bytes(b"s", b"S", value.encode(), out)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        _pack_bytes(b"y", b"Y", value, out)
+    elif isinstance(value, dict):
+        out += b"m" + _LEN32.pack(len(value))
+        for key, item in value.items():
+            key = str(key).encode()
+            out += _LEN16.pack(len(key)) + key
+            _pack_value(item, out)
+    elif isinstance(value, (list, tuple)):
+        out += b"l" + _LEN32.pack(len(value))
+        for item in value:
+            _pack_value(item, out)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _pack_bytes(short_tag, long_tag, raw, out):
+    if len(raw) <= 0xFFFF:
+        out += short_tag + _LEN16.pack(len(raw))
+    else:
+        out += long_tag + _LEN32.pack(len(raw))
+    out += raw
+
+
+def _unpack_value(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == 0x4E:  # N
+        return None, pos
+    if tag == 0x54:  # T
+        return True, pos
+    if tag == 0x46:  # F
+        return False, pos
+    if tag == 0x62:  # b
+        return _INT8.unpack_from(buf, pos)[0], pos + 1
+    if tag == 0x69:  # i
+        return _INT32.unpack_from(buf, pos)[0], pos + 4
+    if tag == 0x71:  # q
+        return _INT64.unpack_from(buf, pos)[0], pos + 8
+    if tag == 0x64:  # d
+        return _FLOAT.unpack_from(buf, pos)[0], pos + 8
+    if tag in (0x73, 0x79):  # s, y
+        length = _LEN16.unpack_from(buf, pos)[0]
+        pos += 2
+        return _raw_value(tag == 0x73, buf, pos, length), pos + length
+    if tag in (0x53, 0x59):  # S, Y
+        length = _LEN32.unpack_from(buf, pos)[0]
+        pos += 4
+        return _raw_value(tag == 0x53, buf, pos, length), pos + length
+    if tag == 0x6D:  # m
+        count = _LEN32.unpack_from(buf, pos)[0]
+        pos += 4
+        result = {}
+        for _ in range(count):
+            length = _LEN16.unpack_from(buf, pos)[0]
+            pos += 2
+            key = bytes(buf[pos:pos + length]).decode()
+            pos += length
+            result[key], pos = _unpack_value(buf, pos)
+        return result, pos
+    if tag == 0x6C:  # l
+        count = _LEN32.unpack_from(buf, pos)[0]
+        pos += 4
+        result = []
+        for _ in range(count):
+            item, pos = _unpack_value(buf, pos)
+            result.append(item)
+        return result, pos
+    raise ValueError(f"Unknown type tag {tag:#x}")
+
+
+def _raw_value(is_text, buf, pos, length):
+    raw = bytes(buf[pos:pos + length])
+    if len(raw) != length:
+        raise ValueError("Truncated value")
+    return raw.decode() if is_text else raw